@@ -0,0 +1,231 @@
+"""
+Course analytics rollups for Jijue LMS.
+Completion rates, lesson drop-off and time-to-complete are read from small
+per-day tables (course_daily_stats, lesson_daily_stats) instead of scanning
+lesson_progress and enrollments on every request. A day's rows are rebuilt
+from the raw tables with range scans on their timestamp indexes: the
+periodic refresh covers the last ANALYTICS_REFRESH_DAYS days, and a
+backfill walks the whole history in chunks, committing after each one.
+
+Time-to-complete is kept as bucket counts so ranges of days can be merged;
+the median is interpolated within its bucket.
+"""
+import json
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from db_models import CourseDailyStats, Course, Enrollment, Lesson, LessonDailyStats, LessonProgress, Module
+
+ANALYTICS_REFRESH_DAYS = int(os.getenv("ANALYTICS_REFRESH_DAYS", "2"))
+ANALYTICS_BACKFILL_CHUNK_DAYS = int(os.getenv("ANALYTICS_BACKFILL_CHUNK_DAYS", "30"))
+
+# Upper bounds in hours of the time-to-complete buckets; one more open-ended bucket follows
+COMPLETION_BUCKET_HOURS = (1, 6, 24, 72, 168, 336, 720, 2160)
+
+
+def _as_date(value) -> date:
+    """func.date() gives a string on SQLite and a date on PostgreSQL."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _bucket(seconds: float) -> int:
+    hours = seconds / 3600
+    for index, bound in enumerate(COMPLETION_BUCKET_HOURS):
+        if hours <= bound:
+            return index
+    return len(COMPLETION_BUCKET_HOURS)
+
+
+def histogram_median_hours(counts) -> float | None:
+    """Median time-to-complete in hours, interpolated inside its bucket."""
+    total = sum(counts)
+    if not total:
+        return None
+    half = total / 2
+    cumulative, lower = 0, 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= half:
+            if index == len(COMPLETION_BUCKET_HOURS):
+                return float(lower)
+            upper = COMPLETION_BUCKET_HOURS[index]
+            return round(lower + (upper - lower) * (half - cumulative) / count, 2)
+        cumulative += count
+        if index < len(COMPLETION_BUCKET_HOURS):
+            lower = COMPLETION_BUCKET_HOURS[index]
+    return float(lower)
+
+
+# --- Building rollups ---
+
+def refresh_day_range(db, start: date, end: date) -> dict:
+    """
+    Rebuild the rollup rows for the days in [start, end) from lesson_progress
+    and enrollments. The caller commits.
+    """
+    low, high = datetime.combine(start, time.min), datetime.combine(end, time.min)
+    db.execute(delete(CourseDailyStats).where(CourseDailyStats.day >= start, CourseDailyStats.day < end))
+    db.execute(delete(LessonDailyStats).where(LessonDailyStats.day >= start, LessonDailyStats.day < end))
+
+    lessons = {}  # (lesson id, day) -> row
+    for column, field in ((LessonProgress.started_at, "started"), (LessonProgress.completed_at, "completed")):
+        for lesson_id, course_id, day, count in db.execute(
+            select(LessonProgress.lesson_id, Module.course_id, func.date(column), func.count())
+            .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+            .join(Module, Lesson.module_id == Module.id)
+            .where(column >= low, column < high)
+            .group_by(LessonProgress.lesson_id, Module.course_id, func.date(column))
+        ):
+            day = _as_date(day)
+            row = lessons.setdefault((lesson_id, day), {
+                "lesson_id": lesson_id, "course_id": course_id, "day": day, "started": 0, "completed": 0,
+            })
+            row[field] = count
+
+    courses = {}  # (course id, day) -> row
+    def course_row(course_id, day):
+        return courses.setdefault((course_id, day), {
+            "course_id": course_id, "day": day, "learners_started": 0, "learners_completed": 0,
+            "completion_seconds_total": 0, "histogram": [0] * (len(COMPLETION_BUCKET_HOURS) + 1),
+        })
+
+    for course_id, day, count in db.execute(
+        select(Enrollment.course_id, func.date(Enrollment.enrolled_at), func.count())
+        .where(Enrollment.enrolled_at >= low, Enrollment.enrolled_at < high)
+        .group_by(Enrollment.course_id, func.date(Enrollment.enrolled_at))
+    ):
+        course_row(course_id, _as_date(day))["learners_started"] = count
+    for course_id, enrolled_at, completed_at in db.execute(
+        select(Enrollment.course_id, Enrollment.enrolled_at, Enrollment.completed_at)
+        .where(Enrollment.completed_at >= low, Enrollment.completed_at < high)
+    ):
+        row = course_row(course_id, completed_at.date())
+        seconds = max(0, int((completed_at - (enrolled_at or completed_at)).total_seconds()))
+        row["learners_completed"] += 1
+        row["completion_seconds_total"] += seconds
+        row["histogram"][_bucket(seconds)] += 1
+
+    now = datetime.utcnow()
+    if lessons:
+        db.execute(insert(LessonDailyStats), [dict(row, updated_at=now) for row in lessons.values()])
+    if courses:
+        db.execute(insert(CourseDailyStats), [
+            {
+                "course_id": row["course_id"],
+                "day": row["day"],
+                "learners_started": row["learners_started"],
+                "learners_completed": row["learners_completed"],
+                "completion_seconds_total": row["completion_seconds_total"],
+                "completion_histogram": json.dumps(row["histogram"]),
+                "updated_at": now,
+            }
+            for row in courses.values()
+        ])
+    return {"course_rows": len(courses), "lesson_rows": len(lessons)}
+
+
+def refresh_recent(db, days: int = ANALYTICS_REFRESH_DAYS) -> dict:
+    """Rebuild the last `days` days (today included); meant to run every few minutes."""
+    today = datetime.utcnow().date()
+    return refresh_day_range(db, today - timedelta(days=days - 1), today + timedelta(days=1))
+
+
+def backfill(db, chunk_days: int = ANALYTICS_BACKFILL_CHUNK_DAYS, on_chunk=None) -> dict:
+    """
+    Rebuild every day from the first recorded activity to today, `chunk_days`
+    at a time with a commit after each chunk, so a large history never sits in
+    one transaction. `on_chunk(start, end, counts)` is called after each commit.
+    """
+    first = db.execute(select(
+        select(func.min(LessonProgress.started_at)).scalar_subquery(),
+        select(func.min(Enrollment.enrolled_at)).scalar_subquery(),
+    )).one()
+    firsts = [value for value in first if value is not None]
+    totals = {"course_rows": 0, "lesson_rows": 0, "chunks": 0}
+    if not firsts:
+        return totals
+
+    start, end = min(firsts).date(), datetime.utcnow().date() + timedelta(days=1)
+    while start < end:
+        chunk_end = min(start + timedelta(days=chunk_days), end)
+        counts = refresh_day_range(db, start, chunk_end)
+        db.commit()
+        totals["course_rows"] += counts["course_rows"]
+        totals["lesson_rows"] += counts["lesson_rows"]
+        totals["chunks"] += 1
+        if on_chunk is not None:
+            on_chunk(start, chunk_end, counts)
+        start = chunk_end
+    return totals
+
+
+# --- Reading rollups ---
+
+def course_analytics(db, start: date, end: date) -> list:
+    """Per-course completion numbers for the days in [start, end], from the rollups only."""
+    totals = {
+        course_id: (started, completed, seconds)
+        for course_id, started, completed, seconds in db.execute(
+            select(
+                CourseDailyStats.course_id,
+                func.sum(CourseDailyStats.learners_started),
+                func.sum(CourseDailyStats.learners_completed),
+                func.sum(CourseDailyStats.completion_seconds_total),
+            )
+            .where(CourseDailyStats.day >= start, CourseDailyStats.day <= end)
+            .group_by(CourseDailyStats.course_id)
+        )
+    }
+    histograms = {}
+    for course_id, histogram in db.execute(
+        select(CourseDailyStats.course_id, CourseDailyStats.completion_histogram)
+        .where(CourseDailyStats.day >= start, CourseDailyStats.day <= end, CourseDailyStats.learners_completed > 0)
+    ):
+        merged = histograms.setdefault(course_id, [0] * (len(COMPLETION_BUCKET_HOURS) + 1))
+        for index, count in enumerate(json.loads(histogram)):
+            merged[index] += count
+
+    results = []
+    for course_id, title in db.execute(select(Course.id, Course.title).order_by(Course.id)):
+        started, completed, seconds = totals.get(course_id, (0, 0, 0))
+        results.append({
+            "course_id": course_id,
+            "course_title": title,
+            "learners_started": started,
+            "learners_completed": completed,
+            "completion_rate": round(completed / started, 4) if started else 0.0,
+            "median_hours_to_complete": histogram_median_hours(histograms.get(course_id, [])),
+            "mean_hours_to_complete": round(seconds / completed / 3600, 2) if completed else None,
+        })
+    return results
+
+
+def lesson_analytics(db, course_id: int, start: date, end: date) -> list:
+    """Starts, completions and drop-off per lesson of a course, in course order, from the rollups only."""
+    totals = {
+        lesson_id: (started, completed)
+        for lesson_id, started, completed in db.execute(
+            select(LessonDailyStats.lesson_id, func.sum(LessonDailyStats.started), func.sum(LessonDailyStats.completed))
+            .where(LessonDailyStats.course_id == course_id, LessonDailyStats.day >= start, LessonDailyStats.day <= end)
+            .group_by(LessonDailyStats.lesson_id)
+        )
+    }
+    results = []
+    for lesson_id, lesson_title, module_title in db.execute(
+        select(Lesson.id, Lesson.title, Module.title)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Module.course_id == course_id)
+        .order_by(Module.order, Module.id, Lesson.order, Lesson.id)
+    ):
+        started, completed = totals.get(lesson_id, (0, 0))
+        results.append({
+            "lesson_id": lesson_id,
+            "lesson_title": lesson_title,
+            "module_title": module_title,
+            "started": started,
+            "completed": completed,
+            "completion_rate": round(completed / started, 4) if started else 0.0,
+            "dropped": max(0, started - completed),
+        })
+    return results
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark a sync-session handler against an async-session handler.
+Fires N concurrent requests (500 by default) at each handler in-process and
+reports throughput and latency percentiles. Both handlers run the same
+indexed user lookup against a throwaway SQLite database.
+
+Usage: python bench_async_db.py [concurrency] [rounds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+
+from database import SessionLocal, create_all_tables, get_async_db, get_db
+from db_models import User
+
+USERS = 1000
+
+app = FastAPI()
+
+@app.get("/sync/{user_id}")
+def sync_lookup(user_id: int, db = Depends(get_db)):
+    """Sync def handler: runs on a starlette threadpool slot."""
+    user = db.query(User).filter(User.email == f"user{user_id}@example.com").first()
+    return {"id": user.id}
+
+@app.get("/async/{user_id}")
+async def async_lookup(user_id: int, db = Depends(get_async_db)):
+    """Async def handler: awaits the query on the event loop."""
+    result = await db.execute(select(User).where(User.email == f"user{user_id}@example.com"))
+    return {"id": result.scalars().first().id}
+
+def seed_users():
+    create_all_tables()
+    db = SessionLocal()
+    try:
+        db.add_all([
+            User(full_name=f"User {i}", email=f"user{i}@example.com", hashed_password="x")
+            for i in range(USERS)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+async def run_concurrent(client, prefix, concurrency):
+    """Fire `concurrency` requests at once; return (wall seconds, per-request latencies)."""
+    async def one(i):
+        start = time.perf_counter()
+        response = await client.get(f"/{prefix}/{i % USERS}")
+        assert response.status_code == 200
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+def report(label, wall, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"  {label:<6} {len(latencies) / wall:8.0f} req/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
+
+async def main(concurrency, rounds):
+    seed_users()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for prefix in ("sync", "async"):
+            await run_concurrent(client, prefix, 50)  # warm up pools
+            walls, all_latencies = 0.0, []
+            for _ in range(rounds):
+                wall, latencies = await run_concurrent(client, prefix, concurrency)
+                walls += wall
+                all_latencies += latencies
+            report(prefix, walls, all_latencies)
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print(f"{concurrency} concurrent connections x {rounds} rounds")
+    asyncio.run(main(concurrency, rounds))
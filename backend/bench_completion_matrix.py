@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory completion matrix at 200k users x 200 lessons.
+Fills one course with a drop-off funnel (each user completes the first k
+lessons, k random) through the same bulk path the startup load uses, then
+reports the matrix size, the process RSS growth and the latency of the
+aggregate queries the admin endpoints run.
+
+Usage: python bench_completion_matrix.py [users] [lessons]
+"""
+import random
+import sys
+import resource
+import time
+
+from completion_matrix import CourseMatrix
+
+LESSONS_PER_MODULE = 10
+COHORT_SIZE = 1000
+
+def timed(label: str, fn, repeat: int = 5):
+    """Run fn `repeat` times and print the best wall time."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<34} {best * 1000:8.2f} ms")
+
+def main(users: int, lessons: int):
+    random.seed(42)
+    completions = [
+        (user_id, lesson_id)
+        for user_id in range(1, users + 1)
+        for lesson_id in range(int(random.betavariate(1, 2) * (lessons + 1)))
+    ]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    matrix = CourseMatrix(1, [(lesson_id, lesson_id // LESSONS_PER_MODULE) for lesson_id in range(lessons)])
+    matrix.fill(completions)
+    matrix.recount()
+    build = time.perf_counter() - started
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+
+    print(f"{users} users x {lessons} lessons, {len(completions)} completions, loaded in {build:.1f} s")
+    print(f"  matrix size                        {matrix.nbytes() / 2**20:8.2f} MB")
+    print(f"  max RSS growth while loading       {rss_growth / 2**20:8.2f} MB")
+    cohort = random.sample(range(1, users + 1), COHORT_SIZE)
+    timed("per-lesson counts", matrix.lesson_counts)
+    timed("users finished each module", matrix.module_counts)
+    timed("users finished course", matrix.course_count)
+    timed("one user's percentage", lambda: matrix.user_percentage(users // 2), repeat=1000)
+    timed(f"cohort of {COHORT_SIZE}", lambda: matrix.cohort(cohort))
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
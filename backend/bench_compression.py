@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression on the cacheable read endpoints.
+Seeds a 50-module course (lesson bodies of generated HTML prose), 500
+resources and 1,000 media items, then for the course tree, catalog,
+resources and media pages reports the identity and compressed sizes, and
+the server-side CPU time per request (process time; the client reads the
+raw bytes without decoding them) for: no compression, the cached variant
+(the steady state) and recompressing at the cached level on every request
+(variant cache cleared before each one). The cost of compressing the body
+once at the per-request level is timed separately for comparison.
+
+Usage: python bench_compression.py [requests]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from fastapi.testclient import TestClient
+
+from compression import COMPRESSION_MIN_BYTES, compress, compressed_variants, supported_encodings
+from database import SessionLocal, create_all_tables, engine
+from db_models import Course, Lesson, MediaLibrary, MediaTag, Module, Resource, ResourceCategory
+from main import app
+
+MODULES = 50
+LESSONS_PER_MODULE = 6
+WORDS = [
+    "prep", "testing", "clinic", "health", "viral", "load", "treatment", "adherence", "counselling", "support",
+    "community", "prevention", "condoms", "stigma", "youth", "partner", "results", "confidential", "daily",
+    "pill", "care", "access", "nurse", "follow", "up", "questions", "risk", "safe", "sex", "education",
+]
+
+def prose(sentences: int) -> str:
+    return " ".join(
+        " ".join(random.choice(WORDS) for _ in range(random.randint(6, 16))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+def lesson_html() -> str:
+    return "".join(f"<h3>{prose(1)}</h3><p>{prose(random.randint(4, 8))}</p>" for _ in range(4))
+
+def seed() -> int:
+    create_all_tables()
+    with SessionLocal() as db:
+        course = Course(title="HIV Prevention Basics", description=prose(3), category="Health", icon="Book", color="primary")
+        db.add(course)
+        db.flush()
+        for m in range(MODULES):
+            module = Module(course_id=course.id, title=f"Module {m + 1}", description=prose(1), order=m)
+            db.add(module)
+            db.flush()
+            db.add_all([
+                Lesson(module_id=module.id, title=prose(1)[:60], description=prose(1), content=lesson_html(), order=l)
+                for l in range(LESSONS_PER_MODULE)
+            ])
+        category = ResourceCategory(name="Guides")
+        db.add(category)
+        db.flush()
+        course_id, category_id = course.id, category.id
+        db.commit()
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Resource.__table__.insert(), [
+            {"category_id": category_id, "title": prose(1)[:60], "description": prose(2), "resource_type": "PDF",
+             "url": f"https://example.com/r/{n}", "created_at": now}
+            for n in range(500)
+        ])
+        connection.execute(MediaLibrary.__table__.insert(), [
+            {"id": n, "title": prose(1)[:60], "description": prose(2), "media_type": "video",
+             "url": f"https://example.com/m/{n}.mp4", "created_at": now}
+            for n in range(1, 1001)
+        ])
+        connection.execute(MediaTag.__table__.insert(), [
+            {"media_id": n, "tag": random.choice(WORDS)} for n in range(1, 1001) for _ in range(3)
+        ])
+    return course_id
+
+def cpu_ms(client, url, headers, requests, clear=False) -> float:
+    started = time.process_time()
+    for _ in range(requests):
+        if clear:
+            compressed_variants.invalidate()
+        # Read the raw bytes so the client side does not spend CPU decompressing
+        with client.stream("GET", url, headers=headers) as response:
+            assert response.status_code == 200
+            for _ in response.iter_raw():
+                pass
+    return 1000 * (time.process_time() - started) / requests
+
+def run_benchmark(requests: int = 200):
+    random.seed(3)
+    course_id = seed()
+    client = TestClient(app)
+    endpoints = {
+        "course tree": f"/api/courses/{course_id}",
+        "catalog": "/api/courses",
+        "resources (page of 200)": "/api/resources?limit=200",
+        "media (page of 200)": "/api/media?limit=200",
+    }
+    identity = {"Accept-Encoding": "identity"}
+    print(f"Encodings available: {', '.join(supported_encodings())}; CPU per request over {requests} requests")
+    for label, url in endpoints.items():
+        plain = client.get(url, headers=identity)
+        print(f"{label}: {len(plain.content)} bytes identity")
+        for encoding in supported_encodings():
+            headers = {"Accept-Encoding": encoding}
+            encoded = client.get(url, headers=headers)
+            if "content-encoding" not in encoded.headers:
+                print(f"  {encoding:<5} not compressed (below {COMPRESSION_MIN_BYTES} bytes)")
+                continue
+            size = encoded.num_bytes_downloaded
+            print(f"  {encoding:<5} {size:>8} bytes ({100 * (1 - size / len(plain.content)):.1f}% saved)")
+            base = cpu_ms(client, url, identity, requests)
+            cached = cpu_ms(client, url, headers, requests)
+            recompressed = cpu_ms(client, url, headers, requests, clear=True)
+            started = time.process_time()
+            for _ in range(20):
+                compress(plain.content, encoding)
+            per_request_level = 1000 * (time.process_time() - started) / 20
+            print(f"        CPU/request: identity {base:.2f} ms, cached variant {cached:.2f} ms, "
+                  f"recompressed each time {recompressed:.2f} ms (per-request level alone {per_request_level:.2f} ms)")
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/courses/{id} on a 50-module course.
+Compares rendering the tree through pydantic on every request (the previous
+behaviour) with serving the materialized JSON snapshot, with and without the
+in-process catalog cache in front of it.
+
+Usage: python bench_course_detail.py [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from fastapi import Depends
+from fastapi.testclient import TestClient
+
+from catalog import catalog_cache, load_course_tree
+from database import SessionLocal, create_all_tables, get_db
+from db_models import Course, Module, Lesson
+from main import app
+from models import CourseDetailResponse
+
+MODULES = 50
+LESSONS_PER_MODULE = 6
+LESSON_CONTENT = "<p>" + "Lesson body text with markup. " * 50 + "</p>"
+
+@app.get("/bench/rendered/{course_id}", response_model=CourseDetailResponse)
+def rendered_course_tree(course_id: int, db = Depends(get_db)):
+    """Old behaviour: load and serialize the tree through pydantic on every request."""
+    return load_course_tree(db, course_id)
+
+def seed_course() -> int:
+    """Create one course with MODULES modules and return its id."""
+    create_all_tables()
+    db = SessionLocal()
+    try:
+        course = Course(title="Benchmark Course", description="", category="Bench", icon="Book", color="primary")
+        db.add(course)
+        db.flush()
+        for m in range(MODULES):
+            module = Module(course_id=course.id, title=f"Module {m}", description="Module description", order=m)
+            db.add(module)
+            db.flush()
+            for l in range(LESSONS_PER_MODULE):
+                db.add(Lesson(module_id=module.id, title=f"Lesson {m}.{l}", content=LESSON_CONTENT, order=l, duration_minutes=10))
+        db.commit()
+        return course.id
+    finally:
+        db.close()
+
+def measure(client, url, requests) -> float:
+    """Return requests per second for `requests` sequential GETs of `url`."""
+    client.get(url)  # warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url)
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - start)
+
+def run_benchmark(requests: int = 300):
+    course_id = seed_course()
+    client = TestClient(app)
+    body_size = len(client.get(f"/api/courses/{course_id}").content)
+    print(f"Course: {MODULES} modules x {LESSONS_PER_MODULE} lessons, {body_size / 1024:.0f} KiB JSON")
+
+    before = measure(client, f"/bench/rendered/{course_id}", requests)
+
+    ttl = catalog_cache.ttl
+    catalog_cache.ttl = 0
+    snapshot_only = measure(client, f"/api/courses/{course_id}", requests)
+    catalog_cache.ttl = ttl
+    catalog_cache.invalidate()
+    cached = measure(client, f"/api/courses/{course_id}", requests)
+
+    print(f"  render per request (before):      {before:8.1f} req/s")
+    print(f"  materialized snapshot, no cache:  {snapshot_only:8.1f} req/s  ({snapshot_only / before:.1f}x)")
+    print(f"  materialized snapshot + cache:    {cached:8.1f} req/s  ({cached / before:.1f}x)")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/dashboard with 100k learners.
+Seeds users, enrollments and module progress with bulk inserts, then measures
+p50/p95 latency for cold requests (cache dropped before each call, so the
+version stamp, progress aggregate and cursor queries all run) and for warm
+requests served from the per-user cache, against the 10 ms p95 target.
+
+Usage: python bench_dashboard.py [users] [requests]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from fastapi.testclient import TestClient
+
+from dashboard import dashboard_cache
+from database import engine, create_all_tables
+from db_models import Course, Enrollment, Lesson, LessonStatus, Module, ModuleProgress, User
+from main import app, create_access_token
+
+COURSES = 10
+MODULES_PER_COURSE = 5
+LESSONS_PER_MODULE = 6
+COURSES_PER_USER = 2
+TARGET_P95_MS = 10.0
+
+def seed(users: int):
+    """Bulk-insert courses, users, enrollments and module progress."""
+    create_all_tables()
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Course.__table__.insert(), [
+            {"id": c, "title": f"Course {c}", "description": "", "category": "Bench", "icon": "Book",
+             "color": "primary", "created_at": now, "updated_at": now}
+            for c in range(1, COURSES + 1)
+        ])
+        modules = [(c, (c - 1) * MODULES_PER_COURSE + m) for c in range(1, COURSES + 1) for m in range(1, MODULES_PER_COURSE + 1)]
+        connection.execute(Module.__table__.insert(), [
+            {"id": m, "course_id": c, "title": f"Module {m}", "order": m, "created_at": now, "updated_at": now}
+            for c, m in modules
+        ])
+        connection.execute(Lesson.__table__.insert(), [
+            {"module_id": m, "title": f"Lesson {m}.{l}", "content": "", "order": l, "created_at": now, "updated_at": now}
+            for _, m in modules for l in range(LESSONS_PER_MODULE)
+        ])
+        connection.execute(User.__table__.insert(), [
+            {"id": u, "full_name": f"Learner {u}", "email": f"learner{u}@example.com", "hashed_password": "x"}
+            for u in range(1, users + 1)
+        ])
+        course_lessons = MODULES_PER_COURSE * LESSONS_PER_MODULE
+        enrollments, progress = [], []
+        for u in range(1, users + 1):
+            for c in random.sample(range(1, COURSES + 1), COURSES_PER_USER):
+                done_modules = random.randint(0, MODULES_PER_COURSE)
+                enrollments.append({
+                    "user_id": u, "course_id": c, "enrolled_at": now, "last_activity_at": now,
+                    "completed_lessons": done_modules * LESSONS_PER_MODULE, "total_lessons": course_lessons,
+                    "progress_percentage": 100 * done_modules // MODULES_PER_COURSE,
+                    "next_module_id": (c - 1) * MODULES_PER_COURSE + min(done_modules + 1, MODULES_PER_COURSE),
+                })
+                for m in range(1, done_modules + 1):
+                    progress.append({
+                        "user_id": u, "module_id": (c - 1) * MODULES_PER_COURSE + m, "status": LessonStatus.COMPLETED.name,
+                        "completed_lessons": LESSONS_PER_MODULE, "total_lessons": LESSONS_PER_MODULE,
+                        "progress_percentage": 100,
+                    })
+        connection.execute(Enrollment.__table__.insert(), enrollments)
+        connection.execute(ModuleProgress.__table__.insert(), progress)
+    return len(enrollments), len(progress)
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def measure(client, headers_list, requests, cold, url="/api/dashboard"):
+    """Return per-request latencies in ms for random users."""
+    latencies = []
+    for _ in range(requests):
+        headers = random.choice(headers_list)
+        if cold:
+            dashboard_cache.invalidate()
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        latencies.append(1000 * (time.perf_counter() - start))
+        assert response.status_code == 200
+    return latencies
+
+def run_benchmark(users: int = 100_000, requests: int = 2000):
+    random.seed(7)
+    started = time.perf_counter()
+    enrollments, progress = seed(users)
+    print(f"Seeded {users} users, {enrollments} enrollments, {progress} module_progress rows "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    sample = random.sample(range(1, users + 1), 500)
+    headers_list = [
+        {"Authorization": "Bearer " + create_access_token({
+            "user_id": u, "email": f"learner{u}@example.com", "full_name": f"Learner {u}", "role": "student",
+        })}
+        for u in sample
+    ]
+    client = TestClient(app)
+    client.get("/api/courses")
+    measure(client, headers_list, 200, cold=True)  # warm up SQLite page cache
+
+    runs = (
+        ("cold (cache miss)     ", True, "/api/dashboard"),
+        ("warm (cache hit)      ", False, "/api/dashboard"),
+        ("baseline /users/me    ", False, "/api/v1/users/me"),  # auth + framework, no DB
+    )
+    for label, cold, url in runs:
+        if not cold:
+            for headers in headers_list:  # every sampled user cached, so warm means hits only
+                client.get(url, headers=headers)
+        hits = dashboard_cache.hits
+        latencies = measure(client, headers_list, requests, cold, url)
+        p95 = percentile(latencies, 0.95)
+        print(f"  {label}: p50 {percentile(latencies, 0.50):6.2f} ms   p95 {p95:6.2f} ms   "
+              f"cache hits {dashboard_cache.hits - hits}/{requests}   "
+              f"{'within' if p95 <= TARGET_P95_MS else 'OVER'} the {TARGET_P95_MS:g} ms target")
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    run_benchmark(users, requests)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark forum view counting.
+Seeds discussions with bulk inserts, then records views from several threads
+(most of them on a few hot threads) two ways: a write transaction per view
+(UPDATE ... views_count + 1, commit), as opening a thread used to cost, and
+the in-memory view counter flushed in bulk. Reports throughput, per-view
+p50/p95 latency and flush cost, plus the HyperLogLog unique-viewer error at
+several cardinalities.
+
+Usage: python bench_forum_views.py [discussions] [views] [threads]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from sqlalchemy import update
+
+from database import SessionLocal, create_all_tables, engine
+from db_models import Discussion, ForumCategory, User, UserRole
+from forum_views import HLL_REGISTERS, ViewCounter, hll_estimate, hll_position
+
+def seed(discussions: int):
+    create_all_tables()
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": 1, "full_name": "Author", "email": "author@example.com", "hashed_password": "x",
+             "role": UserRole.STUDENT.name}
+        ])
+        connection.execute(ForumCategory.__table__.insert(), [{"id": 1, "name": "General"}])
+        connection.execute(Discussion.__table__.insert(), [
+            {"id": d, "user_id": 1, "category_id": 1, "title": f"Topic {d}", "content": "Body",
+             "views_count": 0, "replies_count": 0, "created_at": datetime.utcnow()}
+            for d in range(1, discussions + 1)
+        ])
+
+def workload(discussions: int, views: int) -> list:
+    """(discussion id, viewer) pairs; 80% of views land on the 10 hottest threads."""
+    hot = list(range(1, 11))
+    return [
+        (random.choice(hot) if random.random() < 0.8 else random.randint(1, discussions), f"user:{random.randint(1, 20000)}")
+        for _ in range(views)
+    ]
+
+def direct_view(discussion_id: int, viewer: str):
+    with SessionLocal() as db:
+        db.execute(update(Discussion).where(Discussion.id == discussion_id).values(views_count=Discussion.views_count + 1))
+        db.commit()
+
+def run_threads(views: list, threads: int, record) -> tuple:
+    """Run `record` over the views split across threads; returns (seconds, latencies in ms)."""
+    latencies = [[] for _ in range(threads)]
+
+    def worker(n):
+        for discussion_id, viewer in views[n::threads]:
+            start = time.perf_counter()
+            record(discussion_id, viewer)
+            latencies[n].append(1000 * (time.perf_counter() - start))
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, sorted(sum(latencies, []))
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def report(label, seconds, latencies):
+    print(f"  {label:<28} {len(latencies) / seconds:10.0f} views/s   "
+          f"p50 {percentile(latencies, 0.50):7.3f} ms   p95 {percentile(latencies, 0.95):7.3f} ms")
+
+def total_views() -> int:
+    with SessionLocal() as db:
+        return sum(views for (views,) in db.query(Discussion.views_count))
+
+def run_benchmark(discussions: int = 10_000, views: int = 20_000, threads: int = 8):
+    random.seed(5)
+    seed(discussions)
+    views_list = workload(discussions, views)
+    print(f"{views} views over {discussions} discussions from {threads} threads:")
+
+    seconds, latencies = run_threads(views_list, threads, direct_view)
+    report("write transaction per view", seconds, latencies)
+    assert total_views() == views
+
+    counter = ViewCounter(flush_interval_ms=1000, max_entries=1000)
+    counter.start()
+    seconds, latencies = run_threads(views_list, threads, counter.record)
+    counter.stop()
+    stats = counter.stats()
+    report("buffered + bulk flush", seconds, latencies)
+    assert total_views() == 2 * views
+    print(f"  {stats['flushes']} flushes, last {stats['last_batch_size']} discussions, "
+          f"avg {stats['avg_flush_ms']:.1f} ms, max {stats['max_flush_ms']:.1f} ms")
+
+    print(f"HyperLogLog unique viewers ({HLL_REGISTERS} registers, {HLL_REGISTERS} bytes per discussion):")
+    for distinct in (100, 1_000, 10_000, 100_000, 1_000_000):
+        registers = bytearray(HLL_REGISTERS)
+        for n in range(distinct):
+            index, rank = hll_position(f"user:{n}")
+            if rank > registers[index]:
+                registers[index] = rank
+        estimate = hll_estimate(registers)
+        print(f"  {distinct:>9} distinct -> {estimate:>9} ({100 * (estimate - distinct) / distinct:+.2f}%)")
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark WebSocket live-update fan-out on one worker.
+Registers idle connections with the live hub on one event loop (each with
+its own bounded queue and sender task, as /ws does), subscribes them all to
+one discussion topic and measures the time from publish() until every
+connection's send has run: from the loop itself and from a threadpool
+thread (how sync endpoints publish). A second run makes 1% of the
+connections stall, with a queue of a quarter of the publishes, to show slow
+consumers being dropped while the rest keep their latency. Hub memory per
+connection is taken from the RSS delta of the first run.
+
+The sends go to in-process stubs rather than sockets, so this measures the
+hub (queueing, task scheduling, serialization) and not kernel socket I/O.
+
+Usage: python bench_live_fanout.py [connections] [publishes]
+"""
+import asyncio
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from live import LiveHub
+from models import TokenData
+
+TOPIC = "forum:discussion:1"
+
+def rss_mb() -> float:
+    """Current resident set size (Linux)."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def report(label, latencies):
+    print(f"  {label:<38} p50 {percentile(latencies, 0.50):8.2f} ms   p95 {percentile(latencies, 0.95):8.2f} ms")
+
+async def fan_out(connections: int, publishes: int, slow_every: int = 0, queue_size: int | None = None):
+    hub = LiveHub(queue_size) if queue_size else LiveHub()
+    user = TokenData(user_id=1, email="bench@example.com", full_name="Bench", role="student", issued_at=0, expires_at=0)
+    state = {"sent": 0, "target": 0, "done": asyncio.Event()}
+    stalled = asyncio.Event()
+
+    async def send(message):
+        state["sent"] += 1
+        if state["sent"] == state["target"]:
+            state["done"].set()
+
+    async def stall(message):
+        await stalled.wait()
+
+    async def close(code):
+        pass
+
+    before = rss_mb()
+    started = time.perf_counter()
+    subscribers = []
+    for n in range(connections):
+        slow = slow_every and n % slow_every == 0
+        subscriber = hub.connect(user, stall if slow else send, close)
+        hub.subscribe(subscriber, TOPIC)
+        subscribers.append(subscriber)
+    await asyncio.sleep(0)
+    fast = connections - (connections // slow_every if slow_every else 0)
+    memory = f", ~{1024 * 1024 * (rss_mb() - before) / connections:.0f} bytes each (RSS)" if not slow_every else ""
+    print(f"  {connections} connections registered in {1000 * (time.perf_counter() - started):.0f} ms{memory}")
+
+    async def publish_and_wait(publish):
+        state["sent"], state["target"] = 0, fast
+        state["done"].clear()
+        start = time.perf_counter()
+        await publish()
+        await state["done"].wait()
+        return 1000 * (time.perf_counter() - start)
+
+    payload = {"type": "reply.created", "reply": {"id": 1, "content": "x" * 200}}
+
+    async def from_loop():
+        hub.publish(TOPIC, payload)
+
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(1)
+
+    async def from_thread():
+        await loop.run_in_executor(pool, hub.publish, TOPIC, payload)
+
+    on_loop = [await publish_and_wait(from_loop) for _ in range(publishes)]
+    off_loop = [await publish_and_wait(from_thread) for _ in range(publishes)]
+    stats = hub.stats()
+    for subscriber in subscribers:
+        hub.disconnect(subscriber)
+    stalled.set()
+    pool.shutdown()
+    return on_loop, off_loop, stats
+
+def run_benchmark(connections: int = 10_000, publishes: int = 50):
+    print(f"Fan-out of one event to {connections} idle connections, {publishes} publishes:")
+    on_loop, off_loop, stats = asyncio.run(fan_out(connections, publishes))
+    report("publish on the event loop", on_loop)
+    report("publish from a threadpool thread", off_loop)
+    print(f"  delivered {stats['delivered']}, dropped as slow {stats['dropped_slow']}")
+
+    queue_size = max(1, publishes // 4)
+    print(f"Same with 1% of connections stalled (queue size {queue_size}):")
+    on_loop, off_loop, stats = asyncio.run(fan_out(connections, publishes, slow_every=100, queue_size=queue_size))
+    report("publish on the event loop", on_loop)
+    report("publish from a threadpool thread", off_loop)
+    print(f"  delivered {stats['delivered']}, dropped as slow {stats['dropped_slow']}, "
+          f"connections left {stats['connections']}")
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
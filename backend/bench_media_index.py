@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark media tag filtering with 100k media items and 5k distinct tags.
+Seeds media_library/media_tags with bulk inserts (tags drawn from a Zipf-like
+distribution, 2-8 per item), then compares p50/p95 latency of AND/OR tag
+queries with facet counts answered by the in-memory tag index against the
+same answers computed in SQL (GROUP BY/HAVING over media_tags, with a
+(tag, media_id) index created for the comparison), and times the
+/api/media/query endpoint end to end.
+
+Usage: python bench_media_index.py [items] [tags] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from database import SessionLocal, create_all_tables, engine
+from db_models import MediaLibrary, MediaTag
+from main import app
+from media_index import MEDIA_FACET_LIMIT, media_index
+
+MEDIA_TYPES = ["video", "podcast", "article"]
+
+def seed(items: int, tags: int) -> int:
+    """Bulk-insert media items and their tags; returns the tag row count."""
+    create_all_tables()
+    now = datetime.utcnow()
+    names = [f"tag{t}" for t in range(tags)]
+    weights = [1 / (rank + 1) for rank in range(tags)]
+    rows = []
+    for media_id in range(1, items + 1):
+        for tag in set(random.choices(names, weights, k=random.randint(2, 8))):
+            rows.append({"media_id": media_id, "tag": tag})
+    with engine.begin() as connection:
+        connection.execute(MediaLibrary.__table__.insert(), [
+            {"id": m, "title": f"Media {m}", "media_type": random.choice(MEDIA_TYPES), "url": f"https://example.com/{m}",
+             "created_at": now}
+            for m in range(1, items + 1)
+        ])
+        connection.execute(MediaTag.__table__.insert(), rows)
+        connection.exec_driver_sql("CREATE INDEX bench_media_tags_tag_media_id ON media_tags (tag, media_id)")
+    return len(rows)
+
+def sql_query(db, tags, match_all, media_type):
+    """The same ids and facets as MediaTagIndex.query, computed by SQLite."""
+    params = {f"t{i}": tag for i, tag in enumerate(tags)}
+    placeholders = ", ".join(f":t{i}" for i in range(len(tags)))
+    having = f"HAVING count(DISTINCT tag) = {len(tags)}" if match_all else ""
+    matched = f"SELECT media_id FROM media_tags WHERE tag IN ({placeholders}) GROUP BY media_id {having}"
+    typed = matched
+    if media_type:
+        typed = f"SELECT id FROM media_library WHERE media_type = :media_type AND id IN ({matched})"
+        params["media_type"] = media_type
+    ids = db.execute(text(f"{typed} ORDER BY 1"), params).scalars().all()
+    tag_facets = db.execute(text(
+        f"SELECT tag, count(*) FROM media_tags WHERE media_id IN ({typed}) GROUP BY tag ORDER BY 2 DESC LIMIT {MEDIA_FACET_LIMIT}"
+    ), params).all()
+    type_facets = db.execute(text(
+        f"SELECT media_type, count(*) FROM media_library WHERE id IN ({matched}) GROUP BY media_type"
+    ), params).all()
+    return ids, tag_facets, type_facets
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def report(label, latencies):
+    print(f"  {label:<40} p50 {percentile(latencies, 0.50):8.2f} ms   p95 {percentile(latencies, 0.95):8.2f} ms")
+
+def run_benchmark(items: int = 100_000, tags: int = 5000, queries: int = 200):
+    random.seed(11)
+    started = time.perf_counter()
+    tag_rows = seed(items, tags)
+    print(f"Seeded {items} media items, {tag_rows} tag rows over {tags} tags in {time.perf_counter() - started:.1f}s")
+
+    db = SessionLocal()
+    media_index.build(db)
+    stats = media_index.stats()
+    print(f"Index built in {stats['build_ms']:.0f} ms: {stats['tags']} tags, {stats['postings']} postings")
+
+    head, mid = [f"tag{t}" for t in range(20)], [f"tag{t}" for t in range(20, 500)]
+    shapes = {
+        "1 popular tag": lambda: ([random.choice(head)], True, None),
+        "AND popular + mid tag": lambda: ([random.choice(head), random.choice(mid)], True, None),
+        "AND 3 popular tags + media_type": lambda: (random.sample(head, 3), True, random.choice(MEDIA_TYPES)),
+        "OR 3 mid tags": lambda: (random.sample(mid, 3), False, None),
+    }
+    client = TestClient(app)
+    for label, shape in shapes.items():
+        cases = [shape() for _ in range(queries)]
+        index_ms, sql_ms, http_ms = [], [], []
+        for tag_list, match_all, media_type in cases:
+            start = time.perf_counter()
+            result = media_index.query(tag_list, match_all, [media_type] if media_type else [], None, 50)
+            index_ms.append(1000 * (time.perf_counter() - start))
+            start = time.perf_counter()
+            ids, _, _ = sql_query(db, tag_list, match_all, media_type)
+            sql_ms.append(1000 * (time.perf_counter() - start))
+            assert len(ids) == result["total"]
+        for tag_list, match_all, media_type in cases[:50]:
+            params = {"tag": tag_list, "match": "all" if match_all else "any"}
+            if media_type:
+                params["media_type"] = media_type
+            start = time.perf_counter()
+            assert client.get("/api/media/query", params=params).status_code == 200
+            http_ms.append(1000 * (time.perf_counter() - start))
+        print(f"{label} (avg {sum(len(sql_query(db, *c)[0]) for c in cases[:20]) // 20} matches):")
+        report("tag index + facets", index_ms)
+        report("SQL GROUP BY + facets", sql_ms)
+        report("GET /api/media/query (page of 50)", http_ms)
+    db.close()
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:4]))
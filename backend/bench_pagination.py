@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark deep pagination of the forum discussion listing.
+Seeds users, categories and discussions with bulk inserts, then compares
+p50/p95 latency of fetching page 1, page 100 and page 1,000 (50 rows each)
+with keyset cursors (what /api/forum/discussions does) against the same
+pages fetched with LIMIT/OFFSET, and times the endpoint end to end while
+walking the cursor chain.
+
+Usage: python bench_pagination.py [discussions] [samples]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='jijue_bench_'), 'bench.db')}"
+
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+from database import SessionLocal, create_all_tables, engine
+from db_models import Discussion, ForumCategory, User, UserRole
+from forum import _discussion_query, load_discussions
+from main import app
+from pagination import NEXT_CURSOR_HEADER, PageParams, encode_cursor
+
+PAGE = 50
+
+def seed(discussions: int):
+    """Bulk-insert 200 authors, 8 categories and `discussions` discussions."""
+    create_all_tables()
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": u, "full_name": f"User {u}", "email": f"user{u}@example.com", "hashed_password": "x",
+             "role": UserRole.STUDENT.name}
+            for u in range(1, 201)
+        ])
+        connection.execute(ForumCategory.__table__.insert(), [{"id": c, "name": f"Category {c}"} for c in range(1, 9)])
+        connection.execute(Discussion.__table__.insert(), [
+            {"id": d, "user_id": random.randint(1, 200), "category_id": random.randint(1, 8), "title": f"Topic {d}",
+             "content": "Body", "created_at": start + timedelta(seconds=d * 30 + random.randint(0, 29))}
+            for d in range(1, discussions + 1)
+        ])
+
+def offset_page(db, page_number: int):
+    query = _discussion_query().order_by(Discussion.created_at.desc(), Discussion.id.desc())
+    return db.execute(query.limit(PAGE).offset((page_number - 1) * PAGE)).all()
+
+def keyset_cursors(db, pages: list) -> dict:
+    """The cursor that starts each page, taken from the row just before it."""
+    cursors = {}
+    for page_number in pages:
+        if page_number > 1:
+            last = offset_page(db, page_number - 1)[-1][0]
+            cursors[page_number] = encode_cursor(last.created_at, last.id)
+    return cursors
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def report(label, latencies):
+    print(f"  {label:<34} p50 {percentile(latencies, 0.50):8.2f} ms   p95 {percentile(latencies, 0.95):8.2f} ms")
+
+def run_benchmark(discussions: int = 100_000, samples: int = 50):
+    random.seed(7)
+    started = time.perf_counter()
+    seed(discussions)
+    print(f"Seeded {discussions} discussions in {time.perf_counter() - started:.1f}s")
+
+    db = SessionLocal()
+    pages = [1, 100, 1000]
+    cursors = keyset_cursors(db, pages)
+    for page_number in pages:
+        keyset_ms, offset_ms = [], []
+        params = PageParams(cursors.get(page_number), PAGE)
+        for _ in range(samples):
+            start = time.perf_counter()
+            keyset_rows = load_discussions(db, params, Response())
+            keyset_ms.append(1000 * (time.perf_counter() - start))
+            start = time.perf_counter()
+            offset_rows = offset_page(db, page_number)
+            offset_ms.append(1000 * (time.perf_counter() - start))
+        assert [row.id for row in keyset_rows] == [row[0].id for row in offset_rows]
+        print(f"Page {page_number} of {PAGE}:")
+        report("keyset cursor", keyset_ms)
+        report("LIMIT/OFFSET", offset_ms)
+    db.close()
+
+    client = TestClient(app)
+    http_ms, cursor = [], None
+    for _ in range(1000):
+        start = time.perf_counter()
+        response = client.get("/api/forum/discussions", params={"limit": PAGE, **({"cursor": cursor} if cursor else {})})
+        http_ms.append(1000 * (time.perf_counter() - start))
+        cursor = response.headers[NEXT_CURSOR_HEADER]
+    print("GET /api/forum/discussions walking the cursor chain:")
+    report("pages 1-10", http_ms[:10])
+    report("pages 991-1000", http_ms[-10:])
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,143 @@
+"""
+In-process TTL + LRU cache for Jijue LMS read paths.
+Expired entries are revalidated against a cheap version stamp before being
+rebuilt, and concurrent misses on the same key are coalesced (single-flight)
+so only one request does the expensive load.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    """A cached value with the version it was built from and its expiry time."""
+    __slots__ = ("value", "version", "expires_at")
+
+    def __init__(self, value, version, expires_at):
+        self.value = value
+        self.version = version
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """A load in progress that other callers for the same key can wait on."""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a time-to-live per entry and LRU eviction.
+
+    Values are built by `get_or_load(key, version_fn, loader)`:
+    - a fresh entry is returned without touching the loader or the version
+      (`get_fresh(key)` does only this, for callers with a cheaper fast path);
+    - an expired entry is kept if `version_fn()` still matches, otherwise
+      rebuilt with `loader(version)`;
+    - only one thread runs the loader for a given key, the others wait for it.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_fresh(self, key):
+        """The value for `key` if a fresh entry exists, else None; never loads."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= self._clock():
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def get_or_load(self, key, version_fn, loader):
+        """Return the cached value for `key`, loading or revalidating it if needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            version = version_fn()
+            if entry is not None and entry.version == version:
+                value = entry.value
+                revalidated = True
+            else:
+                value = loader(version)
+                revalidated = False
+            flight.value = value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.error is None:
+                    if revalidated:
+                        self.revalidations += 1
+                    else:
+                        self.misses += 1
+                    self._store(key, flight.value, version)
+            flight.done.set()
+
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """Counters for sizing the cache."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _store(self, key, value, version):
+        """Insert or refresh an entry; caller must hold the lock."""
+        self._entries[key] = _Entry(value, version, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,161 @@
+"""
+Cached read access to the course catalog for Jijue LMS.
+Course list and course trees are served as pre-serialized JSON bytes from an
+in-process TTLCache and are revalidated against the updated_at columns of
+Course, Module and Lesson. Course trees are additionally materialized in the
+course_snapshots table so a cold worker does not have to re-render them.
+"""
+import os
+from datetime import datetime
+from typing import List
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from cache import TTLCache
+from database import SessionLocal
+from db_models import Course, CourseSnapshot, Module, Lesson
+from http_cache import Validators
+from models import CourseDetailResponse, CourseResponse
+from progress import UPSERT_INSERTS
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512"))
+
+CATALOG_KEY = "catalog"
+
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_MAX_ENTRIES, ttl=CATALOG_CACHE_TTL_SECONDS)
+
+
+_course_list_adapter = TypeAdapter(List[CourseResponse])
+
+
+class CatalogEntry:
+    """Cached JSON response bytes together with their HTTP validators."""
+    __slots__ = ("body", "validators")
+
+    def __init__(self, body, validators: Validators):
+        self.body = body
+        self.validators = validators
+
+
+# --- Version stamps ---
+
+def catalog_version(db) -> tuple:
+    """Latest course change plus the course count (so deletions are noticed)."""
+    return tuple(db.execute(select(func.max(Course.updated_at), func.count(Course.id))).one())
+
+
+def course_tree_version(db, course_id: int) -> tuple:
+    """Latest change anywhere in a course tree, plus module and lesson counts."""
+    module_ids = select(Module.id).where(Module.course_id == course_id)
+    return tuple(db.execute(select(
+        select(Course.updated_at).where(Course.id == course_id).scalar_subquery(),
+        select(func.max(Module.updated_at)).where(Module.course_id == course_id).scalar_subquery(),
+        select(func.count(Module.id)).where(Module.course_id == course_id).scalar_subquery(),
+        select(func.max(Lesson.updated_at)).where(Lesson.module_id.in_(module_ids)).scalar_subquery(),
+        select(func.count(Lesson.id)).where(Lesson.module_id.in_(module_ids)).scalar_subquery(),
+    )).one())
+
+
+# --- Loaders ---
+
+def load_course_list(db) -> list:
+    """All courses, as response models."""
+    return [CourseResponse.model_validate(course) for course in db.query(Course).all()]
+
+
+def load_course_tree(db, course_id: int) -> CourseDetailResponse:
+    """A course with its ordered modules and lessons, loaded in three queries."""
+    course = (
+        db.query(Course)
+        .options(selectinload(Course.modules).selectinload(Module.lessons))
+        .filter(Course.id == course_id)
+        .first()
+    )
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return CourseDetailResponse.model_validate(course)
+
+
+def render_course_list(db) -> bytes:
+    """Course list serialized to JSON bytes."""
+    return _course_list_adapter.dump_json(load_course_list(db))
+
+
+def render_course_tree(db, course_id: int) -> bytes:
+    """Course tree serialized to JSON bytes."""
+    return load_course_tree(db, course_id).model_dump_json().encode("utf-8")
+
+
+# --- Materialized course trees ---
+
+def materialize_course_tree(db, course_id: int, validators: Validators) -> bytes:
+    """
+    Return the stored JSON for this version of the course tree, re-rendering
+    and storing it first if the snapshot is missing or stale.
+    The snapshot is written through its own session so the caller's session
+    (possibly a read-only one) is never used for writes, as an upsert so
+    workers materializing the same course at once do not collide.
+    """
+    snapshot = db.get(CourseSnapshot, course_id)
+    if snapshot is not None and snapshot.etag == validators.etag:
+        return snapshot.body
+
+    body = render_course_tree(db, course_id)
+    writer = SessionLocal()
+    try:
+        row = {"course_id": course_id, "etag": validators.etag, "body": body, "generated_at": datetime.utcnow()}
+        insert = UPSERT_INSERTS.get(writer.get_bind().dialect.name)
+        if insert is not None:
+            statement = insert(CourseSnapshot.__table__).values(row)
+            writer.execute(statement.on_conflict_do_update(
+                index_elements=[CourseSnapshot.course_id],
+                set_={"etag": statement.excluded.etag, "body": statement.excluded.body,
+                      "generated_at": statement.excluded.generated_at},
+            ))
+            writer.commit()
+        else:
+            try:
+                writer.merge(CourseSnapshot(**row))
+                writer.commit()
+            except IntegrityError:
+                # Another worker stored the snapshot first
+                writer.rollback()
+    finally:
+        writer.close()
+    return body
+
+
+def materialize_all_course_trees(db) -> int:
+    """Bring every course snapshot up to date; returns the number of courses processed."""
+    course_ids = [course_id for (course_id,) in db.query(Course.id).order_by(Course.id)]
+    for course_id in course_ids:
+        validators = Validators.from_version("course", course_id, course_tree_version(db, course_id))
+        materialize_course_tree(db, course_id, validators)
+    return len(course_ids)
+
+
+# --- Cached accessors ---
+
+def get_course_list(db) -> CatalogEntry:
+    """Course list, served from the catalog cache."""
+    return catalog_cache.get_or_load(
+        CATALOG_KEY,
+        lambda: catalog_version(db),
+        lambda version: CatalogEntry(
+            render_course_list(db), Validators.from_version("courses", CATALOG_KEY, version)
+        ),
+    )
+
+
+def get_course_tree(db, course_id: int) -> CatalogEntry:
+    """Course tree keyed on course id, served from the catalog cache or its snapshot."""
+    def load(version):
+        validators = Validators.from_version("course", course_id, version)
+        return CatalogEntry(materialize_course_tree(db, course_id, validators), validators)
+
+    return catalog_cache.get_or_load(course_id, lambda: course_tree_version(db, course_id), load)
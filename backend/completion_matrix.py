@@ -0,0 +1,338 @@
+"""
+In-memory lesson completion matrix for Jijue LMS.
+For every course the completed lessons are kept as bits in two layouts: a
+row per user (bit = lesson position in course order) and a column per
+lesson (bit = user id). A user's percentage is a popcount of their row;
+per-lesson counts, "how many finished module X" and cohort questions are
+ANDs and popcounts of columns, so none of them GROUP BY lesson_progress.
+
+Rows and columns are indexed directly by user id (ids are dense), so
+200k users x 200 lessons costs about 2 x 5 MB. The matrix is loaded at
+startup and updated by this worker's progress writes; every
+COMPLETION_MATRIX_SYNC_SECONDS a read first re-applies lesson_progress rows
+whose updated_at moved (other workers, scripts) and drops courses whose
+lessons were added, removed or reordered, reloading them on next use.
+
+Deleted rows leave no updated_at behind, so on SQLite a trigger records
+every deleted COMPLETED row in lesson_progress_deletions (reset_progress.py,
+cascades, raw SQL alike) and the sync clears those bits by id watermark.
+"""
+import os
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select
+
+from database import Base
+from db_models import Lesson, LessonProgress, LessonProgressDeletion, LessonStatus, Module
+from progress import percentage
+
+COMPLETION_MATRIX_SYNC_SECONDS = float(os.getenv("COMPLETION_MATRIX_SYNC_SECONDS", "5"))
+# Rows stamped shortly before the last sync may commit after it; re-read them
+COMPLETION_MATRIX_SYNC_OVERLAP_SECONDS = float(os.getenv("COMPLETION_MATRIX_SYNC_OVERLAP_SECONDS", "10"))
+LOAD_CHUNK_ROWS = 50_000
+
+DELETION_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS lesson_progress_completed_delete AFTER DELETE ON lesson_progress "
+    f"WHEN old.status = '{LessonStatus.COMPLETED.name}' BEGIN "
+    "INSERT INTO lesson_progress_deletions (user_id, lesson_id) VALUES (old.user_id, old.lesson_id); END"
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install_deletion_trigger(metadata, connection, **kw):
+    """Record deleted completions for the matrix sync."""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(DELETION_TRIGGER)
+
+
+class CourseMatrix:
+    """Completion bits for one course, by user row and by lesson column."""
+
+    def __init__(self, course_id: int, lessons: list):
+        """`lessons` is [(lesson_id, module_id)] in course order."""
+        self.course_id = course_id
+        self.lesson_ids = [lesson_id for lesson_id, _ in lessons]
+        self.position = {lesson_id: index for index, lesson_id in enumerate(self.lesson_ids)}
+        self.modules = {}  # module id -> lesson positions
+        for index, (_, module_id) in enumerate(lessons):
+            self.modules.setdefault(module_id, []).append(index)
+        self.row_bytes = (len(lessons) + 7) // 8
+        self.capacity = 0  # users; always a multiple of 8
+        self.rows = bytearray()
+        self.columns = [bytearray() for _ in lessons]
+        self.counts = array("I", bytes(4 * len(lessons)))
+
+    def _grow(self, user_id: int):
+        if user_id < self.capacity:
+            return
+        capacity = max(64, 2 * self.capacity, (user_id + 8) & ~7)
+        added = capacity - self.capacity
+        self.rows.extend(bytes(added * self.row_bytes))
+        for column in self.columns:
+            column.extend(bytes(added // 8))
+        self.capacity = capacity
+
+    def set(self, user_id: int, lesson_id: int, completed: bool) -> bool:
+        """Mark a lesson (in)complete for a user; returns True if a bit changed."""
+        position = self.position.get(lesson_id)
+        if position is None:
+            return False
+        self._grow(user_id)
+        offset, mask = user_id * self.row_bytes + position // 8, 1 << (position % 8)
+        if bool(self.rows[offset] & mask) == completed:
+            return False
+        self.rows[offset] ^= mask
+        self.columns[position][user_id // 8] ^= 1 << (user_id % 8)
+        self.counts[position] += 1 if completed else -1
+        return True
+
+    def fill(self, completions):
+        """Bulk-set (user_id, lesson_id) completions of a matrix being loaded; call recount() after."""
+        rows, columns, row_bytes, position = self.rows, self.columns, self.row_bytes, self.position
+        for user_id, lesson_id in completions:
+            index = position[lesson_id]
+            if user_id >= self.capacity:
+                self._grow(user_id)
+            rows[user_id * row_bytes + (index >> 3)] |= 1 << (index & 7)
+            columns[index][user_id >> 3] |= 1 << (user_id & 7)
+
+    def recount(self):
+        """Recompute the per-lesson counters from the columns."""
+        self.counts = array("I", (int.from_bytes(column, "little").bit_count() for column in self.columns))
+
+    def _row(self, user_id: int) -> int:
+        if not 0 <= user_id < self.capacity:
+            return 0
+        offset = user_id * self.row_bytes
+        return int.from_bytes(self.rows[offset:offset + self.row_bytes], "little")
+
+    def _column(self, position: int) -> int:
+        return int.from_bytes(self.columns[position], "little")
+
+    def _users_with_all(self, positions) -> int:
+        """Bitset of users who completed every lesson at `positions`."""
+        if not positions:
+            return 0
+        users = self._column(positions[0])
+        for position in positions[1:]:
+            users &= self._column(position)
+        return users
+
+    def completed_lessons(self, user_id: int) -> list:
+        row = self._row(user_id)
+        return [lesson_id for index, lesson_id in enumerate(self.lesson_ids) if row >> index & 1]
+
+    def user_percentage(self, user_id: int) -> int:
+        return percentage(self._row(user_id).bit_count(), len(self.lesson_ids))
+
+    def lesson_counts(self) -> dict:
+        """Users who completed each lesson, in course order."""
+        return dict(zip(self.lesson_ids, self.counts))
+
+    def module_counts(self) -> dict:
+        """Users who completed every lesson of each module."""
+        return {module_id: self._users_with_all(positions).bit_count() for module_id, positions in self.modules.items()}
+
+    def course_count(self) -> int:
+        """Users who completed every lesson of the course."""
+        return self._users_with_all(list(range(len(self.lesson_ids)))).bit_count()
+
+    def cohort(self, user_ids) -> dict:
+        """Lesson counts within a cohort, the lessons all of them completed, and per-user percentages."""
+        members = bytearray(self.capacity // 8)
+        everyone = (1 << len(self.lesson_ids)) - 1 if user_ids else 0
+        for user_id in user_ids:
+            if 0 <= user_id < self.capacity:
+                members[user_id // 8] |= 1 << (user_id % 8)
+            everyone &= self._row(user_id)
+        members = int.from_bytes(members, "little")
+        return {
+            "lessons": {
+                lesson_id: (self._column(index) & members).bit_count()
+                for index, lesson_id in enumerate(self.lesson_ids)
+            },
+            "completed_by_all": [lesson_id for index, lesson_id in enumerate(self.lesson_ids) if everyone >> index & 1],
+            "completed_course": (self._users_with_all(list(range(len(self.lesson_ids)))) & members).bit_count(),
+            "progress": {user_id: self.user_percentage(user_id) for user_id in user_ids},
+        }
+
+    def nbytes(self) -> int:
+        """Bytes held by the bitsets, counters and lesson index."""
+        return (
+            sys.getsizeof(self.rows)
+            + sum(sys.getsizeof(column) for column in self.columns)
+            + sys.getsizeof(self.counts)
+            + sys.getsizeof(self.position)
+            + sys.getsizeof(self.lesson_ids)
+        )
+
+
+class CompletionMatrix:
+    """The CourseMatrix of every course, kept in step with lesson_progress."""
+
+    def __init__(self, sync_interval: float = COMPLETION_MATRIX_SYNC_SECONDS,
+                 sync_overlap: float = COMPLETION_MATRIX_SYNC_OVERLAP_SECONDS):
+        self.sync_interval = sync_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self._lock = threading.RLock()
+        self._courses = {}  # course id -> CourseMatrix
+        self._lesson_course = {}  # lesson id -> course id, for loaded courses
+        self._stamps = {}  # course id -> content stamp the matrix was built from
+        self._loaded = False
+        self._watermark = None
+        self._deletion_watermark = 0  # last lesson_progress_deletions id applied
+        self._last_sync = 0.0
+        self._stats = {"loads": 0, "syncs": 0, "synced_rows": 0, "synced_deletions": 0, "writes_applied": 0,
+                       "load_ms": 0.0}
+
+    @staticmethod
+    def _content_stamps(db, course_ids=None) -> dict:
+        """Per course: latest lesson/module change and lesson count."""
+        query = (
+            select(Module.course_id, func.max(Lesson.updated_at), func.max(Module.updated_at), func.count(Lesson.id))
+            .join(Lesson, Lesson.module_id == Module.id)
+            .group_by(Module.course_id)
+        )
+        if course_ids is not None:
+            query = query.where(Module.course_id.in_(course_ids))
+        return {course_id: tuple(stamp) for course_id, *stamp in db.execute(query)}
+
+    def _load_courses(self, db, course_ids=None):
+        started = time.perf_counter()
+        lessons = (
+            select(Lesson.id, Lesson.module_id, Module.course_id)
+            .join(Module, Lesson.module_id == Module.id)
+            .order_by(Module.course_id, Module.order, Module.id, Lesson.order, Lesson.id)
+        )
+        completed = (
+            select(LessonProgress.user_id, LessonProgress.lesson_id)
+            .where(LessonProgress.status == LessonStatus.COMPLETED)
+        )
+        if course_ids is not None:
+            lessons = lessons.where(Module.course_id.in_(course_ids))
+            completed = completed.where(
+                LessonProgress.lesson_id.in_(select(Lesson.id).join(Module).where(Module.course_id.in_(course_ids)))
+            )
+        stamps = self._content_stamps(db, course_ids)
+
+        by_course = {}
+        for lesson_id, module_id, course_id in db.execute(lessons):
+            by_course.setdefault(course_id, []).append((lesson_id, module_id))
+        for course_id in list(self._courses) if course_ids is None else course_ids:
+            self._drop(course_id)
+        for course_id, course_lessons in by_course.items():
+            self._courses[course_id] = CourseMatrix(course_id, course_lessons)
+            self._stamps[course_id] = stamps.get(course_id)
+            for lesson_id, _ in course_lessons:
+                self._lesson_course[lesson_id] = course_id
+        for chunk in db.execute(completed.execution_options(yield_per=LOAD_CHUNK_ROWS)).partitions():
+            by_matrix = {}
+            for user_id, lesson_id in chunk:
+                course_id = self._lesson_course.get(lesson_id)
+                if course_id is not None:
+                    by_matrix.setdefault(course_id, []).append((user_id, lesson_id))
+            for course_id, completions in by_matrix.items():
+                self._courses[course_id].fill(completions)
+        for course_id in by_course:
+            self._courses[course_id].recount()
+
+        self._stats["loads"] += 1
+        self._stats["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _drop(self, course_id: int):
+        matrix = self._courses.pop(course_id, None)
+        self._stamps.pop(course_id, None)
+        if matrix is not None:
+            for lesson_id in matrix.lesson_ids:
+                self._lesson_course.pop(lesson_id, None)
+
+    def load(self, db):
+        """Build every course's matrix from lesson_progress (startup)."""
+        with self._lock:
+            self._watermark = datetime.utcnow()
+            self._deletion_watermark = db.execute(select(func.max(LessonProgressDeletion.id))).scalar() or 0
+            self._courses.clear()
+            self._lesson_course.clear()
+            self._stamps.clear()
+            self._load_courses(db)
+            self._loaded = True
+            self._last_sync = time.monotonic()
+
+    def sync(self, db):
+        """Re-apply recently updated progress rows and drop courses whose lessons changed."""
+        with self._lock:
+            stamps = self._content_stamps(db)
+            for course_id in set(self._courses) | set(stamps):
+                if stamps.get(course_id) != self._stamps.get(course_id):
+                    self._drop(course_id)
+
+            deletions = db.execute(
+                select(LessonProgressDeletion.id, LessonProgressDeletion.user_id, LessonProgressDeletion.lesson_id)
+                .where(LessonProgressDeletion.id > self._deletion_watermark)
+                .order_by(LessonProgressDeletion.id)
+            ).all()
+            for deletion_id, user_id, lesson_id in deletions:
+                self._apply(user_id, lesson_id, False)
+                self._deletion_watermark = deletion_id
+            self._stats["synced_deletions"] += len(deletions)
+
+            # Rows re-created since their deletion are set again here
+            since = self._watermark - self.sync_overlap
+            self._watermark = datetime.utcnow()
+            rows = db.execute(
+                select(LessonProgress.user_id, LessonProgress.lesson_id, LessonProgress.status)
+                .where(LessonProgress.updated_at >= since)
+            ).all()
+            for user_id, lesson_id, status in rows:
+                self._apply(user_id, lesson_id, status == LessonStatus.COMPLETED)
+            self._stats["syncs"] += 1
+            self._stats["synced_rows"] += len(rows)
+            self._last_sync = time.monotonic()
+
+    def _apply(self, user_id: int, lesson_id: int, completed: bool) -> bool:
+        course_id = self._lesson_course.get(lesson_id)
+        return course_id is not None and self._courses[course_id].set(user_id, lesson_id, completed)
+
+    def apply(self, user_id: int, lesson_id: int, completed: bool):
+        """Record a committed completion change made by this worker."""
+        with self._lock:
+            if self._apply(user_id, lesson_id, completed):
+                self._stats["writes_applied"] += 1
+
+    def course(self, db, course_id: int) -> CourseMatrix | None:
+        """The course's matrix, loading or syncing first when due; None if it has no lessons."""
+        with self._lock:
+            if not self._loaded:
+                self.load(db)
+            elif time.monotonic() - self._last_sync >= self.sync_interval:
+                self.sync(db)
+            if course_id not in self._courses:
+                self._load_courses(db, [course_id])
+            return self._courses.get(course_id)
+
+    def clear(self):
+        """Forget everything; the next read reloads from the database."""
+        with self._lock:
+            self._courses.clear()
+            self._lesson_course.clear()
+            self._stamps.clear()
+            self._loaded = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            nbytes = sum(matrix.nbytes() for matrix in self._courses.values()) + sys.getsizeof(self._lesson_course)
+            return {
+                "courses": len(self._courses),
+                "lessons": len(self._lesson_course),
+                "user_capacity": max((matrix.capacity for matrix in self._courses.values()), default=0),
+                "bytes": nbytes,
+                "megabytes": round(nbytes / 2**20, 2),
+                **self._stats,
+            }
+
+
+completion_matrix = CompletionMatrix()
@@ -0,0 +1,219 @@
+"""
+Response compression for Jijue LMS.
+CompressionMiddleware negotiates brotli or gzip from Accept-Encoding and
+compresses JSON and text bodies of at least COMPRESSION_MIN_BYTES.
+
+Responses carrying a strong ETag (catalog, course trees, resources, media)
+are cacheable representations that repeat until their content changes, so
+their compressed variants are cached by (digest of the body, encoding):
+each distinct body is compressed once, at a higher level than per-request
+compression can afford, and later requests only hash and copy bytes.
+Keying on the body rather than the ETag means a version stamp that misses
+a change can never serve an old body compressed. A variant gets its own
+ETag (the identity ETag with an -gzip / -br suffix) as HTTP requires;
+http_cache treats them as equal when revalidating.
+
+Bodies of at least COMPRESSION_THREAD_MIN_BYTES are compressed (and their
+variant looked up, which may wait on another request building it) in a
+worker thread, so a cache miss on a large course tree does not stall the
+event loop for every other request.
+
+brotli is optional: without the package only gzip is offered.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+from cache import TTLCache
+from http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "512"))
+COMPRESSION_THREAD_MIN_BYTES = int(os.getenv("COMPRESSION_THREAD_MIN_BYTES", "65536"))
+
+# (per request, cached variant) effort per encoding
+GZIP_LEVELS = (6, 9)
+BROTLI_QUALITIES = (4, 9)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def supported_encodings() -> tuple:
+    """Encodings we can produce, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """The best supported encoding the client accepts (q > 0), or None for identity."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in supported_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    """Compress a body; `cached` variants get the higher effort level."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITIES[cached])
+    return gzip.compress(body, compresslevel=GZIP_LEVELS[cached], mtime=0)
+
+
+def _compressible(headers: Headers, status: int) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        200 <= status < 300 and status not in (204, 206)
+        and "content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+class CompressionStats:
+    """Bytes saved and time spent compressing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.responses = 0
+            self.cached_responses = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.compress_seconds = 0.0
+
+    def record(self, bytes_in: int, bytes_out: int, seconds: float, cached: bool):
+        with self._lock:
+            self.responses += 1
+            self.cached_responses += cached
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.compress_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "cached_responses": self.cached_responses,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+                "compress_ms": round(1000 * self.compress_seconds, 1),
+                "encodings": list(supported_encodings()),
+                "min_bytes": COMPRESSION_MIN_BYTES,
+            }
+
+
+# (body digest, encoding) -> compressed body; a digest names immutable bytes, so entries never go stale
+compressed_variants = TTLCache(maxsize=COMPRESSION_CACHE_ENTRIES, ttl=24 * 3600)
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete (non-streamed) response bodies.
+    Streamed bodies pass through unchanged.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, variants: TTLCache = compressed_variants,
+                 stats: CompressionStats = compression_stats, thread_min_size: int = COMPRESSION_THREAD_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+        self.variants = variants
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match", "")
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            start_message, start = start, None
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            streamed = message.get("more_body", False)
+
+            if start_message["status"] == 304:
+                # Answer with the ETag of the variant the client holds
+                etag = headers.get("etag")
+                if etag and encoding and encoded_etag(etag, encoding) in if_none_match:
+                    headers["ETag"] = encoded_etag(etag, encoding)
+                headers.add_vary_header("Accept-Encoding")
+            elif _compressible(headers, start_message["status"]):
+                headers.add_vary_header("Accept-Encoding")
+                if encoding and not streamed and len(body) >= self.minimum_size:
+                    body = await self._encode(body, encoding, headers)
+                    headers["Content-Length"] = str(len(body))
+                    message = {**message, "body": body}
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _encode(self, body: bytes, encoding: str, headers: MutableHeaders) -> bytes:
+        etag = headers.get("etag")
+        started = time.perf_counter()
+        if etag and not etag.startswith("W/"):
+            built = []
+
+            def load(version):
+                built.append(True)
+                return compress(body, encoding, cached=True)
+
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            encoded = await self._run(
+                len(body), lambda: self.variants.get_or_load((digest, encoding), lambda: None, load),
+            )
+            headers["ETag"] = encoded_etag(etag, encoding)
+            cached = not built
+        else:
+            encoded = await self._run(len(body), lambda: compress(body, encoding))
+            cached = False
+        self.stats.record(len(body), len(encoded), time.perf_counter() - started, cached)
+        headers["Content-Encoding"] = encoding
+        return encoded
+
+    async def _run(self, size: int, work):
+        """Run compression work inline for small bodies, in a worker thread for large ones."""
+        if size >= self.thread_min_size:
+            return await anyio.to_thread.run_sync(work)
+        return work()
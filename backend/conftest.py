@@ -0,0 +1,53 @@
+"""
+Shared pytest fixtures for the Jijue LMS backend.
+Points the app at a throwaway SQLite database so tests never touch jijue_lms.db.
+"""
+import os
+import tempfile
+
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="jijue_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DB_DIR, 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import Base, SessionLocal, engine, create_all_tables
+
+
+@pytest.fixture()
+def db():
+    """Fresh schema and a database session for each test."""
+    from catalog import catalog_cache
+    from completion_matrix import completion_matrix
+    from compression import compressed_variants, compression_stats
+    from dashboard import dashboard_cache
+    from forum_views import view_counter
+    from heartbeats import heartbeat_buffer
+    from media_index import media_index
+    from rate_limit import auth_account_limiter, auth_ip_limiter
+
+    Base.metadata.drop_all(bind=engine)
+    create_all_tables()
+    catalog_cache.invalidate()
+    dashboard_cache.invalidate()
+    auth_ip_limiter.clear()
+    auth_account_limiter.clear()
+    heartbeat_buffer.clear()
+    view_counter.clear()
+    completion_matrix.clear()
+    media_index.clear()
+    compressed_variants.invalidate()
+    compression_stats.reset()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture()
+def client(db):
+    """Test client bound to the same throwaway database as the `db` fixture."""
+    from main import app
+    return TestClient(app)
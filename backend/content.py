@@ -0,0 +1,108 @@
+"""
+Read access to the resources directory and media library for Jijue LMS.
+Each listing has a cheap version stamp so handlers can answer conditional
+GETs before loading any rows, and is served in keyset pages on
+(created_at, id).
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from db_models import MediaLibrary, MediaTag, Resource, ResourceCategory
+from models import MediaResponse, ResourceCategoryResponse, ResourceResponse
+from pagination import PageParams, keyset_page, next_cursor
+
+
+# --- Version stamps ---
+# max(updated_at) notices rows edited in place, max(created_at) new rows, and
+# the row counts (with max(id) for tags) deletions.
+
+def resource_categories_version(db) -> tuple:
+    """Newest and last edited resource category plus the category count."""
+    return tuple(db.execute(select(
+        func.max(ResourceCategory.created_at), func.count(ResourceCategory.id), func.max(ResourceCategory.updated_at),
+    )).one())
+
+
+def resources_version(db) -> tuple:
+    """Newest and last edited resource and category, plus both row counts."""
+    return tuple(db.execute(select(
+        select(func.max(Resource.created_at)).scalar_subquery(),
+        select(func.count(Resource.id)).scalar_subquery(),
+        select(func.max(ResourceCategory.created_at)).scalar_subquery(),
+        select(func.count(ResourceCategory.id)).scalar_subquery(),
+        select(func.max(Resource.updated_at)).scalar_subquery(),
+        select(func.max(ResourceCategory.updated_at)).scalar_subquery(),
+    )).one())
+
+
+def media_version(db) -> tuple:
+    """Newest media item, item and tag counts, newest tag id, and the last edits of both."""
+    return tuple(db.execute(select(
+        select(func.max(MediaLibrary.created_at)).scalar_subquery(),
+        select(func.count(MediaLibrary.id)).scalar_subquery(),
+        select(func.count(MediaTag.id)).scalar_subquery(),
+        select(func.max(MediaTag.id)).scalar_subquery(),
+        select(func.max(MediaLibrary.updated_at)).scalar_subquery(),
+        select(func.max(MediaTag.updated_at)).scalar_subquery(),
+    )).one())
+
+
+# --- Loaders ---
+
+def load_resource_categories(db) -> list:
+    """All resource categories."""
+    categories = db.query(ResourceCategory).order_by(ResourceCategory.id).all()
+    return [ResourceCategoryResponse.model_validate(category) for category in categories]
+
+
+def resource_to_response(resource: Resource) -> ResourceResponse:
+    """Shape a resource the way the resources directory page expects it."""
+    return ResourceResponse(
+        id=resource.id,
+        title=resource.title,
+        description=resource.description,
+        url=resource.url,
+        type=resource.resource_type,
+        icon=resource.icon,
+        category_id=resource.category_id,
+        category=resource.category.name,
+    )
+
+
+def load_resources(db, page: PageParams, response) -> list:
+    """One page of resources, oldest first, with their category names."""
+    resources = db.scalars(
+        keyset_page(select(Resource).options(joinedload(Resource.category)), Resource.created_at, Resource.id, page)
+    ).all()
+    return [resource_to_response(resource) for resource in next_cursor(resources, page, response)]
+
+
+def media_to_response(media: MediaLibrary) -> MediaResponse:
+    """Shape a media library item with a flat list of tag names."""
+    return MediaResponse(
+        id=media.id,
+        title=media.title,
+        description=media.description,
+        media_type=media.media_type,
+        url=media.url,
+        thumbnail=media.thumbnail,
+        duration_minutes=media.duration_minutes,
+        tags=[tag.tag for tag in media.tags],
+    )
+
+
+def load_media(db, page: PageParams, response) -> list:
+    """One page of media library items, oldest first, with their tags."""
+    items = db.scalars(
+        keyset_page(select(MediaLibrary).options(selectinload(MediaLibrary.tags)), MediaLibrary.created_at, MediaLibrary.id, page)
+    ).all()
+    return [media_to_response(media) for media in next_cursor(items, page, response)]
+
+
+def load_media_items(db, ids: list) -> list:
+    """The given media items with their tags, in the order of `ids`."""
+    items = {
+        media.id: media
+        for media in db.query(MediaLibrary).options(selectinload(MediaLibrary.tags)).filter(MediaLibrary.id.in_(ids))
+    }
+    return [media_to_response(items[media_id]) for media_id in ids if media_id in items]
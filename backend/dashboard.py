@@ -0,0 +1,161 @@
+"""
+Per-user dashboard for Jijue LMS.
+The dashboard is built from the progress rollups (enrollments and
+module_progress) in one aggregate query plus the continue-learning cursor
+read, and cached per user as JSON bytes for a few seconds. A user's own
+progress writes drop their entry; other workers notice through the version
+stamp (latest enrollment activity) once the TTL runs out.
+"""
+import json
+import os
+
+from sqlalchemy import func, select
+
+from cache import TTLCache
+from catalog import get_course_list
+from database import ReadSessionLocal
+from db_models import Course, Enrollment, LessonStatus, Module, ModuleProgress
+from models import ContinueLearning, CourseItem, DashboardData, NavItem, TokenData
+from progress import get_continue_learning, percentage
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "15"))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "10000"))
+FEATURED_COURSE_COUNT = 2
+
+GUEST_KEY = "guest"
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_MAX_ENTRIES, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+QUICK_LINKS = [
+    CourseItem(
+        title="Community Forum",
+        description="Ask questions and share experiences.",
+        icon="MessageSquare",
+        color='primary',
+        link="/forum",
+    ),
+    CourseItem(
+        title="Find a Clinic",
+        description="Locate testing and support centers.",
+        icon="MapPin",
+        color='secondary',
+        link="/resources",
+    ),
+]
+
+NAVIGATION = [
+    NavItem(name="Dashboard", icon="LayoutDashboard", current=True, link="/dashboard"),
+    NavItem(name="Course Catalog", icon="School", current=False, link="/courses"),
+    NavItem(name="My Courses", icon="PlayCircle", current=False, link="/my-courses"),
+    NavItem(name="Community", icon="Users", current=False, link="/forum"),
+    NavItem(name="Resources", icon="Zap", current=False, link="/resources"),
+    NavItem(name="Settings", icon="Settings", current=False, link="/settings"),
+]
+
+START_LEARNING = ContinueLearning(
+    moduleTitle="Start your first course",
+    description="Browse the catalog and pick a course to begin.",
+    link="/courses",
+)
+
+
+def dashboard_version(db, user_id: int | None) -> tuple:
+    """The user's latest activity and enrollment count, plus the catalog stamp."""
+    columns = [
+        select(func.max(Course.updated_at)).scalar_subquery(),
+        select(func.count(Course.id)).scalar_subquery(),
+    ]
+    if user_id is not None:
+        columns += [
+            select(func.max(Enrollment.last_activity_at)).where(Enrollment.user_id == user_id).scalar_subquery(),
+            select(func.count(Enrollment.id)).where(Enrollment.user_id == user_id).scalar_subquery(),
+        ]
+    return tuple(db.execute(select(*columns)).one())
+
+
+def progress_summary(db, user_id: int) -> dict:
+    """Overall lesson progress and module counts from the rollup rows, in one query."""
+    enrolled_courses = select(Enrollment.course_id).where(Enrollment.user_id == user_id)
+    completed, total, modules_completed, total_modules = db.execute(select(
+        select(func.coalesce(func.sum(Enrollment.completed_lessons), 0))
+        .where(Enrollment.user_id == user_id).scalar_subquery(),
+        select(func.coalesce(func.sum(Enrollment.total_lessons), 0))
+        .where(Enrollment.user_id == user_id).scalar_subquery(),
+        select(func.count(ModuleProgress.id))
+        .where(ModuleProgress.user_id == user_id, ModuleProgress.status == LessonStatus.COMPLETED)
+        .scalar_subquery(),
+        select(func.count(Module.id)).where(Module.course_id.in_(enrolled_courses)).scalar_subquery(),
+    )).one()
+    return {
+        "progress": percentage(completed, total),
+        "modulesCompleted": modules_completed,
+        "totalModules": total_modules,
+    }
+
+
+def featured_courses(db) -> list:
+    """The first few catalog courses, taken from the cached course list."""
+    courses = json.loads(get_course_list(db).body)[:FEATURED_COURSE_COUNT]
+    return [
+        CourseItem(
+            title=course["title"],
+            description=course["description"] or "",
+            icon=course["icon"] or "School",
+            color=course["color"] or "primary",
+            link=f"/course/{course['id']}",
+        )
+        for course in courses
+    ]
+
+
+def build_dashboard(db, user: TokenData | None) -> bytes:
+    """Render the dashboard for a user (or a guest) to JSON bytes."""
+    summary = {"progress": 0, "modulesCompleted": 0, "totalModules": 0}
+    continue_learning = START_LEARNING
+    if user is not None:
+        summary = progress_summary(db, user.user_id)
+        resume = get_continue_learning(db, user.user_id)
+        if resume:
+            continue_learning = ContinueLearning(
+                moduleTitle=resume["module_title"] or resume["course_title"],
+                description=resume["course_title"],
+                link=resume["link"],
+            )
+    return DashboardData(
+        userName=user.full_name if user is not None and user.full_name else "Guest",
+        continueLearning=continue_learning,
+        featuredCourses=featured_courses(db),
+        quickLinks=QUICK_LINKS,
+        navigation=NAVIGATION,
+        **summary,
+    ).model_dump_json().encode("utf-8")
+
+
+def cache_key(user: TokenData | None):
+    return GUEST_KEY if user is None else user.user_id
+
+
+def get_dashboard(db, user: TokenData | None) -> bytes:
+    """Dashboard JSON for a user (or a guest), served from the per-user cache."""
+    user_id = user.user_id if user is not None else None
+    return dashboard_cache.get_or_load(
+        cache_key(user),
+        lambda: dashboard_version(db, user_id),
+        lambda version: build_dashboard(db, user),
+    )
+
+
+def cached_dashboard(user: TokenData | None) -> bytes | None:
+    """The cached dashboard while it is fresh, without opening a session."""
+    return dashboard_cache.get_fresh(cache_key(user))
+
+
+def load_dashboard(user: TokenData | None) -> bytes:
+    """get_dashboard() on its own read session, for callers outside a request's dependencies."""
+    with ReadSessionLocal() as db:
+        return get_dashboard(db, user)
+
+
+def invalidate_dashboard(user_id: int):
+    """Drop a user's cached dashboard after their own progress changed."""
+    dashboard_cache.invalidate(user_id)
@@ -1,9 +1,18 @@
 """
 Database configuration and connection setup for Jijue LMS.
 Uses SQLAlchemy ORM with SQLite for development.
+Provides both synchronous sessions (get_db) and asynchronous sessions
+(get_async_db) over the same DATABASE_URL, plus read-only sessions
+(get_read_db) for GET routes.
+
+Set DB_PROFILE=production to run SQLite in WAL mode with tuned pragmas, so
+catalog reads do not queue behind progress writes.
 """
 import os
-from sqlalchemy import create_engine
+from urllib.parse import quote
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # SQLite connection string for development
@@ -13,6 +22,44 @@ DATABASE_URL = os.getenv(
     "sqlite:///./jijue_lms.db"
 )
 
+# "development" keeps SQLite defaults; "production" enables WAL and the pragmas below
+DB_PROFILE = os.getenv("DB_PROFILE", "development")
+
+# Applied on every new SQLite connection in the production profile
+SQLITE_PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",  # readers no longer block behind writers
+    "synchronous": "NORMAL",  # safe with WAL, fsyncs only at checkpoints
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),  # negative = KiB, i.e. 64 MiB
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+def sqlite_pragmas(read_only: bool = False) -> dict:
+    """Pragmas for a new SQLite connection under the current profile."""
+    if DB_PROFILE != "production":
+        return {"query_only": "ON"} if read_only else {}
+    pragmas = dict(SQLITE_PRODUCTION_PRAGMAS)
+    if read_only:
+        # journal_mode needs write access; the database is already in WAL mode
+        del pragmas["journal_mode"]
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+def apply_sqlite_pragmas(target_engine, pragmas: dict):
+    """Run the given PRAGMA statements on every new connection of an engine."""
+    if not pragmas:
+        return
+
+    @event.listens_for(target_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
@@ -20,10 +67,66 @@ engine = create_engine(
     pool_pre_ping=True if "postgresql" in DATABASE_URL else False,
     echo=False  # Set to True for SQL query logging
 )
+if IS_SQLITE:
+    apply_sqlite_pragmas(engine, sqlite_pragmas())
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def read_only_url(url: str) -> str | None:
+    """SQLite URL opening the same file in read-only mode, or None if not applicable."""
+    parsed = make_url(url)
+    if not parsed.drivername.startswith("sqlite") or parsed.database in (None, "", ":memory:"):
+        return None
+    path = quote(os.path.abspath(parsed.database))
+    return f"{parsed.drivername}:///file:{path}?mode=ro&uri=true"
+
+# Separate read-only engine/pool for GET routes. For SQLite files it opens the
+# database with mode=ro; READ_DATABASE_URL can point at a replica elsewhere.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or (read_only_url(DATABASE_URL) if IS_SQLITE else None)
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(
+        READ_DATABASE_URL,
+        connect_args={"check_same_thread": False} if "sqlite" in READ_DATABASE_URL else {},
+        pool_pre_ping=True if "postgresql" in READ_DATABASE_URL else False,
+        echo=False
+    )
+    if READ_DATABASE_URL.startswith("sqlite"):
+        apply_sqlite_pragmas(read_engine, sqlite_pragmas(read_only=True))
+else:
+    read_engine = engine
+
+# Create read-only session factory
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async drivers used for each backend when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync database URL (e.g. sqlite:///./x.db) to use the matching async driver."""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}{sep}{rest}"
+
+# Async engine over the same database; ASYNC_DATABASE_URL overrides the derived URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True if "postgresql" in ASYNC_DATABASE_URL else False,
+    echo=False
+)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
+
+# Create async session factory (objects stay usable after commit, no lazy reloads)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class for all models
 Base = declarative_base()
 
@@ -35,6 +138,19 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Dependency for FastAPI to get a read-only database session (for GET routes)."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Dependency for FastAPI to get an async database session (for async def routes)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_all_tables():
     """Create all database tables (run once during startup)."""
     Base.metadata.create_all(bind=engine)
@@ -1,9 +1,13 @@
 """
 SQLAlchemy ORM models for Jijue LMS.
 Defines User, Course, Module, Lesson, and Enrollment schemas.
+
+Composite lookups are declared as indexes in __table_args__; uniqueness on
+(user, item) pairs uses unique indexes so migrate_db.py can add them
+to an existing SQLite database without rebuilding tables.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Boolean, LargeBinary, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -52,12 +56,25 @@ class Course(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan")
+    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan", order_by="Module.order")
     enrollments = relationship("Enrollment", back_populates="course", cascade="all, delete-orphan")
+    snapshot = relationship("CourseSnapshot", uselist=False, cascade="all, delete-orphan")
+
+class CourseSnapshot(Base):
+    """Pre-rendered JSON bytes for a course tree, served as-is by the course detail endpoint."""
+    __tablename__ = "course_snapshots"
+
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    etag = Column(String, nullable=False)  # ETag of the course tree version the body was rendered from
+    body = Column(LargeBinary, nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Module(Base):
     """Module/Chapter model within a course."""
     __tablename__ = "modules"
+    __table_args__ = (
+        Index("ix_modules_course_id_order", "course_id", "order"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
@@ -69,11 +86,14 @@ class Module(Base):
 
     # Relationships
     course = relationship("Course", back_populates="modules")
-    lessons = relationship("Lesson", back_populates="module", cascade="all, delete-orphan")
+    lessons = relationship("Lesson", back_populates="module", cascade="all, delete-orphan", order_by="Lesson.order")
 
 class Lesson(Base):
     """Lesson/Video content within a module."""
     __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_module_id_order", "module_id", "order"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     module_id = Column(Integer, ForeignKey("modules.id"), nullable=False)
@@ -92,6 +112,13 @@ class Lesson(Base):
 class Enrollment(Base):
     """User enrollment in a course."""
     __tablename__ = "enrollments"
+    __table_args__ = (
+        Index("uq_enrollments_user_id_course_id", "user_id", "course_id", unique=True),
+        Index("ix_enrollments_user_id_last_activity_at", "user_id", "last_activity_at"),
+        # Day-range scans for the analytics rollups
+        Index("ix_enrollments_enrolled_at", "enrolled_at"),
+        Index("ix_enrollments_completed_at", "completed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -99,6 +126,13 @@ class Enrollment(Base):
     enrolled_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     progress_percentage = Column(Integer, default=0)  # 0-100
+    completed_lessons = Column(Integer, nullable=False, default=0, server_default="0")  # rolled up from lesson_progress
+    total_lessons = Column(Integer, nullable=False, default=0, server_default="0")  # lessons in the course
+    # Continue-learning cursor: first incomplete lesson in course order
+    next_module_id = Column(Integer, ForeignKey("modules.id"), nullable=True)
+    next_lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=True)
+    next_link = Column(String, nullable=True)
+    last_activity_at = Column(DateTime, nullable=True)
 
     # Relationships
     user = relationship("User", back_populates="enrollments")
@@ -107,6 +141,14 @@ class Enrollment(Base):
 class LessonProgress(Base):
     """Track user progress through individual lessons."""
     __tablename__ = "lesson_progress"
+    __table_args__ = (
+        Index("uq_lesson_progress_user_id_lesson_id", "user_id", "lesson_id", unique=True),
+        # Day-range scans for the analytics rollups
+        Index("ix_lesson_progress_started_at", "started_at"),
+        Index("ix_lesson_progress_completed_at", "completed_at"),
+        # Incremental sync of the in-memory completion matrix
+        Index("ix_lesson_progress_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -116,7 +158,214 @@ class LessonProgress(Base):
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    client_updated_at = Column(DateTime, nullable=True)  # client clock, for last-write-wins batch replays
 
     # Relationships
     user = relationship("User", back_populates="lesson_progress")
-    lesson = relationship("Lesson", back_populates="progress")
\ No newline at end of file
+    lesson = relationship("Lesson", back_populates="progress")
+
+class LessonProgressDeletion(Base):
+    """
+    A deleted COMPLETED lesson_progress row, written by a database trigger so
+    the in-memory completion matrix can clear its bit (see completion_matrix.py).
+    """
+    __tablename__ = "lesson_progress_deletions"
+
+    id = Column(Integer, primary_key=True)  # replay watermark
+    user_id = Column(Integer, nullable=False)
+    lesson_id = Column(Integer, nullable=False)
+
+class ModuleProgress(Base):
+    """Track user progress through a whole module."""
+    __tablename__ = "module_progress"
+    __table_args__ = (
+        Index("uq_module_progress_user_id_module_id", "user_id", "module_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    module_id = Column(Integer, ForeignKey("modules.id"), nullable=False)
+    status = Column(SQLEnum(LessonStatus), default=LessonStatus.NOT_STARTED)
+    progress_percentage = Column(Integer, default=0)  # 0-100
+    completed_lessons = Column(Integer, nullable=False, default=0, server_default="0")  # rolled up from lesson_progress
+    total_lessons = Column(Integer, nullable=False, default=0, server_default="0")  # lessons in the module
+    opened_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
+    module = relationship("Module")
+
+# --- Analytics Rollups ---
+class CourseDailyStats(Base):
+    """Per-course, per-day learner counts, rebuilt from enrollments by analytics.py."""
+    __tablename__ = "course_daily_stats"
+    __table_args__ = (
+        Index("uq_course_daily_stats_course_id_day", "course_id", "day", unique=True),
+        Index("ix_course_daily_stats_day", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    learners_started = Column(Integer, nullable=False, default=0)  # enrollments begun that day
+    learners_completed = Column(Integer, nullable=False, default=0)  # enrollments finished that day
+    completion_seconds_total = Column(Integer, nullable=False, default=0)  # summed time-to-complete
+    completion_histogram = Column(Text, nullable=True)  # JSON bucket counts of time-to-complete
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LessonDailyStats(Base):
+    """Per-lesson, per-day start and completion counts, rebuilt from lesson_progress by analytics.py."""
+    __tablename__ = "lesson_daily_stats"
+    __table_args__ = (
+        Index("uq_lesson_daily_stats_lesson_id_day", "lesson_id", "day", unique=True),
+        Index("ix_lesson_daily_stats_course_id_day", "course_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    started = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# --- Community Forum ---
+class ForumCategory(Base):
+    """Forum category grouping related discussions."""
+    __tablename__ = "forum_categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    description = Column(Text)
+    icon = Column(String)
+    color = Column(String, default="primary")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    discussions = relationship("Discussion", back_populates="category", cascade="all, delete-orphan")
+
+class Discussion(Base):
+    """Forum discussion thread started by a user."""
+    __tablename__ = "discussions"
+    __table_args__ = (
+        Index("ix_discussions_category_id_created_at", "category_id", "created_at"),
+        Index("ix_discussions_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("forum_categories.id"), nullable=False)
+    title = Column(String, nullable=False)
+    content = Column(Text)
+    avatar = Column(String)
+    replies_count = Column(Integer, default=0)  # incremented with each reply insert
+    views_count = Column(Integer, default=0)  # buffered, see forum_views.py
+    unique_viewers = Column(Integer, nullable=False, default=0, server_default="0")  # HyperLogLog estimate
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
+    category = relationship("ForumCategory", back_populates="discussions")
+    replies = relationship("Reply", back_populates="discussion", cascade="all, delete-orphan")
+    viewers = relationship("DiscussionViewers", uselist=False, cascade="all, delete-orphan")
+
+class DiscussionViewers(Base):
+    """HyperLogLog registers estimating the distinct viewers of a discussion."""
+    __tablename__ = "discussion_viewers"
+
+    discussion_id = Column(Integer, ForeignKey("discussions.id"), primary_key=True)
+    registers = Column(LargeBinary, nullable=False)  # one byte per register, see forum_views.py
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Reply(Base):
+    """Reply to a forum discussion."""
+    __tablename__ = "replies"
+    __table_args__ = (
+        Index("ix_replies_discussion_id_created_at", "discussion_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    discussion_id = Column(Integer, ForeignKey("discussions.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    discussion = relationship("Discussion", back_populates="replies")
+    user = relationship("User")
+
+# --- Resources ---
+class ResourceCategory(Base):
+    """Category in the resources directory."""
+    __tablename__ = "resource_categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    description = Column(Text)
+    icon = Column(String)
+    color = Column(String, default="primary")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    resources = relationship("Resource", back_populates="category", cascade="all, delete-orphan")
+
+class Resource(Base):
+    """External guide, video or service listed in the resources directory."""
+    __tablename__ = "resources"
+    __table_args__ = (
+        Index("ix_resources_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    category_id = Column(Integer, ForeignKey("resource_categories.id"), nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    url = Column(String)
+    resource_type = Column(String)  # e.g. "PDF", "Video", "Guide"
+    icon = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    category = relationship("ResourceCategory", back_populates="resources")
+
+# --- Media Library ---
+class MediaLibrary(Base):
+    """Video or podcast item in the media library."""
+    __tablename__ = "media_library"
+    __table_args__ = (
+        Index("ix_media_library_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    media_type = Column(String)  # e.g. "video", "podcast"
+    url = Column(String, nullable=False)
+    thumbnail = Column(String)
+    duration_minutes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    tags = relationship("MediaTag", back_populates="media", cascade="all, delete-orphan")
+
+class MediaTag(Base):
+    """A single tag attached to a media library item."""
+    __tablename__ = "media_tags"
+    __table_args__ = (
+        Index("ix_media_tags_media_id", "media_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    media_id = Column(Integer, ForeignKey("media_library.id"), nullable=False)
+    tag = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    media = relationship("MediaLibrary", back_populates="tags")
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Enroll every user in every course with a single INSERT ... SELECT.
+Run once after switching ENROLLMENT_MODE to eager; new users and new
+courses are enrolled automatically from then on.
+"""
+from database import SessionLocal, create_all_tables
+from enrollment import enroll_everyone
+
+def enroll_all_users():
+    """Insert the missing (user, course) enrollment rows."""
+    print("Enrolling all users in all courses...")
+
+    create_all_tables()
+
+    db = SessionLocal()
+    try:
+        result = db.execute(enroll_everyone())
+        db.commit()
+        print(f"✓ {result.rowcount} enrollments created")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    enroll_all_users()
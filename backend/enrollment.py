@@ -0,0 +1,78 @@
+"""
+Course enrollment policy for Jijue LMS.
+
+ENROLLMENT_MODE=lazy (default): every course is open to every user and the
+enrollment row is virtual until the first lesson-progress write creates it
+(see progress.ensure_enrollment), so the table only grows with real activity.
+
+ENROLLMENT_MODE=eager: a new user is enrolled in every course, and a new
+course enrolls every user. Both are a single INSERT ... SELECT, never one
+ORM object per row.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import event, exists, func, insert, literal, select
+
+from db_models import Course, Enrollment, Lesson, Module, User
+
+ENROLLMENT_MODE = os.getenv("ENROLLMENT_MODE", "lazy").lower()
+
+ENROLLMENT_COLUMNS = ["user_id", "course_id", "enrolled_at", "completed_lessons", "total_lessons", "progress_percentage"]
+
+
+def eager_enrollment() -> bool:
+    """True when users and courses are enrolled up front."""
+    return ENROLLMENT_MODE == "eager"
+
+
+def _course_lesson_count(course_id):
+    return (
+        select(func.count(Lesson.id))
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Module.course_id == course_id)
+        .scalar_subquery()
+    )
+
+
+def _not_enrolled(user_id, course_id):
+    return ~exists().where(Enrollment.user_id == user_id, Enrollment.course_id == course_id)
+
+
+def enroll_user_in_all_courses(user_id: int):
+    """INSERT ... SELECT enrolling one user in every course they are not in yet."""
+    return insert(Enrollment.__table__).from_select(
+        ENROLLMENT_COLUMNS,
+        select(
+            literal(user_id), Course.id, literal(datetime.utcnow()),
+            literal(0), _course_lesson_count(Course.id), literal(0),
+        ).where(_not_enrolled(user_id, Course.id)),
+    )
+
+
+def enroll_all_users_in_course(course_id: int):
+    """INSERT ... SELECT enrolling every user in one course."""
+    return insert(Enrollment.__table__).from_select(
+        ENROLLMENT_COLUMNS,
+        select(
+            User.id, literal(course_id), literal(datetime.utcnow()),
+            literal(0), _course_lesson_count(course_id), literal(0),
+        ).where(_not_enrolled(User.id, course_id)),
+    )
+
+
+def enroll_everyone():
+    """INSERT ... SELECT filling in every missing (user, course) pair, e.g. after switching to eager."""
+    return insert(Enrollment.__table__).from_select(
+        ENROLLMENT_COLUMNS,
+        select(
+            User.id, Course.id, literal(datetime.utcnow()),
+            literal(0), _course_lesson_count(Course.id), literal(0),
+        ).where(_not_enrolled(User.id, Course.id)),
+    )
+
+
+@event.listens_for(Course, "after_insert")
+def _course_added(mapper, connection, target):
+    if eager_enrollment():
+        connection.execute(enroll_all_users_in_course(target.id))
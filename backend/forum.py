@@ -0,0 +1,125 @@
+"""
+Community forum access for Jijue LMS.
+Discussions are listed newest first and replies oldest first, both in
+keyset pages on (created_at, id) served from the
+ix_discussions_created_at / ix_discussions_category_id_created_at and
+ix_replies_discussion_id_created_at indexes.
+
+replies_count is kept exact by incrementing it in the transaction that
+inserts the reply; views_count and unique_viewers are written behind by
+forum_views.py, so shown view counts add this process's pending views.
+"""
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+
+from db_models import Discussion, ForumCategory, Reply, User
+from forum_views import view_counter
+from models import DiscussionDetailResponse, DiscussionResponse, ForumCategoryResponse, ReplyResponse
+from pagination import PageParams, keyset_page, next_cursor
+
+
+def _page_key(row):
+    return row[0].created_at, row[0].id
+
+
+def load_forum_categories(db) -> list:
+    """All forum categories with their discussion counts."""
+    counts = (
+        select(Discussion.category_id, func.count(Discussion.id).label("count"))
+        .group_by(Discussion.category_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(ForumCategory, func.coalesce(counts.c.count, 0))
+        .outerjoin(counts, counts.c.category_id == ForumCategory.id)
+        .order_by(ForumCategory.id)
+    ).all()
+    return [
+        ForumCategoryResponse(
+            id=category.id, name=category.name, description=category.description,
+            icon=category.icon, color=category.color, count=count,
+        )
+        for category, count in rows
+    ]
+
+
+def _discussion_query():
+    return (
+        select(Discussion, User.full_name, ForumCategory.name)
+        .join(User, Discussion.user_id == User.id)
+        .join(ForumCategory, Discussion.category_id == ForumCategory.id)
+    )
+
+
+def discussion_to_response(discussion: Discussion, author, category, detail: bool = False):
+    """Shape a discussion the way the forum page expects it."""
+    fields = dict(
+        id=discussion.id,
+        title=discussion.title,
+        author=author,
+        avatar=discussion.avatar,
+        category_id=discussion.category_id,
+        category=category,
+        replies=discussion.replies_count or 0,
+        views=(discussion.views_count or 0) + view_counter.pending(discussion.id),
+        unique_viewers=discussion.unique_viewers or 0,
+        created_at=discussion.created_at,
+    )
+    return DiscussionDetailResponse(content=discussion.content, **fields) if detail else DiscussionResponse(**fields)
+
+
+def load_discussions(db, page: PageParams, response, category_id: int | None = None) -> list:
+    """One page of discussions, newest first, optionally within one category."""
+    query = _discussion_query()
+    if category_id is not None:
+        query = query.where(Discussion.category_id == category_id)
+    rows = db.execute(keyset_page(query, Discussion.created_at, Discussion.id, page, descending=True)).all()
+    return [discussion_to_response(*row) for row in next_cursor(rows, page, response, key=_page_key)]
+
+
+def load_discussion(db, discussion_id: int) -> DiscussionDetailResponse:
+    """One discussion with its opening post; 404 if it does not exist."""
+    row = db.execute(_discussion_query().where(Discussion.id == discussion_id)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    return discussion_to_response(*row, detail=True)
+
+
+def load_replies(db, discussion_id: int, page: PageParams, response) -> list:
+    """One page of a discussion's replies, oldest first."""
+    query = (
+        select(Reply, User.full_name)
+        .join(User, Reply.user_id == User.id)
+        .where(Reply.discussion_id == discussion_id)
+    )
+    rows = db.execute(keyset_page(query, Reply.created_at, Reply.id, page)).all()
+    return [
+        ReplyResponse(
+            id=reply.id, discussion_id=reply.discussion_id, author=author,
+            content=reply.content, created_at=reply.created_at,
+        )
+        for reply, author in next_cursor(rows, page, response, key=_page_key)
+    ]
+
+
+def create_reply(db, discussion_id: int, user_id: int, author: str, content: str):
+    """
+    Insert a reply and bump the discussion's replies_count in the same
+    transaction (the caller commits); 404 if the discussion does not exist.
+    Returns the reply and the discussion's (category_id, replies_count).
+    """
+    bumped = db.execute(
+        update(Discussion)
+        .where(Discussion.id == discussion_id)
+        .values(replies_count=func.coalesce(Discussion.replies_count, 0) + 1)
+        .returning(Discussion.category_id, Discussion.replies_count)
+    ).first()
+    if bumped is None:
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    reply = Reply(discussion_id=discussion_id, user_id=user_id, content=content)
+    db.add(reply)
+    db.flush()
+    response = ReplyResponse(
+        id=reply.id, discussion_id=discussion_id, author=author, content=reply.content, created_at=reply.created_at,
+    )
+    return response, tuple(bumped)
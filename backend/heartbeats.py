@@ -0,0 +1,290 @@
+"""
+Write-behind buffer for lesson progress heartbeats in Jijue LMS.
+Video players report their position every few seconds. Writing a row per
+heartbeat would swamp SQLite, so only the latest percentage per
+(user, lesson) is kept in memory and dirty entries are written in bulk,
+every HEARTBEAT_FLUSH_INTERVAL_MS or as soon as HEARTBEAT_FLUSH_MAX_ENTRIES
+are pending. Completions never go through here; they are written at once
+by record_lesson_progress so the rollups stay exact.
+
+Pending heartbeats live in this process only: a crash loses at most one
+flush interval of positions, and a graceful shutdown flushes everything.
+A failed flush puts its entries back, the newest first, but never grows the
+buffer past HEARTBEAT_MAX_PENDING; the rest are dropped and counted.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, func, select, tuple_, update
+
+from database import SessionLocal
+from db_models import Enrollment, Lesson, LessonProgress, LessonStatus, Module, ModuleProgress
+from progress import NEVER, UPSERT_INSERTS, apply_completion_delta
+
+HEARTBEAT_FLUSH_INTERVAL_MS = int(os.getenv("HEARTBEAT_FLUSH_INTERVAL_MS", "2000"))
+HEARTBEAT_FLUSH_MAX_ENTRIES = int(os.getenv("HEARTBEAT_FLUSH_MAX_ENTRIES", "500"))
+HEARTBEAT_MAX_PENDING = int(os.getenv("HEARTBEAT_MAX_PENDING", "20000"))
+# Rows per INSERT ... ON CONFLICT statement (and keys per IN lookup); 6
+# parameters a row stays under SQLite's 999 bound-parameter limit on older builds
+HEARTBEAT_UPSERT_CHUNK_ROWS = int(os.getenv("HEARTBEAT_UPSERT_CHUNK_ROWS", "150"))
+
+
+class HeartbeatBuffer:
+    """
+    Latest heartbeat per (user id, lesson id), flushed by a background thread.
+    Tracks flush latency and batch sizes.
+    """
+
+    def __init__(self, flush_interval_ms: int = HEARTBEAT_FLUSH_INTERVAL_MS,
+                 max_entries: int = HEARTBEAT_FLUSH_MAX_ENTRIES, max_pending: int = HEARTBEAT_MAX_PENDING,
+                 session_factory=SessionLocal):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._pending = {}  # (user id, lesson id) -> (progress percentage, received at)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.received = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.failed_flushes = 0
+        self.dropped_entries = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.total_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def record(self, user_id: int, lesson_id: int, progress_percentage: int):
+        """Buffer a heartbeat, replacing any pending one for the same lesson."""
+        key = (user_id, lesson_id)
+        with self._lock:
+            self.received += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (progress_percentage, datetime.utcnow())
+            full = len(self._pending) >= self.max_entries
+        if full:
+            self._wake.set()
+
+    def discard(self, user_id: int, lesson_id: int):
+        """Drop a pending heartbeat that a direct progress write has superseded."""
+        with self._lock:
+            self._pending.pop((user_id, lesson_id), None)
+
+    def clear(self):
+        """Forget every pending heartbeat."""
+        with self._lock:
+            self._pending.clear()
+
+    def flush(self) -> int:
+        """Write every pending heartbeat now; returns the number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            db = self._session_factory()
+            try:
+                write_heartbeats(db, batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self.failed_flushes += 1
+                    self._requeue(batch)
+                raise
+            finally:
+                db.close()
+
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.flushes += 1
+                self.flushed_entries += len(batch)
+                self.last_batch_size = len(batch)
+                self.max_batch_size = max(self.max_batch_size, len(batch))
+                self.total_flush_seconds += elapsed
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            return len(batch)
+
+    def _requeue(self, batch: dict):
+        """Put a failed batch back, newest first, unless newer heartbeats arrived meanwhile."""
+        for key, entry in sorted(reversed(batch.items()), key=lambda item: item[1][1], reverse=True):
+            if key in self._pending:
+                continue
+            if len(self._pending) >= self.max_pending:
+                self.dropped_entries += 1
+                continue
+            self._pending[key] = entry
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="heartbeat-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write out everything still pending."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        """Buffer depth, flush latency and batch size counters."""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "flush_interval_ms": round(self.flush_interval * 1000),
+                "max_entries": self.max_entries,
+                "received": self.received,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "flushed_entries": self.flushed_entries,
+                "failed_flushes": self.failed_flushes,
+                "dropped_entries": self.dropped_entries,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "avg_batch_size": round(self.flushed_entries / self.flushes, 1) if self.flushes else 0.0,
+                "last_flush_ms": round(1000 * self.last_flush_seconds, 3),
+                "avg_flush_ms": round(1000 * self.total_flush_seconds / self.flushes, 3) if self.flushes else 0.0,
+                "max_flush_ms": round(1000 * self.max_flush_seconds, 3),
+            }
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠ Heartbeat flush failed, will retry: {e}")
+
+
+def write_heartbeats(db, batch: dict):
+    """
+    Upsert buffered heartbeats. Only progress_percentage moves: a COMPLETED
+    lesson stays completed, and rows written directly after the heartbeat
+    was received (updated_at later) are left alone. A first heartbeat in a
+    module or course creates its module_progress and enrollment rows, as a
+    progress PUT does.
+    """
+    lesson_ids = {lesson_id for _, lesson_id in batch}
+    locations = {
+        lesson_id: (module_id, course_id)
+        for lesson_id, module_id, course_id in db.execute(
+            select(Lesson.id, Lesson.module_id, Module.course_id)
+            .join(Module, Lesson.module_id == Module.id)
+            .where(Lesson.id.in_(lesson_ids))
+        )
+    }
+    known = set(locations)
+    rows = [
+        {
+            "user_id": user_id,
+            "lesson_id": lesson_id,
+            "status": LessonStatus.IN_PROGRESS,
+            "progress_percentage": percentage,
+            "started_at": received_at,
+            "updated_at": received_at,
+        }
+        for (user_id, lesson_id), (percentage, received_at) in batch.items()
+        if lesson_id in known
+    ]
+    if not rows:
+        return
+
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        _write_heartbeats_row_by_row(db, rows)
+    else:
+        for chunk in _chunks(rows):
+            _upsert_heartbeats(db, insert, chunk)
+    _ensure_rollup_rows(db, rows, locations)
+
+
+def _chunks(items: list):
+    for start in range(0, len(items), HEARTBEAT_UPSERT_CHUNK_ROWS):
+        yield items[start:start + HEARTBEAT_UPSERT_CHUNK_ROWS]
+
+
+def _upsert_heartbeats(db, insert, rows: list):
+    table = LessonProgress.__table__
+    statement = insert(table).values(rows)
+    excluded = statement.excluded
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.lesson_id],
+        set_={
+            "status": case(
+                (table.c.status == LessonStatus.COMPLETED, table.c.status),
+                else_=excluded.status,
+            ),
+            "progress_percentage": excluded.progress_percentage,
+            "started_at": func.coalesce(table.c.started_at, excluded.started_at),
+            "updated_at": excluded.updated_at,
+        },
+        where=func.coalesce(table.c.updated_at, NEVER) <= excluded.updated_at,
+    ))
+
+
+def _ensure_rollup_rows(db, rows: list, locations: dict):
+    """Create the module_progress and enrollment rows (and learning cursor) the batch is missing."""
+    modules = {}  # (user id, module id) -> (course id, received at)
+    for row in rows:
+        module_id, course_id = locations[row["lesson_id"]]
+        modules[(row["user_id"], module_id)] = (course_id, row["updated_at"])
+    courses = {(user_id, course_id) for (user_id, _), (course_id, _) in modules.items()}
+
+    have_modules, have_courses = set(), set()
+    for chunk in _chunks(list(modules)):
+        have_modules.update(db.execute(
+            select(ModuleProgress.user_id, ModuleProgress.module_id)
+            .where(tuple_(ModuleProgress.user_id, ModuleProgress.module_id).in_(chunk))
+        ).tuples())
+    for chunk in _chunks(list(courses)):
+        have_courses.update(db.execute(
+            select(Enrollment.user_id, Enrollment.course_id)
+            .where(tuple_(Enrollment.user_id, Enrollment.course_id).in_(chunk))
+        ).tuples())
+    for (user_id, module_id), (course_id, received_at) in modules.items():
+        if (user_id, module_id) not in have_modules or (user_id, course_id) not in have_courses:
+            apply_completion_delta(db, user_id, module_id, course_id, 0, 0, received_at)
+            have_courses.add((user_id, course_id))
+
+
+def _write_heartbeats_row_by_row(db, rows: list):
+    """Fallback for databases without ON CONFLICT."""
+    for row in rows:
+        updated = db.execute(
+            update(LessonProgress)
+            .where(
+                LessonProgress.user_id == row["user_id"],
+                LessonProgress.lesson_id == row["lesson_id"],
+                func.coalesce(LessonProgress.updated_at, NEVER) <= row["updated_at"],
+            )
+            .values(progress_percentage=row["progress_percentage"], updated_at=row["updated_at"])
+        ).rowcount
+        if not updated and not db.query(LessonProgress.id).filter_by(
+            user_id=row["user_id"], lesson_id=row["lesson_id"]
+        ).first():
+            db.add(LessonProgress(**row))
+    db.flush()
+
+
+heartbeat_buffer = HeartbeatBuffer()
@@ -0,0 +1,100 @@
+"""
+HTTP conditional GET helpers for Jijue LMS.
+Builds strong ETags and Last-Modified headers from database version stamps
+and answers If-None-Match / If-Modified-Since with 304 before any body is built.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+HTTP_CACHE_S_MAXAGE = int(os.getenv("HTTP_CACHE_S_MAXAGE", "300"))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "30"))
+
+# ETag suffixes of compressed variants (see compression.py)
+ENCODED_ETAG_SUFFIXES = ("-br", "-gzip")
+
+CACHE_CONTROL = (
+    f"public, max-age={HTTP_CACHE_MAX_AGE}, s-maxage={HTTP_CACHE_S_MAXAGE}, "
+    f"stale-while-revalidate={HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of a compressed variant: a distinct strong tag derived from the identity one."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _identity_etag(tag: str) -> str:
+    for suffix in ENCODED_ETAG_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return f'{tag[:-len(suffix) - 1]}"'
+    return tag
+
+
+class Validators:
+    """ETag and Last-Modified for one representation."""
+    __slots__ = ("etag", "last_modified")
+
+    def __init__(self, etag: str, last_modified: datetime | None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_version(cls, kind: str, key, version: tuple) -> "Validators":
+        """Derive a strong ETag and the newest timestamp from a version stamp tuple."""
+        digest = hashlib.sha1(repr((kind, key, version)).encode("utf-8")).hexdigest()
+        timestamps = [v for v in version if isinstance(v, datetime)]
+        last_modified = max(timestamps) if timestamps else None
+        if last_modified is not None and last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return cls(f'"{digest}"', last_modified)
+
+    def headers(self) -> dict:
+        """Caching headers to send with a 200 or 304 response."""
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """True when the client's cached copy is still current."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match uses the weak comparison, so ignore any W/ prefix;
+            # a compressed variant is the same representation, so ignore its suffix too.
+            tags = [_identity_etag(tag.strip().removeprefix("W/")) for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution.
+        return self.last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(request: Request, response: Response, validators: Validators) -> Response | None:
+    """
+    Return a 304 response if the request's validators match, otherwise set the
+    caching headers on `response` and return None so the handler builds the body.
+    """
+    if validators.matches(request):
+        return Response(status_code=304, headers=validators.headers())
+    response.headers.update(validators.headers())
+    return None
+
+
+def json_response(request: Request, body: bytes, validators: Validators) -> Response:
+    """Send pre-serialized JSON bytes, or a 304 if the client's copy is current."""
+    if validators.matches(request):
+        return Response(status_code=304, headers=validators.headers())
+    return Response(content=body, media_type="application/json", headers=validators.headers())
@@ -0,0 +1,227 @@
+"""
+Live updates for Jijue LMS over WebSocket.
+Clients connect to /ws with their JWT and subscribe to topics instead of
+polling whole lists:
+
+    forum:category:<id>    discussions in a category changed (new replies)
+    forum:discussion:<id>  replies posted to a discussion
+    progress:user:<id>     a user's lesson progress (own id only, or staff)
+
+The hub keeps topic -> subscribers in memory. A published event is
+serialized once and put on every subscriber's bounded queue; one task per
+connection drains its queue into the socket. A subscriber whose queue is
+full (LIVE_QUEUE_SIZE unsent messages) is a slow consumer: it is closed
+with 1013 "try again later" instead of buffering without bound or holding
+up everyone else, and the client reconnects and refetches.
+
+Endpoints are mostly sync and run in the threadpool, so publish() may be
+called from any thread; deliveries are handed to each connection's event
+loop. Events only reach connections on the worker that published them.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+from fastapi import status
+
+from models import TokenData, UserRoleEnum
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+LIVE_MAX_TOPICS = int(os.getenv("LIVE_MAX_TOPICS", "100"))
+
+TOPIC_PATTERN = re.compile(r"^(forum:category|forum:discussion|progress:user):(\d+)$")
+
+
+def category_topic(category_id: int) -> str:
+    return f"forum:category:{category_id}"
+
+
+def discussion_topic(discussion_id: int) -> str:
+    return f"forum:discussion:{discussion_id}"
+
+
+def progress_topic(user_id: int) -> str:
+    return f"progress:user:{user_id}"
+
+
+def can_subscribe(user: TokenData, topic: str) -> bool:
+    """Forum topics are open to every signed-in user; progress only to its owner and staff."""
+    match = TOPIC_PATTERN.match(topic)
+    if match is None:
+        return False
+    if match.group(1) == "progress:user":
+        return int(match.group(2)) == user.user_id or user.role in (UserRoleEnum.ADMIN, UserRoleEnum.INSTRUCTOR)
+    return True
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class Subscriber:
+    """One connection: its topics, outgoing queue and sender task."""
+    __slots__ = ("user", "send", "close", "loop", "queue", "topics", "task", "closed")
+
+    def __init__(self, user, send, close, queue_size: int):
+        self.user = user
+        self.send = send  # async callable taking a text frame
+        self.close = close  # async callable taking a close code
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+        self.topics = set()
+        self.task = None
+        self.closed = False
+
+
+class LiveHub:
+    """Topic -> subscribers registry with per-connection bounded queues."""
+
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE, max_topics: int = LIVE_MAX_TOPICS):
+        self.queue_size = queue_size
+        self.max_topics = max_topics
+        self._lock = threading.Lock()
+        self._topics = defaultdict(set)
+        self._subscribers = set()
+        self._stats = {"connected": 0, "published": 0, "delivered": 0, "sent": 0, "dropped_slow": 0}
+
+    # --- Connections ---
+
+    def connect(self, user, send, close) -> Subscriber:
+        """Register an accepted connection and start its sender task (on the running loop)."""
+        subscriber = Subscriber(user, send, close, self.queue_size)
+        subscriber.task = subscriber.loop.create_task(self._pump(subscriber))
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._stats["connected"] += 1
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        """Forget a connection and stop its sender task."""
+        subscriber.closed = True
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            for topic in subscriber.topics:
+                members = self._topics.get(topic)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del self._topics[topic]
+            subscriber.topics.clear()
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    async def _pump(self, subscriber: Subscriber):
+        while True:
+            message = await subscriber.queue.get()
+            try:
+                await subscriber.send(message)
+            except Exception:
+                self.disconnect(subscriber)  # the socket went away; the receive loop will notice too
+                return
+            with self._lock:
+                self._stats["sent"] += 1
+
+    def _drop_slow(self, subscriber: Subscriber):
+        if subscriber.closed:
+            return
+        self.disconnect(subscriber)
+        with self._lock:
+            self._stats["dropped_slow"] += 1
+        subscriber.loop.create_task(subscriber.close(status.WS_1013_TRY_AGAIN_LATER))
+
+    # --- Topics ---
+
+    def subscribe(self, subscriber: Subscriber, topic: str) -> str | None:
+        """Add a topic to a connection; returns an error message if it is not allowed."""
+        if not can_subscribe(subscriber.user, topic):
+            return f"Not allowed to subscribe to {topic!r}"
+        with self._lock:
+            if topic not in subscriber.topics and len(subscriber.topics) >= self.max_topics:
+                return f"At most {self.max_topics} topics per connection"
+            subscriber.topics.add(topic)
+            self._topics[topic].add(subscriber)
+        return None
+
+    def unsubscribe(self, subscriber: Subscriber, topic: str):
+        with self._lock:
+            subscriber.topics.discard(topic)
+            members = self._topics.get(topic)
+            if members is not None:
+                members.discard(subscriber)
+                if not members:
+                    del self._topics[topic]
+
+    def handle(self, subscriber: Subscriber, command) -> dict:
+        """Answer a client command: {"action": "subscribe" | "unsubscribe", "topic": ...}."""
+        if not isinstance(command, dict) or command.get("action") not in ("subscribe", "unsubscribe"):
+            return {"type": "error", "detail": "Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"topic\": ...}"}
+        topic = str(command.get("topic", ""))
+        if command["action"] == "unsubscribe":
+            self.unsubscribe(subscriber, topic)
+            return {"type": "unsubscribed", "topic": topic}
+        error = self.subscribe(subscriber, topic)
+        if error is not None:
+            return {"type": "error", "topic": topic, "detail": error}
+        return {"type": "subscribed", "topic": topic}
+
+    # --- Publishing ---
+
+    def send(self, subscriber: Subscriber, payload: dict):
+        """Queue a message for one connection; call on its event loop."""
+        self._deliver([subscriber], json.dumps(payload, default=str))
+
+    def publish(self, topic: str, payload: dict) -> int:
+        """
+        Queue an event for every subscriber of `topic`, from any thread.
+        Returns the number of subscribers it was handed to.
+        """
+        with self._lock:
+            members = self._topics.get(topic)
+            if not members:
+                return 0
+            members = list(members)
+            self._stats["published"] += 1
+        message = json.dumps({"topic": topic, **payload}, default=str)
+        by_loop = defaultdict(list)
+        for subscriber in members:
+            by_loop[subscriber.loop].append(subscriber)
+        current = _running_loop()
+        for loop, subscribers in by_loop.items():
+            if loop is current:
+                self._deliver(subscribers, message)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, subscribers, message)
+        return len(members)
+
+    def _deliver(self, subscribers: list, message: str):
+        delivered = 0
+        for subscriber in subscribers:
+            if subscriber.closed:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._drop_slow(subscriber)
+        with self._lock:
+            self._stats["delivered"] += delivered
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connections": len(self._subscribers),
+                "topics": len(self._topics),
+                "subscriptions": sum(len(members) for members in self._topics.values()),
+                "queued": sum(subscriber.queue.qsize() for subscriber in self._subscribers),
+                "queue_size": self.queue_size,
+                **self._stats,
+            }
+
+
+live_hub = LiveHub()
@@ -1,27 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import timedelta, datetime, timezone
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+import asyncio
+import json
+from datetime import date, timedelta, datetime, timezone
+import os
+import time
+import uuid
 from typing import Annotated, List 
 
-from bcrypt import hashpw, gensalt, checkpw
 from jose import JWTError, jwt
 from pydantic import ValidationError, BaseModel 
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Corrected absolute import for models
-from models import UserRegistration, UserResponse, Token, TokenData
-from database import SessionLocal, get_db
-from db_models import Course
+from models import (
+    UserRegistration, UserResponse, Token, TokenData, UserRoleEnum, UserRoleUpdate, CourseDetailResponse,
+    ResourceCategoryResponse, ResourceResponse, MediaResponse,
+    LessonStatusEnum, LessonProgressResponse, ModuleProgressResponse, UpdateLessonProgressRequest,
+    LessonProgressBatchItem, LessonProgressBatchResponse, ContinueLearningResponse, DashboardData,
+    CourseAnalyticsResponse, LessonAnalyticsResponse,
+    CourseCompletionResponse, CohortCompletionRequest, CohortCompletionResponse,
+    SearchTypeEnum, SearchResponse, TagMatchEnum, MediaQueryResponse,
+    ForumCategoryResponse, DiscussionResponse, DiscussionDetailResponse, ReplyResponse, CreateReplyRequest,
+)
+from database import SessionLocal, get_db, get_read_db, get_async_db, create_all_tables
+from db_models import User, UserRole, LessonProgress, LessonStatus
+from catalog import catalog_cache, get_course_list, get_course_tree
+from content import (
+    resource_categories_version, resources_version, media_version,
+    load_resource_categories, load_resources, load_media, load_media_items,
+)
+from http_cache import Validators, conditional_response, json_response
+from compression import CompressionMiddleware, compressed_variants, compression_stats
+from passwords import HasherBusy, password_hasher
+from revocation import revoked_tokens
+from rate_limit import enforce_auth_rate_limit
+from progress import (
+    PROGRESS_BATCH_MAX_ITEMS, get_continue_learning, get_module_progress, get_progress_aggregates,
+    record_lesson_progress, record_lesson_progress_batch,
+)
+from heartbeats import heartbeat_buffer
+from enrollment import eager_enrollment, enroll_user_in_all_courses
+from dashboard import cached_dashboard, dashboard_cache, invalidate_dashboard, load_dashboard
+from analytics import ANALYTICS_REFRESH_DAYS, course_analytics, lesson_analytics, refresh_recent
+from completion_matrix import completion_matrix
+from search import SEARCH_MAX_LIMIT, SearchUnavailable, search
+from media_index import MEDIA_FACET_LIMIT, media_index
+from pagination import NEXT_CURSOR_HEADER, PageParams, encode_cursor
+from forum import create_reply, load_discussion, load_discussions, load_forum_categories, load_replies
+from forum_views import view_counter
+from live import category_topic, discussion_topic, live_hub, progress_topic
 
 # --- Configuration ---
-# In a real app, these would come from environment variables (.env file)
-SECRET_KEY = "SUPER_SECRET_KEY"  # Replace this with a secure, long, random key
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-# --- Database Mock ---
-# In a real application, this would be replaced with a database (e.g., PostgreSQL, MongoDB)
-fake_users_db = {} 
+# Read from the environment (.env) so every worker process signs and verifies
+# tokens with the same key.
+SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY")  # Replace this with a secure, long, random key
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
 # --- FastAPI Initialization ---
 app = FastAPI(title="Jijue LMS API")
@@ -48,41 +88,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # lets the pages read the next-page cursor
 )
+app.add_middleware(CompressionMiddleware)
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    """Too many logins/registrations are already waiting for bcrypt."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(SearchUnavailable)
+async def search_unavailable_handler(request: Request, exc: SearchUnavailable):
+    """The database backend has no full-text search index."""
+    return JSONResponse(status_code=status.HTTP_501_NOT_IMPLEMENTED, content={"detail": str(exc)})
+
+@app.on_event("startup")
+async def startup_event():
+    """Create missing tables, load the in-memory indexes and start the heartbeat and view flushers."""
+    create_all_tables()
+    with SessionLocal() as db:
+        completion_matrix.load(db)
+        media_index.build(db)
+    heartbeat_buffer.start()
+    view_counter.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Write out buffered progress heartbeats and forum views before the process exits."""
+    heartbeat_buffer.stop()
+    view_counter.stop()
 
 # ----------------------------------------------------
-# DASHBOARD DATA MODELS (Pydantic) - NEW ADDITION
+# COURSE LIST MODEL (Pydantic)
 # ----------------------------------------------------
 
-# Defining models here since they were not included in the 'from models import' list
-class NavItem(BaseModel):
-    name: str
-    icon: str
-    current: bool
-    link: str
-
-class CourseItem(BaseModel):
-    title: str
-    description: str
-    icon: str
-    color: str
-    link: str
-
-class ContinueLearning(BaseModel):
-    moduleTitle: str
-    description: str
-    link: str
-
-class DashboardData(BaseModel):
-    userName: str
-    progress: int
-    modulesCompleted: int
-    totalModules: int
-    continueLearning: ContinueLearning
-    featuredCourses: List[CourseItem]
-    quickLinks: List[CourseItem]
-    navigation: List[NavItem]
-
 class CourseResponse(BaseModel):
     id: int
     title: str
@@ -94,115 +137,88 @@ class CourseResponse(BaseModel):
     class Config:
         from_attributes = True
 
-# ----------------------------------------------------
-# DASHBOARD STATIC DATA SOURCE - NEW ADDITION
-# ----------------------------------------------------
-
-DASHBOARD_DATA_SOURCE = DashboardData(
-    userName="Alex",
-    progress=75,
-    modulesCompleted=3,
-    totalModules=4,
-    continueLearning=ContinueLearning(
-        moduleTitle="Module 2: Understanding Transmission",
-        description="Learn about the ways HIV is transmitted and how it is not. Debunk common myths.",
-        link="#",
-    ),
-    featuredCourses=[
-        CourseItem(
-            title="Living Well with HIV",
-            description="Nutrition, mental health, and treatment adherence.",
-            icon="HeartPulse",
-            color='secondary',
-            link="#",
-        ),
-        CourseItem(
-            title="Prevention & PrEP",
-            description="Understand the tools available for prevention.",
-            icon="Shield",
-            color='primary',
-            link="#",
-        )
-    ],
-    quickLinks=[
-        CourseItem(
-            title="Community Forum",
-            description="Ask questions and share experiences.",
-            icon="MessageSquare",
-            color='primary',
-            link="#",
-        ),
-        CourseItem(
-            title="Find a Clinic",
-            description="Locate testing and support centers.",
-            icon="MapPin",
-            color='secondary',
-            link="#",
-        ),
-    ],
-    navigation=[
-        NavItem(name="Dashboard", icon="LayoutDashboard", current=True, link="/dashboard"),
-        NavItem(name="Course Catalog", icon="School", current=False, link="/courses"),
-        NavItem(name="My Courses", icon="PlayCircle", current=False, link="/my-courses"),
-        NavItem(name="Community", icon="Users", current=False, link="/forum"),
-        NavItem(name="Resources", icon="Zap", current=False, link="/resources"),
-        NavItem(name="Settings", icon="Settings", current=False, link="/settings"),
-    ]
-)
-
 # --- Authentication Utilities ---
 
-def get_password_hash(password: str) -> str:
-    """Hashes a password using bcrypt."""
-    # Convert password string to bytes and hash it
-    hashed = hashpw(password.encode('utf-8'), gensalt())
-    return hashed.decode('utf-8')
+async def get_password_hash(password: str) -> str:
+    """Hashes a password using bcrypt on the password hasher's thread pool."""
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain password against a hashed password."""
-    # Convert both to bytes for comparison
-    return checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain password against a hashed password off the event loop."""
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
-    """Creates a JWT access token."""
+    """
+    Creates a JWT access token.
+    `data` must carry the user's id, email, full name and role so protected
+    routes can build the principal from the token alone.
+    """
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
         
-    to_encode.update({"exp": expire, "sub": data.get("email")})
+    to_encode.update({
+        "exp": expire,
+        "iat": time.time(),  # fractional, so revocation cut-offs are exact
+        "jti": uuid.uuid4().hex,
+        "sub": str(data["user_id"]),
+    })
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    """Looks a user up by email (served by the unique ix_users_email index)."""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 # --- Authentication Routes ---
 
 @app.post("/api/v1/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_data: UserRegistration):
-    """Handles new user registration and stores the hashed password."""
-    
-    if user_data.email in fake_users_db:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+async def register_user(user_data: UserRegistration, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Handles new user registration and stores the hashed password in the users table."""
+    enforce_auth_rate_limit(request, user_data.email)
+
+    email_taken = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Email already registered"
+    )
+
+    if await get_user_by_email(db, user_data.email):
+        raise email_taken
 
     # Hash the password for secure storage
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     
-    # Store user data (simulating DB write)
-    user = user_data.model_dump()
-    user["hashed_password"] = hashed_password
-    fake_users_db[user_data.email] = user
+    user = User(
+        full_name=user_data.full_name,
+        email=user_data.email,
+        hashed_password=hashed_password,
+        role=UserRole.STUDENT,
+    )
+    db.add(user)
+    try:
+        if eager_enrollment():
+            # One INSERT ... SELECT for all courses, in the same transaction
+            await db.flush()
+            await db.execute(enroll_user_in_all_courses(user.id))
+        await db.commit()
+    except IntegrityError:
+        # Another worker registered the same email between the check and the insert
+        await db.rollback()
+        raise email_taken
     
     # Return a response model (without the password hash)
-    return UserResponse(full_name=user["full_name"], email=user["email"])
+    return UserResponse(full_name=user.full_name, email=user.email)
 
 @app.post("/api/v1/auth/login", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], request: Request, db: AsyncSession = Depends(get_async_db)):
     """Validates credentials and returns an access token upon successful login."""
+    # Throttle before any lookup or bcrypt work
+    enforce_auth_rate_limit(request, form_data.username)
     
-    user_in_db = fake_users_db.get(form_data.username)
+    user_in_db = await get_user_by_email(db, form_data.username)
     
     # 1. Check if user exists
     if not user_in_db:
@@ -213,7 +229,7 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
         )
         
     # 2. Check if password is correct
-    if not verify_password(form_data.password, user_in_db["hashed_password"]):
+    if not await verify_password(form_data.password, user_in_db.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -223,18 +239,27 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
     # 3. Create Access Token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"email": user_in_db["email"]},
+        data={
+            "user_id": user_in_db.id,
+            "email": user_in_db.email,
+            "full_name": user_in_db.full_name,
+            "role": user_in_db.role.value,
+        },
         expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-# --- Dependency for Protected Routes (Future Use) ---
+# --- Dependency for Protected Routes ---
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    """Verifies the JWT token and returns the current user's data."""
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenData:
+    """
+    Verifies the JWT token and returns the authenticated principal.
+    Everything comes from the token claims and the in-memory revocation
+    list; no database lookup is made.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -243,95 +268,649 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     try:
         # Decode the token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("email")
-        if email is None:
-            raise credentials_exception
-            
-        token_data = TokenData(email=email)
+        token_data = TokenData(
+            user_id=payload.get("sub"),
+            email=payload.get("email"),
+            full_name=payload.get("full_name"),
+            role=payload.get("role"),
+            token_id=payload.get("jti"),
+            issued_at=payload.get("iat"),
+            expires_at=payload.get("exp"),
+        )
         
     except (JWTError, ValidationError):
         raise credentials_exception
-        
-    user_in_db = fake_users_db.get(token_data.email)
-    if user_in_db is None:
+
+    if revoked_tokens.is_revoked(token_data.token_id, token_data.user_id, token_data.issued_at):
         raise credentials_exception
         
-    # In a real app, you would fetch the full UserResponse model from the DB here
-    return UserResponse(full_name=user_in_db["full_name"], email=user_in_db["email"])
+    return token_data
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
+
+async def get_optional_user(token: Annotated[str | None, Depends(optional_oauth2_scheme)]) -> TokenData | None:
+    """The authenticated principal, or None for requests without a token."""
+    if token is None:
+        return None
+    return await get_current_user(token)
+
+def require_role(*roles: UserRoleEnum):
+    """Dependency factory restricting a route to principals with one of `roles`."""
+    async def check_role(current_user: Annotated[TokenData, Depends(get_current_user)]) -> TokenData:
+        if current_user.role not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+        return current_user
+    return check_role
+
+require_admin = require_role(UserRoleEnum.ADMIN)
+
+async def require_self_or_staff(user_id: int, current_user: Annotated[TokenData, Depends(get_current_user)]) -> TokenData:
+    """
+    Dependency for /api/users/{user_id}/... routes: the user themselves, or
+    an instructor or admin (the rule live.can_subscribe applies to progress
+    topics).
+    """
+    if current_user.user_id != user_id and current_user.role not in (UserRoleEnum.ADMIN, UserRoleEnum.INSTRUCTOR):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return current_user
 
-# --- Example Protected Route ---
+@app.post("/api/v1/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(current_user: Annotated[TokenData, Depends(get_current_user)]):
+    """Revokes the access token used for this request."""
+    revoked_tokens.revoke_token(current_user.token_id, current_user.expires_at)
+
+@app.get("/api/v1/auth/hasher/stats", dependencies=[Depends(require_admin)])
+def get_password_hasher_stats():
+    """Returns queue depth and wait times for the bcrypt thread pool (admins only)."""
+    return password_hasher.stats()
+
+# --- Protected Routes ---
 
 @app.get("/api/v1/users/me", response_model=UserResponse)
-async def read_users_me(current_user: Annotated[UserResponse, Depends(get_current_user)]):
-    """Example route to demonstrate JWT protection (returns the logged-in user's data)."""
-    return current_user
+async def read_users_me(current_user: Annotated[TokenData, Depends(get_current_user)]):
+    """Returns the logged-in user's data straight from the token."""
+    return UserResponse(full_name=current_user.full_name, email=current_user.email)
+
+@app.get("/api/v1/users/me/continue-learning", response_model=ContinueLearningResponse)
+def read_continue_learning(current_user: Annotated[TokenData, Depends(get_current_user)], db = Depends(get_read_db)):
+    """
+    Returns where the current user should resume: their most recently
+    active unfinished course and its next lesson, from the enrollment cursor.
+    """
+    return get_continue_learning(db, current_user.user_id)
+
+@app.put("/api/v1/users/{user_id}/role", response_model=UserResponse, dependencies=[Depends(require_admin)])
+def update_user_role(user_id: int, role_update: UserRoleUpdate, db = Depends(get_db)):
+    """
+    Changes a user's role (admins only).
+    Tokens issued to the user before the change are revoked so the new role
+    takes effect on their next login.
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.role = UserRole(role_update.role.value)
+    db.commit()
+    revoked_tokens.revoke_user(user.id, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    return UserResponse.model_validate(user)
     
 # ----------------------------------------------------
 # DASHBOARD API ENDPOINT - NEW ADDITION
 # ----------------------------------------------------
 
 @app.get("/api/dashboard", response_model=DashboardData)
-def get_dashboard_data():
+async def get_dashboard_data(current_user: Annotated[TokenData | None, Depends(get_optional_user)]):
     """
     Returns all data required to render the user dashboard.
-    This is the endpoint your React component will call.
+    With a bearer token it is computed for that user (progress, modules
+    completed, continue-learning) and cached per user for a few seconds;
+    without one, the guest dashboard with navigation and featured courses.
+    Cache hits are answered on the event loop; only misses open a session
+    on the thread pool.
     """
-    return DASHBOARD_DATA_SOURCE
+    content = cached_dashboard(current_user)
+    if content is None:
+        content = await run_in_threadpool(load_dashboard, current_user)
+    return Response(content=content, media_type="application/json")
 
 # ----------------------------------------------------
 # COURSES API ENDPOINT - NEW ADDITION
 # ----------------------------------------------------
 
+@app.get("/api/cache/stats", dependencies=[Depends(require_admin)])
+def get_cache_stats():
+    """
+    Returns hit/miss/eviction counters for the course catalog cache (admins only).
+    """
+    return catalog_cache.stats()
+
+@app.get("/api/compression/stats", dependencies=[Depends(require_admin)])
+def get_compression_stats():
+    """
+    Returns bytes saved, compression time and variant cache counters (admins only).
+    """
+    return {**compression_stats.stats(), "variants": compressed_variants.stats()}
+
+@app.get("/api/dashboard/cache/stats", dependencies=[Depends(require_admin)])
+def get_dashboard_cache_stats():
+    """
+    Returns hit/miss/eviction counters for the per-user dashboard cache (admins only).
+    """
+    return dashboard_cache.stats()
+
 @app.get("/api/courses", response_model=List[CourseResponse])
-def get_courses(db = Depends(get_db)):
+def get_courses(request: Request, db = Depends(get_read_db)):
     """
-    Returns all available courses from the database.
+    Returns all available courses from the catalog cache.
+    Supports conditional GETs via ETag / Last-Modified.
     """
-    courses = db.query(Course).all()
-    return courses
+    entry = get_course_list(db)
+    return json_response(request, entry.body, entry.validators)
 
-@app.get("/api/courses/{course_id}")
-def get_course_with_modules(course_id: int, db = Depends(get_db)):
+@app.get("/api/courses/{course_id}", response_model=CourseDetailResponse)
+def get_course_with_modules(course_id: int, request: Request, db = Depends(get_read_db)):
     """
     Returns a specific course with its modules and lessons.
+    The tree is sent as pre-rendered JSON bytes, cached per course and
+    materialized in course_snapshots. It is re-rendered (in three queries)
+    only when the course, one of its modules or one of its lessons has changed.
+    Supports conditional GETs via ETag / Last-Modified.
     """
-    from db_models import Module, Lesson
-    
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    modules = db.query(Module).filter(Module.course_id == course_id).all()
-    
-    course_data = {
-        "id": course.id,
-        "title": course.title,
-        "description": course.description,
-        "category": course.category,
-        "icon": course.icon,
-        "color": course.color,
-        "modules": []
+    entry = get_course_tree(db, course_id)
+    return json_response(request, entry.body, entry.validators)
+
+# ----------------------------------------------------
+# RESOURCES & MEDIA API ENDPOINTS
+# ----------------------------------------------------
+
+@app.get("/api/resources/categories", response_model=List[ResourceCategoryResponse])
+def get_resource_categories(request: Request, response: Response, db = Depends(get_read_db)):
+    """
+    Returns all resource directory categories.
+    """
+    validators = Validators.from_version("resource-categories", None, resource_categories_version(db))
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+    return load_resource_categories(db)
+
+@app.get("/api/resources", response_model=List[ResourceResponse])
+def get_resources(request: Request, response: Response, page: Annotated[PageParams, Depends()], db = Depends(get_read_db)):
+    """
+    Returns one page of resources (oldest first) with their category names.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    validators = Validators.from_version("resources", page.key(), resources_version(db))
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+    return load_resources(db, page, response)
+
+class MediaFilter:
+    """Tag and media_type filters shared by the media listings."""
+    def __init__(
+        self,
+        tag: Annotated[List[str] | None, Query()] = None,
+        match: TagMatchEnum = TagMatchEnum.ALL,
+        media_type: Annotated[List[str] | None, Query()] = None,
+    ):
+        self.tags = tag or []
+        self.match_all = match == TagMatchEnum.ALL
+        self.media_types = media_type or []
+
+    def key(self) -> tuple:
+        return (tuple(self.tags), self.match_all, tuple(self.media_types))
+
+@app.get("/api/media", response_model=List[MediaResponse])
+def get_media(
+    request: Request,
+    response: Response,
+    filters: Annotated[MediaFilter, Depends()],
+    page: Annotated[PageParams, Depends()],
+    db = Depends(get_read_db),
+):
+    """
+    Returns one page of media library items (oldest first) with their tags.
+    Repeat `tag` to filter (match=all or any) and `media_type` to restrict
+    the kind; pass the X-Next-Cursor header of a page as `cursor` to go on.
+    """
+    validators = Validators.from_version("media", filters.key() + page.key(), media_version(db))
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+    if not filters.tags and not filters.media_types:
+        return load_media(db, page, response)
+    media_index.ensure_current(db)
+    result = media_index.query(
+        filters.tags, filters.match_all, filters.media_types, page.after, page.limit, facet_limit=0,
+    )
+    if result["next"] is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*result["next"])
+    return load_media_items(db, result["ids"])
+
+@app.get("/api/media/query", response_model=MediaQueryResponse)
+def query_media(
+    response: Response,
+    filters: Annotated[MediaFilter, Depends()],
+    page: Annotated[PageParams, Depends()],
+    facet_limit: int = MEDIA_FACET_LIMIT,
+    db = Depends(get_read_db),
+):
+    """
+    Returns one page of filtered media items with the total, the next-page
+    cursor and the sidebar facet counts (tags within the results; media
+    types ignoring the media_type filter), all from the in-memory tag index.
+    """
+    if facet_limit < 0:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="facet_limit must not be negative")
+    media_index.ensure_current(db)
+    result = media_index.query(
+        filters.tags, filters.match_all, filters.media_types, page.after, page.limit, facet_limit,
+    )
+    cursor = encode_cursor(*result["next"]) if result["next"] is not None else None
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return {
+        "total": result["total"],
+        "items": load_media_items(db, result["ids"]),
+        "facets": result["facets"],
+        "next_cursor": cursor,
     }
-    
-    for module in modules:
-        lessons = db.query(Lesson).filter(Lesson.module_id == module.id).all()
-        module_data = {
-            "id": module.id,
-            "title": module.title,
-            "description": module.description,
-            "order": module.order,
-            "lessons": [
-                {
-                    "id": lesson.id,
-                    "title": lesson.title,
-                    "description": lesson.description,
-                    "content": lesson.content,
-                    "duration_minutes": lesson.duration_minutes,
-                    "order": lesson.order
-                }
-                for lesson in lessons
-            ]
-        }
-        course_data["modules"].append(module_data)
-    
-    return course_data
\ No newline at end of file
+
+@app.get("/api/media/index/stats", dependencies=[Depends(require_admin)])
+def get_media_index_stats():
+    """Returns the tag index size and build/query counters (admins only)."""
+    return media_index.stats()
+
+# ----------------------------------------------------
+# COMMUNITY FORUM ENDPOINTS
+# ----------------------------------------------------
+
+@app.get("/api/forum/categories", response_model=List[ForumCategoryResponse])
+def get_forum_categories(db = Depends(get_read_db)):
+    """
+    Returns all forum categories with their discussion counts.
+    """
+    return load_forum_categories(db)
+
+@app.get("/api/forum/discussions", response_model=List[DiscussionResponse])
+def get_discussions(
+    response: Response,
+    page: Annotated[PageParams, Depends()],
+    category_id: int | None = None,
+    db = Depends(get_read_db),
+):
+    """
+    Returns one page of discussions, newest first, optionally in one category.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    return load_discussions(db, page, response, category_id)
+
+@app.get("/api/forum/discussions/{discussion_id}", response_model=DiscussionDetailResponse)
+def get_discussion(
+    discussion_id: int,
+    request: Request,
+    current_user: Annotated[TokenData | None, Depends(get_optional_user)],
+    db = Depends(get_read_db),
+):
+    """
+    Returns a discussion with its opening post and counts the view.
+    Views are buffered and written in bulk; signed-in viewers are told apart
+    by user id, anonymous ones by client address.
+    """
+    discussion = load_discussion(db, discussion_id)
+    if current_user is not None:
+        viewer = f"user:{current_user.user_id}"
+    else:
+        viewer = f"ip:{request.client.host if request.client else 'unknown'}"
+    view_counter.record(discussion_id, viewer)
+    discussion.views += 1
+    return discussion
+
+@app.get("/api/forum/discussions/{discussion_id}/replies", response_model=List[ReplyResponse])
+def get_discussion_replies(
+    discussion_id: int,
+    response: Response,
+    page: Annotated[PageParams, Depends()],
+    db = Depends(get_read_db),
+):
+    """
+    Returns one page of a discussion's replies, oldest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    """
+    return load_replies(db, discussion_id, page, response)
+
+@app.post(
+    "/api/forum/discussions/{discussion_id}/replies",
+    response_model=ReplyResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def post_discussion_reply(
+    discussion_id: int,
+    reply: CreateReplyRequest,
+    current_user: Annotated[TokenData, Depends(get_current_user)],
+    db = Depends(get_db),
+):
+    """
+    Adds a reply to a discussion.
+    The discussion's replies_count is incremented in the same transaction.
+    """
+    if not reply.content.strip():
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Reply must not be empty")
+    created, (category_id, replies) = create_reply(
+        db, discussion_id, current_user.user_id, current_user.full_name, reply.content,
+    )
+    db.commit()
+    live_hub.publish(discussion_topic(discussion_id), {"type": "reply.created", "reply": created.model_dump()})
+    live_hub.publish(category_topic(category_id), {"type": "discussion.updated", "id": discussion_id, "replies": replies})
+    return created
+
+@app.get("/api/forum/views/stats", dependencies=[Depends(require_admin)])
+def get_view_counter_stats():
+    """
+    Returns pending forum views and flush latency counters (admins only).
+    """
+    return view_counter.stats()
+
+@app.get("/api/search", response_model=SearchResponse)
+def search_everything(
+    q: str,
+    type: Annotated[List[SearchTypeEnum] | None, Query()] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db = Depends(get_read_db),
+):
+    """
+    Full-text search over courses, lessons, resources, media and discussions,
+    ranked by BM25 with highlighted snippets. Repeat `type` to filter by kind;
+    `counts` always covers every kind.
+    """
+    if not 1 <= limit <= SEARCH_MAX_LIMIT or offset < 0:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT} and offset not negative",
+        )
+    return search(db, q, [kind.value for kind in type] if type else None, limit, offset)
+
+# ----------------------------------------------------
+# LIVE UPDATES (WEBSOCKET)
+# ----------------------------------------------------
+
+@app.websocket("/ws")
+async def live_updates(websocket: WebSocket, token: str | None = None, topic: List[str] = Query([])):
+    """
+    Pushes forum and progress events for the subscribed topics.
+    Authenticate with ?token=<JWT> (browsers cannot set headers on a
+    WebSocket) or an Authorization header; subscribe with ?topic=... or by
+    sending {"action": "subscribe", "topic": ...}. The connection is closed
+    with 1008 when the token is invalid or expires.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    try:
+        current_user = await get_current_user(token or "")
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    subscriber = live_hub.connect(current_user, websocket.send_text, lambda code: websocket.close(code=code))
+    expiry = asyncio.get_running_loop().call_later(
+        max(0.0, current_user.expires_at - time.time()),
+        lambda: asyncio.ensure_future(websocket.close(code=status.WS_1008_POLICY_VIOLATION)),
+    )
+    try:
+        for name in topic:
+            live_hub.send(subscriber, live_hub.handle(subscriber, {"action": "subscribe", "topic": name}))
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+            if message.get("text") is None:
+                # Commands are JSON text frames
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+                break
+            try:
+                command = json.loads(message["text"])
+            except ValueError:
+                command = None
+            live_hub.send(subscriber, live_hub.handle(subscriber, command))
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # the client left, or we closed the socket (expired token, slow consumer)
+    finally:
+        expiry.cancel()
+        live_hub.disconnect(subscriber)
+
+@app.get("/api/live/stats", dependencies=[Depends(require_admin)])
+def get_live_stats():
+    """
+    Returns WebSocket connection, topic and delivery counters (admins only).
+    """
+    return live_hub.stats()
+
+def publish_progress(user_id: int, lessons: list):
+    """Push written lesson progress to the user's open players and dashboards."""
+    for progress in lessons:
+        live_hub.publish(progress_topic(user_id), {
+            "type": "lesson_progress",
+            "lesson_id": progress.lesson_id,
+            "status": progress.status.value,
+            "progress_percentage": progress.progress_percentage,
+        })
+
+# ----------------------------------------------------
+# PROGRESS API ENDPOINTS
+# ----------------------------------------------------
+
+@app.get(
+    "/api/users/{user_id}/lesson-progress/{lesson_id}",
+    response_model=LessonProgressResponse,
+    dependencies=[Depends(require_self_or_staff)],
+)
+def get_lesson_progress(user_id: int, lesson_id: int, db = Depends(get_read_db)):
+    """
+    Returns a user's progress on a single lesson.
+    """
+    progress = db.query(LessonProgress).filter_by(user_id=user_id, lesson_id=lesson_id).first()
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Lesson progress not found")
+    return progress
+
+@app.put(
+    "/api/users/{user_id}/lesson-progress/{lesson_id}",
+    response_model=LessonProgressResponse,
+    dependencies=[Depends(require_self_or_staff)],
+)
+def update_lesson_progress(user_id: int, lesson_id: int, update: UpdateLessonProgressRequest, db = Depends(get_db)):
+    """
+    Records a user's progress on a lesson.
+    A completion change is rolled up into the module and course progress in
+    the same transaction.
+    """
+    heartbeat_buffer.discard(user_id, lesson_id)
+    progress = record_lesson_progress(
+        db, user_id, lesson_id, LessonStatus[update.status.name], update.progress_percentage,
+    )
+    db.commit()
+    invalidate_dashboard(user_id)
+    completion_matrix.apply(user_id, lesson_id, progress.status == LessonStatus.COMPLETED)
+    publish_progress(user_id, [progress])
+    return progress
+
+@app.post(
+    "/api/users/{user_id}/lesson-progress/{lesson_id}/heartbeat",
+    response_model=LessonProgressResponse,
+    dependencies=[Depends(require_self_or_staff)],
+)
+def lesson_progress_heartbeat(user_id: int, lesson_id: int, update: UpdateLessonProgressRequest, db = Depends(get_db)):
+    """
+    Accepts a periodic playback position report.
+    The latest percentage is buffered and written in bulk (202 Accepted);
+    a COMPLETED status is written immediately and returned like a PUT.
+    """
+    if update.status != LessonStatusEnum.COMPLETED:
+        heartbeat_buffer.record(user_id, lesson_id, update.progress_percentage)
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    return update_lesson_progress(user_id, lesson_id, update, db)
+
+@app.get("/api/progress/heartbeats/stats", dependencies=[Depends(require_admin)])
+def get_heartbeat_stats():
+    """
+    Returns buffer depth, flush latency and batch size counters (admins only).
+    """
+    return heartbeat_buffer.stats()
+
+@app.post(
+    "/api/users/{user_id}/lesson-progress/batch",
+    response_model=LessonProgressBatchResponse,
+    dependencies=[Depends(require_self_or_staff)],
+)
+def update_lesson_progress_batch(user_id: int, updates: List[LessonProgressBatchItem], db = Depends(get_db)):
+    """
+    Records a queue of lesson progress updates in one transaction.
+    For each lesson the update with the newest client_updated_at wins; older
+    ones are reported in ignored_lesson_ids. The refreshed module and course
+    progress is returned so the client does not need follow-up GETs.
+    """
+    if len(updates) > PROGRESS_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {PROGRESS_BATCH_MAX_ITEMS} updates per batch",
+        )
+    for item in updates:
+        heartbeat_buffer.discard(user_id, item.lesson_id)
+    written, ignored, module_ids, course_ids = record_lesson_progress_batch(db, user_id, updates)
+    db.commit()
+    invalidate_dashboard(user_id)
+
+    lesson_ids = written | ignored
+    lessons = (
+        db.query(LessonProgress)
+        .filter(LessonProgress.user_id == user_id, LessonProgress.lesson_id.in_(lesson_ids))
+        .order_by(LessonProgress.lesson_id)
+        .all()
+    )
+    for lesson in lessons:
+        completion_matrix.apply(user_id, lesson.lesson_id, lesson.status == LessonStatus.COMPLETED)
+    publish_progress(user_id, lessons)
+    modules, courses = get_progress_aggregates(db, user_id, module_ids, course_ids)
+    return {
+        "lessons": lessons,
+        "modules": modules,
+        "courses": courses,
+        "ignored_lesson_ids": sorted(ignored),
+    }
+
+@app.get(
+    "/api/users/{user_id}/module-progress/{module_id}",
+    response_model=ModuleProgressResponse,
+    dependencies=[Depends(require_self_or_staff)],
+)
+def get_user_module_progress(user_id: int, module_id: int, db = Depends(get_read_db)):
+    """
+    Returns a user's progress through a module, read from its rollup row.
+    """
+    return get_module_progress(db, user_id, module_id)
+
+# --- Course Analytics (rollup tables only) ---
+
+ANALYTICS_DEFAULT_RANGE_DAYS = 30
+
+require_staff = require_role(UserRoleEnum.ADMIN, UserRoleEnum.INSTRUCTOR)
+
+def analytics_range(start: date | None = None, end: date | None = None) -> tuple[date, date]:
+    """Inclusive day range for analytics queries; defaults to the last 30 days."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="start must not be after end")
+    return start, end
+
+@app.get("/api/admin/analytics/courses", response_model=List[CourseAnalyticsResponse], dependencies=[Depends(require_staff)])
+def get_course_analytics(day_range: Annotated[tuple, Depends(analytics_range)], db = Depends(get_read_db)):
+    """
+    Returns completion rate and time-to-complete per course, read from the
+    daily rollups (instructors and admins only).
+    """
+    return course_analytics(db, *day_range)
+
+@app.get(
+    "/api/admin/analytics/courses/{course_id}/lessons",
+    response_model=List[LessonAnalyticsResponse],
+    dependencies=[Depends(require_staff)],
+)
+def get_lesson_analytics(course_id: int, day_range: Annotated[tuple, Depends(analytics_range)], db = Depends(get_read_db)):
+    """
+    Returns starts, completions and drop-off for each lesson of a course in
+    course order, read from the daily rollups (instructors and admins only).
+    """
+    return lesson_analytics(db, course_id, *day_range)
+
+@app.post("/api/admin/analytics/refresh", dependencies=[Depends(require_admin)])
+def refresh_course_analytics(days: int = ANALYTICS_REFRESH_DAYS, db = Depends(get_db)):
+    """Rebuilds the rollups for the last `days` days right away (admins only)."""
+    if not 1 <= days <= 366:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="days must be between 1 and 366")
+    counts = refresh_recent(db, days)
+    db.commit()
+    return {"days": days, **counts}
+
+# --- Completion Matrix (in-memory bitsets) ---
+
+def course_completion_matrix(course_id: int, db = Depends(get_read_db)):
+    matrix = completion_matrix.course(db, course_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="Course not found or has no lessons")
+    return matrix
+
+@app.get(
+    "/api/admin/completion/courses/{course_id}",
+    response_model=CourseCompletionResponse,
+    dependencies=[Depends(require_staff)],
+)
+def get_course_completion(matrix = Depends(course_completion_matrix)):
+    """
+    Returns how many users completed each lesson, each module and the whole
+    course, counted from the in-memory completion bitsets (instructors and admins only).
+    """
+    return {
+        "course_id": matrix.course_id,
+        "lessons": [{"lesson_id": lesson_id, "completed": count} for lesson_id, count in matrix.lesson_counts().items()],
+        "modules": [{"module_id": module_id, "completed": count} for module_id, count in matrix.module_counts().items()],
+        "completed_course": matrix.course_count(),
+    }
+
+@app.post(
+    "/api/admin/completion/courses/{course_id}/cohort",
+    response_model=CohortCompletionResponse,
+    dependencies=[Depends(require_staff)],
+)
+def get_cohort_completion(cohort: CohortCompletionRequest, matrix = Depends(course_completion_matrix)):
+    """
+    Intersects a cohort with the course's completion bitsets: lesson counts
+    within the cohort, the lessons every member completed, and each member's
+    progress (instructors and admins only).
+    """
+    user_ids = sorted(set(cohort.user_ids))
+    result = matrix.cohort(user_ids)
+    return {
+        "course_id": matrix.course_id,
+        "cohort_size": len(user_ids),
+        "lessons": [{"lesson_id": lesson_id, "completed": count} for lesson_id, count in result["lessons"].items()],
+        "completed_by_all": result["completed_by_all"],
+        "completed_course": result["completed_course"],
+        "users": [{"user_id": user_id, "progress_percentage": pct} for user_id, pct in result["progress"].items()],
+    }
+
+@app.get("/api/admin/completion/stats", dependencies=[Depends(require_admin)])
+def get_completion_matrix_stats():
+    """Returns the completion matrix's size in memory and its load/sync counters (admins only)."""
+    return completion_matrix.stats()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Rebuild the pre-rendered JSON snapshots of every course tree.
+Run after seeding or bulk content edits so the first request for each course
+does not have to render it.
+"""
+from catalog import materialize_all_course_trees
+from database import SessionLocal, create_all_tables
+
+def materialize_courses():
+    """Render and store the JSON snapshot for every course."""
+    print("Materializing course snapshots...")
+
+    create_all_tables()
+
+    db = SessionLocal()
+    try:
+        count = materialize_all_course_trees(db)
+        print(f"✓ {count} course snapshots up to date")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    materialize_courses()
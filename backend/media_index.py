@@ -0,0 +1,327 @@
+"""
+In-memory tag index for the media library of Jijue LMS.
+Every tag maps to the sorted ids of the media items carrying it (and every
+media_type to its ids), so AND/OR tag filters are set intersections/unions
+of posting lists instead of media_tags self-joins. Facet counts for the
+sidebar are tallied in the same pass over the matching items.
+
+The index is built at startup and follows ORM writes to media_library and
+media_tags once they commit. It also keeps the created_at/updated_at of
+every row it holds, so it can compute the media_version stamp of its
+contents; every MEDIA_INDEX_CHECK_SECONDS a query compares that with the
+database and rebuilds if another process added, edited or deleted items or
+tags.
+"""
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from content import media_version
+from db_models import MediaLibrary, MediaTag
+
+MEDIA_INDEX_CHECK_SECONDS = float(os.getenv("MEDIA_INDEX_CHECK_SECONDS", "5"))
+MEDIA_FACET_LIMIT = 50
+
+
+class MediaEntry:
+    """What the index keeps per media item."""
+    __slots__ = ("media_type", "created_at", "updated_at", "rows", "tags")
+
+    def __init__(self, media_type, created_at, updated_at=None):
+        self.media_type = media_type
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.rows = {}  # media_tags.id -> tag
+        self.tags = ()  # distinct tags
+
+
+def _insert(postings: dict, key, media_id: int):
+    ids = postings.setdefault(key, array("I"))
+    index = bisect_left(ids, media_id)
+    if index == len(ids) or ids[index] != media_id:
+        ids.insert(index, media_id)
+
+
+def _remove(postings: dict, key, media_id: int):
+    ids = postings.get(key)
+    if ids is None:
+        return
+    index = bisect_left(ids, media_id)
+    if index < len(ids) and ids[index] == media_id:
+        del ids[index]
+    if not ids:
+        del postings[key]
+
+
+def _top(counts: Counter, limit: int, keep=()) -> list:
+    """The `limit` largest counts, plus any `keep` values outside them."""
+    top = counts.most_common(limit)
+    shown = {value for value, _ in top}
+    top += [(value, counts[value]) for value in keep if value not in shown]
+    return [{"value": value, "count": count} for value, count in top]
+
+
+class MediaTagIndex:
+    """Tag and media_type posting lists over the media library."""
+
+    def __init__(self, check_interval: float = MEDIA_INDEX_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._items = {}  # media id -> MediaEntry
+        self._tags = {}  # tag -> array of media ids
+        self._types = {}  # media_type -> array of media ids
+        self._tag_rows = {}  # media_tags.id -> media id
+        self._tag_updated = {}  # media_tags.id -> updated_at
+        self._rank = None  # media id -> place in (created_at, id) order
+        self._loaded = False
+        self._checked_at = 0.0
+        self._stats = {"builds": 0, "build_ms": 0.0, "queries": 0, "writes_applied": 0}
+
+    # --- Maintenance ---
+
+    def _add_item(self, media_id: int, media_type, created_at, updated_at=None):
+        previous = self._items.get(media_id)
+        entry = MediaEntry(media_type, created_at, updated_at)
+        if previous is not None:
+            _remove(self._types, previous.media_type, media_id)
+            entry.rows, entry.tags = previous.rows, previous.tags
+        self._items[media_id] = entry
+        self._rank = None
+        _insert(self._types, media_type, media_id)
+
+    def _remove_item(self, media_id: int):
+        entry = self._items.pop(media_id, None)
+        if entry is None:
+            return
+        self._rank = None
+        _remove(self._types, entry.media_type, media_id)
+        for row_id in entry.rows:
+            self._tag_rows.pop(row_id, None)
+            self._tag_updated.pop(row_id, None)
+        for tag in entry.tags:
+            _remove(self._tags, tag, media_id)
+
+    def _retag(self, media_id: int):
+        """Refresh an item's distinct tags and the posting lists that changed."""
+        entry = self._items[media_id]
+        tags = tuple(dict.fromkeys(entry.rows.values()))
+        for removed in set(entry.tags) - set(tags):
+            _remove(self._tags, removed, media_id)
+        for added in set(tags) - set(entry.tags):
+            _insert(self._tags, added, media_id)
+        entry.tags = tags
+
+    def _set_tag_row(self, row_id: int, media_id: int, tag: str | None, updated_at=None):
+        """Add, change or (tag=None) drop one media_tags row."""
+        previous = self._tag_rows.pop(row_id, None)
+        self._tag_updated.pop(row_id, None)
+        if previous in self._items:
+            self._items[previous].rows.pop(row_id, None)
+            self._retag(previous)
+        if tag is not None and media_id in self._items:
+            self._items[media_id].rows[row_id] = tag
+            self._tag_rows[row_id] = media_id
+            self._tag_updated[row_id] = updated_at
+            self._retag(media_id)
+
+    def build(self, db):
+        """Rebuild the index from media_library and media_tags."""
+        started = time.perf_counter()
+        with self._lock:
+            self._items, self._tags, self._types, self._tag_rows, self._tag_updated = {}, {}, {}, {}, {}
+            self._rank = None
+            for media_id, media_type, created_at, updated_at in db.execute(
+                select(MediaLibrary.id, MediaLibrary.media_type, MediaLibrary.created_at, MediaLibrary.updated_at)
+                .order_by(MediaLibrary.id)
+            ):
+                self._items[media_id] = MediaEntry(media_type, created_at, updated_at)
+                self._types.setdefault(media_type, array("I")).append(media_id)
+            tags = {}
+            for row_id, media_id, tag, updated_at in db.execute(
+                select(MediaTag.id, MediaTag.media_id, MediaTag.tag, MediaTag.updated_at)
+                .order_by(MediaTag.media_id, MediaTag.id)
+            ):
+                entry = self._items.get(media_id)
+                if entry is None:
+                    continue
+                entry.rows[row_id] = tag
+                self._tag_rows[row_id] = media_id
+                self._tag_updated[row_id] = updated_at
+                postings = tags.setdefault(tag, array("I"))
+                if not postings or postings[-1] != media_id:
+                    postings.append(media_id)
+            self._tags = tags
+            for entry in self._items.values():
+                entry.tags = tuple(dict.fromkeys(entry.rows.values()))
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            self._stats["builds"] += 1
+            self._stats["build_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def version(self) -> tuple:
+        """The media_version stamp of the rows the index holds."""
+        return (
+            max((entry.created_at for entry in self._items.values() if entry.created_at is not None), default=None),
+            len(self._items),
+            len(self._tag_rows),
+            max(self._tag_rows, default=None),
+            max((entry.updated_at for entry in self._items.values() if entry.updated_at is not None), default=None),
+            max((updated_at for updated_at in self._tag_updated.values() if updated_at is not None), default=None),
+        )
+
+    def ensure_current(self, db):
+        """Build on first use; rebuild when the database moved on without us."""
+        with self._lock:
+            if not self._loaded:
+                self.build(db)
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                if media_version(db) != self.version():
+                    self.build(db)
+
+    def apply(self, changes: list):
+        """Apply committed ORM changes: (kind, op, values) tuples."""
+        with self._lock:
+            if not self._loaded:
+                return
+            for kind, op, values in changes:
+                if kind == "media":
+                    if op == "delete":
+                        self._remove_item(values[0])
+                    else:
+                        self._add_item(*values)
+                else:
+                    row_id, media_id, tag, updated_at = values
+                    self._set_tag_row(row_id, media_id, None if op == "delete" else tag, updated_at)
+                self._stats["writes_applied"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items, self._tags, self._types, self._tag_rows, self._tag_updated = {}, {}, {}, {}, {}
+            self._rank = None
+            self._loaded = False
+
+    # --- Queries ---
+
+    def _tag_matches(self, tags, match_all: bool):
+        """Media ids carrying all (or any) of `tags`; None means no tag filter."""
+        if not tags:
+            return None
+        postings = sorted((self._tags.get(tag, ()) for tag in tags), key=len)
+        if match_all:
+            if not postings[0]:
+                return set()
+            ids = set(postings[0])
+            for other in postings[1:]:
+                ids.intersection_update(other)
+            return ids
+        return set().union(*postings)
+
+    def _position(self, media_id: int) -> tuple:
+        return (self._items[media_id].created_at or datetime.min, media_id)
+
+    def _ranks(self) -> dict:
+        """Every item's place in (created_at, id) order, recomputed after changes."""
+        if self._rank is None:
+            self._rank = {media_id: rank for rank, media_id in enumerate(sorted(self._items, key=self._position))}
+        return self._rank
+
+    def query(self, tags=(), match_all: bool = True, media_types=(), after: tuple | None = None,
+              limit: int | None = None, facet_limit: int = MEDIA_FACET_LIMIT) -> dict:
+        """
+        Matching media ids in (created_at, id) order, starting after the
+        `after` position, with the total, the position to continue from (None
+        on the last page) and facet counts. Tag facets count within the full
+        result; media_type facets ignore the media_type filter so every type
+        stays selectable.
+        """
+        with self._lock:
+            self._stats["queries"] += 1
+            by_tags = self._tag_matches(tags, match_all)
+            if by_tags is None:
+                by_tags = self._items.keys()
+            type_counts = Counter(self._items[media_id].media_type for media_id in by_tags)
+            if media_types:
+                typed = set().union(*(self._types.get(media_type, ()) for media_type in media_types))
+                matched = typed.intersection(by_tags)
+            else:
+                matched = by_tags
+            tag_counts = Counter()
+            if facet_limit:
+                tag_counts.update(chain.from_iterable(self._items[media_id].tags for media_id in matched))
+
+            ids = sorted(matched, key=self._ranks().__getitem__)
+            if after is not None and after[0] is None:
+                after = (datetime.min, after[1])
+            start = 0 if after is None else bisect_right(ids, after, key=self._position)
+            end = len(ids) if limit is None else start + limit
+            return {
+                "total": len(ids),
+                "ids": ids[start:end],
+                "next": (self._items[ids[end - 1]].created_at, ids[end - 1]) if end < len(ids) else None,
+                "facets": {
+                    "tags": _top(tag_counts, facet_limit, keep=tags),
+                    "media_types": _top(type_counts, len(type_counts)),
+                },
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "tags": len(self._tags),
+                "postings": sum(len(ids) for ids in self._tags.values()),
+                **self._stats,
+            }
+
+
+media_index = MediaTagIndex()
+
+
+# --- Following ORM writes ---
+# Changes are collected per session at flush and applied only after commit.
+
+def _record(session, change):
+    session.info.setdefault("media_index_changes", []).append(change)
+
+
+@event.listens_for(MediaLibrary, "after_insert")
+@event.listens_for(MediaLibrary, "after_update")
+def _media_saved(mapper, connection, target):
+    _record(Session.object_session(target), ("media", "save", (target.id, target.media_type, target.created_at, target.updated_at)))
+
+
+@event.listens_for(MediaLibrary, "after_delete")
+def _media_deleted(mapper, connection, target):
+    _record(Session.object_session(target), ("media", "delete", (target.id,)))
+
+
+@event.listens_for(MediaTag, "after_insert")
+@event.listens_for(MediaTag, "after_update")
+def _tag_saved(mapper, connection, target):
+    _record(Session.object_session(target), ("tag", "save", (target.id, target.media_id, target.tag, target.updated_at)))
+
+
+@event.listens_for(MediaTag, "after_delete")
+def _tag_deleted(mapper, connection, target):
+    _record(Session.object_session(target), ("tag", "delete", (target.id, target.media_id, target.tag, target.updated_at)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    changes = session.info.pop("media_index_changes", None)
+    if changes:
+        media_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("media_index_changes", None)
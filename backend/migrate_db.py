@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Bring an existing Jijue LMS database up to the current schema in place.
+Creates missing tables, adds missing columns and builds any index declared
+in db_models.py that the database does not have yet, without dropping or
+rewriting data. New progress rollup columns are backfilled from lesson_progress.
+
+Unique indexes are only built when the existing rows already satisfy them;
+duplicates are reported so they can be merged by hand first, and the script
+exits non-zero until they are, so a deploy does not carry on without them.
+"""
+import sys
+
+from sqlalchemy import MetaData, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+
+import db_models  # noqa: F401  (registers every model on Base.metadata)
+from database import Base, SessionLocal, engine, create_all_tables
+from progress import rebuild_progress_rollups
+
+# Columns derived from lesson_progress; adding any of them triggers a rebuild
+ROLLUP_COLUMNS = {
+    "module_progress.completed_lessons", "module_progress.total_lessons",
+    "enrollments.completed_lessons", "enrollments.total_lessons",
+    "enrollments.next_lesson_id", "enrollments.next_module_id",
+    "enrollments.next_link", "enrollments.last_activity_at",
+}
+
+def find_duplicates(connection, index) -> int:
+    """Number of value groups that would violate a unique index."""
+    columns = list(index.columns)
+    groups = (
+        select(*columns)
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    return connection.execute(select(func.count()).select_from(groups)).scalar()
+
+def concurrent_copy(index):
+    """
+    The index with postgresql_concurrently set, on a copy of its table in a
+    scratch MetaData so the models' own Index is left untouched.
+    """
+    table = index.table.to_metadata(MetaData())
+    copy = next(candidate for candidate in table.indexes if candidate.name == index.name)
+    copy.dialect_kwargs["postgresql_concurrently"] = True
+    return copy
+
+def create_index(bind, index):
+    """Build one index; on PostgreSQL use CREATE INDEX CONCURRENTLY so writes keep flowing."""
+    if bind.dialect.name == "postgresql":
+        index = concurrent_copy(index)
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            index.create(connection)
+    else:
+        # SQLite builds the index in a single short write transaction
+        with bind.begin() as connection:
+            index.create(connection)
+
+def migrate_columns(bind=engine) -> list:
+    """Add declared columns missing from existing tables; returns "table.column" names added."""
+    added = []
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            # NOT NULL columns rely on their server_default to fill existing rows
+            ddl = CreateColumn(column).compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            print(f"✓ Added {table.name}.{column.name}")
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def migrate_indexes(bind=engine) -> dict:
+    """Create declared indexes that are missing; returns the names created and skipped."""
+    created, skipped = [], []
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing:
+                continue
+            if index.unique:
+                with bind.connect() as connection:
+                    duplicates = find_duplicates(connection, index)
+                if duplicates:
+                    print(f"⚠ Skipping {index.name}: {duplicates} duplicate groups in {table.name}")
+                    skipped.append(index.name)
+                    continue
+            create_index(bind, index)
+            print(f"✓ Created {index.name}")
+            created.append(index.name)
+    return {"created": created, "skipped": skipped}
+
+def migrate_database() -> bool:
+    """Run every in-place migration step; returns False if any step failed or was skipped."""
+    print("Migrating database schema...")
+
+    # New tables come with their indexes
+    create_all_tables()
+
+    try:
+        added = migrate_columns()
+        if ROLLUP_COLUMNS.intersection(added):
+            db = SessionLocal()
+            try:
+                rebuild_progress_rollups(db)
+                db.commit()
+                print("✓ Backfilled progress rollups")
+            finally:
+                db.close()
+
+        result = migrate_indexes()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+    if result["skipped"]:
+        print(f"\n❌ {len(result['skipped'])} unique indexes not built: merge the duplicate rows and run again")
+        return False
+    print(f"\n✅ {len(result['created'])} indexes created")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate_database() else 1)
@@ -1,6 +1,7 @@
 # backend/models.py
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
+from datetime import datetime
 from enum import Enum
 
 # --- User Data Schemas ---
@@ -34,12 +35,33 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+class UserRoleEnum(str, Enum):
+    """Enum for user roles (mirrors db_models.UserRole)."""
+    ADMIN = "admin"
+    INSTRUCTOR = "instructor"
+    STUDENT = "student"
+
 class TokenData(BaseModel):
     """
     Schema for data contained within the JWT payload.
-    Used internally for dependency injection (getting the current user).
+    Used internally for dependency injection (getting the current user):
+    protected routes receive it as the authenticated principal without any
+    database lookup.
+    """
+    user_id: int
+    email: EmailStr
+    full_name: str
+    role: UserRoleEnum
+    token_id: Optional[str] = None
+    issued_at: float
+    expires_at: float
+
+class UserRoleUpdate(BaseModel):
     """
-    email: Optional[EmailStr] = None
+    Schema for changing a user's role.
+    Used for PUT /api/v1/users/{user_id}/role
+    """
+    role: UserRoleEnum
 
 # --- Course Data Schemas ---
 
@@ -71,9 +93,9 @@ class CourseDetailResponse(BaseModel):
     id: int
     title: str
     description: Optional[str] = None
-    category: str
-    icon: str
-    color: str
+    category: Optional[str] = None
+    icon: Optional[str] = None
+    color: Optional[str] = None
     modules: List[ModuleResponse] = []
     
     class Config:
@@ -118,4 +140,242 @@ class ModuleProgressResponse(BaseModel):
 class UpdateLessonProgressRequest(BaseModel):
     """Schema for updating lesson progress."""
     status: LessonStatusEnum
-    progress_percentage: int
\ No newline at end of file
+    progress_percentage: int
+
+class CourseProgressResponse(BaseModel):
+    """Schema for a user's rolled-up progress through a course."""
+    course_id: int
+    total_lessons: int
+    completed_lessons: int
+    progress_percentage: int
+
+class ContinueLearningResponse(BaseModel):
+    """Schema for the dashboard's continue-learning card."""
+    course_id: Optional[int] = None
+    course_title: Optional[str] = None
+    module_id: Optional[int] = None
+    module_title: Optional[str] = None
+    lesson_id: Optional[int] = None
+    lesson_title: Optional[str] = None
+    link: Optional[str] = None
+    progress_percentage: int = 0
+    status: LessonStatusEnum = LessonStatusEnum.NOT_STARTED
+
+class LessonProgressBatchItem(UpdateLessonProgressRequest):
+    """One queued lesson progress update, stamped with the client's clock."""
+    lesson_id: int
+    client_updated_at: datetime
+
+class LessonProgressBatchResponse(BaseModel):
+    """Result of a batched progress upload with the refreshed aggregates."""
+    lessons: List[LessonProgressResponse]
+    modules: List[ModuleProgressResponse]
+    courses: List[CourseProgressResponse]
+    ignored_lesson_ids: List[int]  # updates older than what the server already has
+
+# --- Resource & Media Data Schemas ---
+
+class ResourceCategoryResponse(BaseModel):
+    """Schema for a resource directory category."""
+    id: int
+    name: str
+    description: Optional[str] = None
+    icon: Optional[str] = None
+    color: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class ResourceResponse(BaseModel):
+    """Schema for a resource, with its category name and type as used by the directory page."""
+    id: int
+    title: str
+    description: Optional[str] = None
+    url: Optional[str] = None
+    type: Optional[str] = None
+    icon: Optional[str] = None
+    category_id: int
+    category: str
+
+class MediaResponse(BaseModel):
+    """Schema for a media library item with its tags."""
+    id: int
+    title: str
+    description: Optional[str] = None
+    media_type: Optional[str] = None
+    url: str
+    thumbnail: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    tags: List[str] = []
+
+class TagMatchEnum(str, Enum):
+    ALL = "all"
+    ANY = "any"
+
+class FacetCount(BaseModel):
+    """Schema for one facet value and how many results carry it."""
+    value: Optional[str] = None
+    count: int
+
+class MediaFacets(BaseModel):
+    """Schema for the media library sidebar counts."""
+    tags: List[FacetCount]
+    media_types: List[FacetCount]
+
+class MediaQueryResponse(BaseModel):
+    """Schema for a filtered page of media items with facet counts."""
+    total: int
+    items: List[MediaResponse]
+    facets: MediaFacets
+    next_cursor: Optional[str] = None  # absent on the last page
+
+# --- Forum Schemas ---
+
+class ForumCategoryResponse(BaseModel):
+    """Schema for a forum category with its number of discussions."""
+    id: int
+    name: str
+    description: Optional[str] = None
+    icon: Optional[str] = None
+    color: Optional[str] = None
+    count: int = 0
+
+class DiscussionResponse(BaseModel):
+    """Schema for a discussion in the forum listing, shaped for the forum page."""
+    id: int
+    title: str
+    author: Optional[str] = None
+    avatar: Optional[str] = None
+    category_id: int
+    category: str
+    replies: int = 0
+    views: int = 0
+    unique_viewers: int = 0
+    created_at: Optional[datetime] = None
+
+class DiscussionDetailResponse(DiscussionResponse):
+    """Schema for a discussion with its opening post."""
+    content: Optional[str] = None
+
+class CreateReplyRequest(BaseModel):
+    """Schema for posting a reply to a discussion."""
+    content: str
+
+class ReplyResponse(BaseModel):
+    """Schema for a reply in a discussion thread."""
+    id: int
+    discussion_id: int
+    author: Optional[str] = None
+    content: str
+    created_at: Optional[datetime] = None
+
+# --- Search Schemas ---
+
+class SearchTypeEnum(str, Enum):
+    COURSE = "course"
+    LESSON = "lesson"
+    RESOURCE = "resource"
+    MEDIA = "media"
+    DISCUSSION = "discussion"
+
+class SearchResult(BaseModel):
+    """Schema for one full-text search hit."""
+    type: SearchTypeEnum
+    id: int
+    title: str
+    snippet: str  # body excerpt with matches wrapped in <mark>
+    link: str
+    score: float  # BM25, higher is better
+
+class SearchResponse(BaseModel):
+    """Schema for a page of search hits plus hit counts per type."""
+    query: str
+    results: List[SearchResult]
+    counts: dict[SearchTypeEnum, int]
+
+# --- Dashboard Schemas ---
+
+class NavItem(BaseModel):
+    name: str
+    icon: str
+    current: bool
+    link: str
+
+class CourseItem(BaseModel):
+    title: str
+    description: str
+    icon: str
+    color: str
+    link: str
+
+class ContinueLearning(BaseModel):
+    moduleTitle: str
+    description: str
+    link: str
+
+class DashboardData(BaseModel):
+    userName: str
+    progress: int
+    modulesCompleted: int
+    totalModules: int
+    continueLearning: ContinueLearning
+    featuredCourses: List[CourseItem]
+    quickLinks: List[CourseItem]
+    navigation: List[NavItem]
+
+# --- Analytics Schemas ---
+
+class CourseAnalyticsResponse(BaseModel):
+    """Schema for one course's completion numbers over a date range."""
+    course_id: int
+    course_title: str
+    learners_started: int
+    learners_completed: int
+    completion_rate: float
+    median_hours_to_complete: Optional[float] = None
+    mean_hours_to_complete: Optional[float] = None
+
+class LessonAnalyticsResponse(BaseModel):
+    """Schema for one lesson's starts, completions and drop-off over a date range."""
+    lesson_id: int
+    lesson_title: str
+    module_title: str
+    started: int
+    completed: int
+    completion_rate: float
+    dropped: int
+
+class LessonCompletionCount(BaseModel):
+    """Schema for the number of users who completed a lesson."""
+    lesson_id: int
+    completed: int
+
+class ModuleCompletionCount(BaseModel):
+    """Schema for the number of users who completed every lesson of a module."""
+    module_id: int
+    completed: int
+
+class CourseCompletionResponse(BaseModel):
+    """Schema for completion counts across a course, from the in-memory matrix."""
+    course_id: int
+    lessons: List[LessonCompletionCount]
+    modules: List[ModuleCompletionCount]
+    completed_course: int
+
+class CohortCompletionRequest(BaseModel):
+    """Schema for a cohort of users to intersect."""
+    user_ids: List[int]
+
+class UserCompletion(BaseModel):
+    """Schema for one cohort member's progress through a course."""
+    user_id: int
+    progress_percentage: int
+
+class CohortCompletionResponse(BaseModel):
+    """Schema for a cohort's completion of a course."""
+    course_id: int
+    cohort_size: int
+    lessons: List[LessonCompletionCount]
+    completed_by_all: List[int]  # lesson ids every member completed
+    completed_course: int
+    users: List[UserCompletion]
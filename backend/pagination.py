@@ -0,0 +1,91 @@
+"""
+Keyset pagination for Jijue LMS listings.
+Pages are ordered by (created_at, id) and continue strictly after the last
+row of the previous page, so page 1,000 costs the same index range scan as
+page 1 (no OFFSET). The position travels as an opaque cursor token; response
+bodies stay plain arrays and the next page's token is sent in the
+X-Next-Cursor header (absent on the last page).
+
+Legacy rows may have a NULL created_at; those sort before every dated row
+(as in media_index) and then by id, and their cursors carry a null.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_, tuple_
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime | None, row_id: int) -> str:
+    """Opaque token for the position just after (created_at, row_id)."""
+    stamp = created_at.isoformat() if created_at is not None else None
+    raw = json.dumps([stamp, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    """(created_at, id) from a cursor token; 400 if it was not issued by encode_cursor."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class PageParams:
+    """`cursor` and `limit` query parameters of a keyset-paginated listing."""
+
+    def __init__(self, cursor: str | None = None, limit: int = PAGE_SIZE_DEFAULT):
+        if not 1 <= limit <= PAGE_SIZE_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"limit must be between 1 and {PAGE_SIZE_MAX}",
+            )
+        self.cursor = cursor
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    def key(self) -> tuple:
+        """Distinguishes pages of the same listing, e.g. in ETags."""
+        return (self.cursor, self.limit)
+
+
+def keyset_page(query, created_at, row_id, page: PageParams, descending: bool = False):
+    """
+    Apply the cursor, (created_at, id) ordering and limit to a select() and
+    return it with one extra row requested, so next_cursor() can tell
+    whether another page exists.
+    """
+    if page.after is not None:
+        query = query.where(_after(created_at, row_id, *page.after, descending))
+    if descending:
+        order = (created_at.desc().nulls_last(), row_id.desc())
+    else:
+        order = (created_at.asc().nulls_first(), row_id)
+    return query.order_by(*order).limit(page.limit + 1)
+
+
+def _after(created_at, row_id, after_created_at, after_id, descending: bool):
+    """Rows past (after_created_at, after_id) in the direction of the page, NULL dates counting as earliest."""
+    if after_created_at is None:
+        undated = and_(created_at.is_(None), row_id < after_id if descending else row_id > after_id)
+        return undated if descending else or_(created_at.is_not(None), undated)
+    position = tuple_(created_at, row_id)
+    if descending:
+        return or_(position < tuple_(after_created_at, after_id), created_at.is_(None))
+    return position > tuple_(after_created_at, after_id)
+
+
+def next_cursor(rows: list, page: PageParams, response: Response, key=lambda row: (row.created_at, row.id)) -> list:
+    """Trim the extra row, set X-Next-Cursor when there is more, and return the page."""
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
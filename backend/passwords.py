@@ -0,0 +1,93 @@
+"""
+Password hashing for Jijue LMS.
+bcrypt is deliberately slow, so hashing and verification run on a dedicated,
+bounded thread pool instead of the event loop. bcrypt releases the GIL while
+it works, so other requests keep being served while logins are in flight.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bcrypt import checkpw, gensalt, hashpw
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class HasherBusy(Exception):
+    """Raised when too many hash/verify operations are already queued."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own thread pool with a cap on queued work.
+    Tracks queue depth and how long operations wait for a free worker.
+    """
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not yet finished
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured bcrypt cost."""
+        hashed = await self._run(hashpw, password.encode("utf-8"), gensalt(rounds=self.rounds))
+        return hashed.decode("utf-8")
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Check a plain password against a stored bcrypt hash."""
+        return await self._run(checkpw, plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+    def stats(self) -> dict:
+        """Queue depth and wait-time counters."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_pending": self.max_pending,
+                "in_flight": self._running,
+                "queue_depth": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(1000 * self.total_wait_seconds / self.completed, 3) if self.completed else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+            }
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy()
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def task():
+            waited = time.perf_counter() - submitted
+            with self._lock:
+                self._running += 1
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, task)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,693 @@
+"""
+Lesson -> module -> course progress rollup for Jijue LMS.
+module_progress and enrollments store completed-lesson counts and lesson
+totals. A lesson status transition applies a +1/-1 delta to both in the
+same transaction instead of recounting every lesson row, so progress reads
+cost one row whatever the course size.
+"""
+import os
+from collections import Counter
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import String, and_, case, cast, event, exists, func, literal, null, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from db_models import Course, Enrollment, Lesson, LessonProgress, LessonStatus, Module, ModuleProgress
+
+PROGRESS_BATCH_MAX_ITEMS = int(os.getenv("PROGRESS_BATCH_MAX_ITEMS", "500"))
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+NEVER = datetime(1970, 1, 1)
+
+
+def percentage(completed: int, total: int) -> int:
+    """Integer 0-100 completion percentage."""
+    return completed * 100 // total if total else 0
+
+
+def _percentage_sql(completed, total):
+    """SQL expression for the same integer percentage."""
+    return case((total > 0, completed * 100 // total), else_=0)
+
+
+# --- Rollup rows ---
+
+def _get_or_create(db, model, filters: dict, **defaults):
+    """Fetch a row by its unique key, creating it (race-safely) if missing."""
+    row = db.query(model).filter_by(**filters).first()
+    if row is not None:
+        return row
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        # Not a SAVEPOINT: pysqlite sends no BEGIN before one, so when it is
+        # the first write its RELEASE would commit the row on its own.
+        db.execute(insert(model).values(**filters, **defaults).on_conflict_do_nothing(index_elements=list(filters)))
+        return db.query(model).filter_by(**filters).one()
+    try:
+        with db.begin_nested():
+            row = model(**filters, **defaults)
+            db.add(row)
+    except IntegrityError:
+        # A concurrent request created it first
+        row = db.query(model).filter_by(**filters).one()
+    return row
+
+
+def ensure_module_progress(db, user_id: int, module_id: int, now: datetime) -> ModuleProgress:
+    """The user's module_progress row, created with the module's lesson total if missing."""
+    row = db.query(ModuleProgress).filter_by(user_id=user_id, module_id=module_id).first()
+    if row is not None:
+        return row
+    total = db.query(func.count(Lesson.id)).filter(Lesson.module_id == module_id).scalar()
+    return _get_or_create(
+        db, ModuleProgress, {"user_id": user_id, "module_id": module_id},
+        status=LessonStatus.IN_PROGRESS, completed_lessons=0, total_lessons=total,
+        progress_percentage=0, opened_at=now,
+    )
+
+
+def ensure_enrollment(db, user_id: int, course_id: int) -> Enrollment:
+    """The user's enrollment row, created with the course's lesson total if missing."""
+    row = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).first()
+    if row is not None:
+        return row
+    total = (
+        db.query(func.count(Lesson.id))
+        .join(Module, Lesson.module_id == Module.id)
+        .filter(Module.course_id == course_id)
+        .scalar()
+    )
+    return _get_or_create(
+        db, Enrollment, {"user_id": user_id, "course_id": course_id},
+        completed_lessons=0, total_lessons=total, progress_percentage=0,
+    )
+
+
+def apply_completion_delta(db, user_id: int, module_id: int, course_id: int, completed: int, uncompleted: int,
+                           now: datetime):
+    """
+    Roll `completed` new completions and `uncompleted` reverted ones in a
+    module into the user's module and course aggregates.
+    """
+    delta = completed - uncompleted
+    module_row = ensure_module_progress(db, user_id, module_id, now)
+    enrollment = ensure_enrollment(db, user_id, course_id)
+
+    if delta:
+        # Atomic increments so concurrent writers cannot lose an update
+        db.execute(
+            update(ModuleProgress)
+            .where(ModuleProgress.id == module_row.id)
+            .values(completed_lessons=ModuleProgress.completed_lessons + delta)
+        )
+        db.execute(
+            update(Enrollment)
+            .where(Enrollment.id == enrollment.id)
+            .values(completed_lessons=Enrollment.completed_lessons + delta)
+        )
+        db.refresh(module_row)
+        db.refresh(enrollment)
+
+    module_row.progress_percentage = percentage(module_row.completed_lessons, module_row.total_lessons)
+    if module_row.total_lessons and module_row.completed_lessons >= module_row.total_lessons:
+        module_row.status = LessonStatus.COMPLETED
+        module_row.completed_at = module_row.completed_at or now
+    else:
+        module_row.status = LessonStatus.IN_PROGRESS
+        module_row.completed_at = None
+
+    enrollment.progress_percentage = percentage(enrollment.completed_lessons, enrollment.total_lessons)
+    if enrollment.total_lessons and enrollment.completed_lessons >= enrollment.total_lessons:
+        enrollment.completed_at = enrollment.completed_at or now
+    else:
+        enrollment.completed_at = None
+
+    enrollment.last_activity_at = now
+    if uncompleted:
+        # An un-completion may move the cursor back, even when completions
+        # elsewhere cancel it out in the counts: search from the top.
+        advance_cursor(db, enrollment, from_cursor=False)
+    elif completed or enrollment.next_lesson_id is None:
+        # A completion can only move the cursor forward
+        advance_cursor(db, enrollment)
+    return module_row, enrollment
+
+
+# --- Continue-learning cursor ---
+
+COURSE_POSITION = (Module.order, Module.id, Lesson.order, Lesson.id)
+
+
+def course_link(course_id: int, lesson_id: int | None = None) -> str:
+    """Frontend route for a course, or for one of its lessons."""
+    if lesson_id is None:
+        return f"/course/{course_id}"
+    return f"/course/{course_id}/lesson/{lesson_id}"
+
+
+def _incomplete_lessons(user_id, course_id):
+    """Lessons of a course the user has not completed, in course order."""
+    return (
+        select(Lesson.id, Lesson.module_id)
+        .join(Module, Lesson.module_id == Module.id)
+        .outerjoin(LessonProgress, and_(LessonProgress.lesson_id == Lesson.id, LessonProgress.user_id == user_id))
+        .where(
+            Module.course_id == course_id,
+            or_(LessonProgress.id.is_(None), LessonProgress.status != LessonStatus.COMPLETED),
+        )
+        .order_by(*COURSE_POSITION)
+        .limit(1)
+    )
+
+
+def advance_cursor(db, enrollment: Enrollment, from_cursor: bool = True):
+    """
+    Point an enrollment's cursor at the user's first incomplete lesson.
+    With from_cursor the search starts at the current cursor, since every
+    lesson before it is already complete; it walks the (module, lesson)
+    order indexes and stops at the first hit.
+    """
+    query = _incomplete_lessons(enrollment.user_id, enrollment.course_id)
+    found = None
+    if from_cursor and enrollment.next_lesson_id is not None:
+        start = db.execute(
+            select(*COURSE_POSITION)
+            .join(Module, Lesson.module_id == Module.id)
+            .where(Lesson.id == enrollment.next_lesson_id)
+        ).first()
+        if start is not None and None not in start:
+            found = db.execute(query.where(tuple_(*COURSE_POSITION) >= tuple_(*start))).first()
+    if found is None:
+        found = db.execute(query).first()
+
+    lesson_id, module_id = found if found is not None else (None, None)
+    enrollment.next_lesson_id = lesson_id
+    enrollment.next_module_id = module_id
+    enrollment.next_link = course_link(enrollment.course_id, lesson_id)
+
+
+def get_continue_learning(db, user_id: int) -> dict:
+    """
+    The course to resume: the user's most recently active unfinished
+    enrollment with its cursor, read in one query.
+    """
+    row = db.execute(
+        select(
+            Enrollment.course_id, Course.title, Enrollment.next_module_id, Module.title,
+            Enrollment.next_lesson_id, Lesson.title, Enrollment.next_link,
+            Enrollment.progress_percentage, Enrollment.last_activity_at,
+        )
+        .join(Course, Enrollment.course_id == Course.id)
+        .outerjoin(Module, Enrollment.next_module_id == Module.id)
+        .outerjoin(Lesson, Enrollment.next_lesson_id == Lesson.id)
+        .where(Enrollment.user_id == user_id, Enrollment.completed_at.is_(None))
+        .order_by(Enrollment.last_activity_at.desc().nulls_last(), Enrollment.id)
+        .limit(1)
+    ).first()
+    if row is None:
+        return {}
+    (course_id, course_title, module_id, module_title, lesson_id, lesson_title, link,
+     progress, last_activity_at) = row
+    return {
+        "course_id": course_id,
+        "course_title": course_title,
+        "module_id": module_id,
+        "module_title": module_title,
+        "lesson_id": lesson_id,
+        "lesson_title": lesson_title,
+        "link": link or course_link(course_id, lesson_id),
+        "progress_percentage": progress or 0,
+        "status": LessonStatus.IN_PROGRESS.value if last_activity_at else LessonStatus.NOT_STARTED.value,
+    }
+
+
+def rebuild_learning_cursors(db):
+    """
+    Recompute every enrollment's cursor with set-based UPDATEs, for backfill
+    and repair. The caller commits.
+    """
+    first_incomplete = (
+        select(Lesson.id)
+        .join(Module, Lesson.module_id == Module.id)
+        .outerjoin(LessonProgress, and_(
+            LessonProgress.lesson_id == Lesson.id, LessonProgress.user_id == Enrollment.user_id,
+        ))
+        .where(
+            Module.course_id == Enrollment.course_id,
+            or_(LessonProgress.id.is_(None), LessonProgress.status != LessonStatus.COMPLETED),
+        )
+        .order_by(*COURSE_POSITION)
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Enrollment)
+        .values(next_lesson_id=first_incomplete)
+        .execution_options(synchronize_session=False)
+    )
+    course_path = literal("/course/", String) + cast(Enrollment.course_id, String)
+    last_activity = (
+        select(func.max(LessonProgress.updated_at))
+        .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Module.course_id == Enrollment.course_id, LessonProgress.user_id == Enrollment.user_id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Enrollment)
+        .values(
+            next_module_id=select(Lesson.module_id).where(Lesson.id == Enrollment.next_lesson_id).scalar_subquery(),
+            next_link=case(
+                (Enrollment.next_lesson_id.is_(None), course_path),
+                else_=course_path + "/lesson/" + cast(Enrollment.next_lesson_id, String),
+            ),
+            last_activity_at=func.coalesce(Enrollment.last_activity_at, last_activity),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# --- Lesson writes ---
+
+def lesson_location(db, lesson_id: int):
+    """(module_id, course_id) for a lesson, or 404."""
+    location = db.execute(
+        select(Lesson.module_id, Module.course_id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Lesson.id == lesson_id)
+    ).first()
+    if location is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    return location
+
+
+def record_lesson_progress(db, user_id: int, lesson_id: int, status: LessonStatus,
+                           progress_percentage: int, now: datetime | None = None,
+                           client_updated_at: datetime | None = None) -> LessonProgress:
+    """
+    Upsert a lesson progress row and roll any completion change up to the
+    module and enrollment aggregates. The caller commits.
+    """
+    now = now or datetime.utcnow()
+    module_id, course_id = lesson_location(db, lesson_id)
+    row = _get_or_create(
+        db, LessonProgress, {"user_id": user_id, "lesson_id": lesson_id},
+        status=LessonStatus.NOT_STARTED, progress_percentage=0, started_at=now,
+    )
+
+    # The status flip is a conditional UPDATE, so only one of two racing
+    # requests sees the transition and applies the delta.
+    is_completed = LessonProgress.status == LessonStatus.COMPLETED
+    if status == LessonStatus.COMPLETED:
+        delta = db.execute(
+            update(LessonProgress)
+            .where(LessonProgress.id == row.id, ~is_completed)
+            .values(status=status, completed_at=now)
+        ).rowcount
+    else:
+        delta = -db.execute(
+            update(LessonProgress)
+            .where(LessonProgress.id == row.id, is_completed)
+            .values(status=status, completed_at=None)
+        ).rowcount
+
+    db.execute(
+        update(LessonProgress)
+        .where(LessonProgress.id == row.id)
+        .values(
+            status=status,
+            progress_percentage=progress_percentage,
+            started_at=func.coalesce(LessonProgress.started_at, now),
+            updated_at=now,
+            # Direct writes take part in batch last-write-wins too, on the server clock
+            # unless the client sent its own time
+            client_updated_at=client_updated_at or now,
+        )
+    )
+    apply_completion_delta(db, user_id, module_id, course_id, max(delta, 0), max(-delta, 0), now)
+    db.refresh(row)
+    return row
+
+
+def get_module_progress(db, user_id: int, module_id: int) -> dict:
+    """Module progress for a user, read from the rollup row."""
+    row = db.execute(
+        select(Module.title, ModuleProgress.total_lessons, ModuleProgress.completed_lessons,
+               ModuleProgress.progress_percentage)
+        .select_from(Module)
+        .outerjoin(ModuleProgress, and_(ModuleProgress.module_id == Module.id, ModuleProgress.user_id == user_id))
+        .where(Module.id == module_id)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Module not found")
+    title, total, completed, progress = row
+    if total is None:
+        # No activity yet: nothing completed out of the module's lessons
+        total = db.query(func.count(Lesson.id)).filter(Lesson.module_id == module_id).scalar()
+        completed, progress = 0, 0
+    return {
+        "module_id": module_id,
+        "module_title": title,
+        "total_lessons": total,
+        "completed_lessons": completed,
+        "progress_percentage": progress,
+    }
+
+
+# --- Batched writes ---
+
+
+def utc_naive(value: datetime) -> datetime:
+    """Client timestamps as naive UTC, matching what the DateTime columns store."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def record_lesson_progress_batch(db, user_id: int, updates, now: datetime | None = None):
+    """
+    Apply many lesson updates for one user. Each update carries lesson_id,
+    status, progress_percentage and client_updated_at; for every lesson the
+    update with the newest client timestamp wins, both within the batch and
+    against what is already stored.
+
+    On SQLite and PostgreSQL the rows are written with one INSERT ... ON
+    CONFLICT DO UPDATE; completion changes are read back from its RETURNING
+    rows and rolled up per module. The caller commits.
+    Returns (lesson ids written, lesson ids ignored as stale, module ids, course ids).
+    """
+    now = now or datetime.utcnow()
+    latest = {}  # lesson id -> (client time, status, percentage)
+    for item in updates:
+        client_time = utc_naive(item.client_updated_at)
+        if item.lesson_id not in latest or client_time >= latest[item.lesson_id][0]:
+            latest[item.lesson_id] = (client_time, LessonStatus[item.status.name], item.progress_percentage)
+    if not latest:
+        return set(), set(), set(), set()
+
+    locations = {
+        lesson_id: (module_id, course_id)
+        for lesson_id, module_id, course_id in db.execute(
+            select(Lesson.id, Lesson.module_id, Module.course_id)
+            .join(Module, Lesson.module_id == Module.id)
+            .where(Lesson.id.in_(latest))
+        )
+    }
+    missing = sorted(set(latest) - set(locations))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Lessons not found: {missing}")
+
+    modules = dict(locations.values())  # module id -> course id
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        # record_lesson_progress rolls each row up itself
+        written = _record_batch_row_by_row(db, user_id, latest, now)
+    else:
+        written, deltas = _upsert_batch(db, insert, user_id, latest, now)
+        completed, uncompleted = Counter(), Counter()
+        for lesson_id, delta in deltas.items():
+            module_id = locations[lesson_id][0]
+            completed[module_id] += max(delta, 0)
+            uncompleted[module_id] += max(-delta, 0)
+        for module_id, course_id in modules.items():
+            apply_completion_delta(db, user_id, module_id, course_id, completed[module_id], uncompleted[module_id], now)
+
+    return written, set(latest) - written, set(modules), set(modules.values())
+
+
+def _upsert_batch(db, insert, user_id: int, latest: dict, now: datetime):
+    """Bulk upsert with last-write-wins; returns (lesson ids written, {lesson id: completion delta})."""
+    table = LessonProgress.__table__
+    completed = LessonStatus.COMPLETED
+    client_times = case(
+        {lesson_id: client_time for lesson_id, (client_time, _, _) in latest.items()},
+        value=table.c.lesson_id,
+    )
+    deltas = Counter()
+
+    # Un-completions first, as a conditional UPDATE: only rows still COMPLETED
+    # come back, so a concurrent writer cannot make the same -1 count twice.
+    reverting = [lesson_id for lesson_id, (_, status, _) in latest.items() if status != completed]
+    if reverting:
+        for lesson_id in db.execute(
+            update(table)
+            .where(
+                table.c.user_id == user_id,
+                table.c.lesson_id.in_(reverting),
+                table.c.status == completed,
+                func.coalesce(table.c.client_updated_at, NEVER) <= client_times,
+            )
+            .values(completed_at=None)
+            .returning(table.c.lesson_id)
+        ).scalars():
+            deltas[lesson_id] -= 1
+
+    statement = insert(table).values([
+        {
+            "user_id": user_id,
+            "lesson_id": lesson_id,
+            "status": status,
+            "progress_percentage": percentage,
+            "started_at": now,
+            "completed_at": now if status == completed else None,
+            "updated_at": now,
+            "client_updated_at": client_time,
+        }
+        for lesson_id, (client_time, status, percentage) in latest.items()
+    ])
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.lesson_id],
+        set_={
+            "status": excluded.status,
+            "progress_percentage": excluded.progress_percentage,
+            "started_at": func.coalesce(table.c.started_at, excluded.started_at),
+            # Rows that were already COMPLETED keep their original timestamp,
+            # so completed_at == now in RETURNING marks a new completion.
+            "completed_at": case(
+                (excluded.status != completed, null()),
+                (table.c.status == completed, func.coalesce(table.c.completed_at, table.c.updated_at)),
+                else_=excluded.completed_at,
+            ),
+            "updated_at": excluded.updated_at,
+            "client_updated_at": excluded.client_updated_at,
+        },
+        where=func.coalesce(table.c.client_updated_at, NEVER) <= excluded.client_updated_at,
+    ).returning(table.c.lesson_id, table.c.status, table.c.completed_at)
+
+    written = set()
+    for lesson_id, status, completed_at in db.execute(statement):
+        written.add(lesson_id)
+        if status == completed and completed_at == now:
+            deltas[lesson_id] += 1
+    return written, deltas
+
+
+def _record_batch_row_by_row(db, user_id: int, latest: dict, now: datetime) -> set:
+    """Fallback for databases without ON CONFLICT: one record_lesson_progress per lesson."""
+    written = set()
+    for lesson_id, (client_time, status, percentage) in latest.items():
+        stored = (
+            db.query(LessonProgress.client_updated_at)
+            .filter_by(user_id=user_id, lesson_id=lesson_id)
+            .scalar()
+        )
+        if stored is not None and stored > client_time:
+            continue
+        record_lesson_progress(db, user_id, lesson_id, status, percentage, now, client_time)
+        written.add(lesson_id)
+    return written
+
+
+def get_progress_aggregates(db, user_id: int, module_ids, course_ids):
+    """(module progress dicts, course progress dicts) for the given ids, one query each."""
+    modules = [
+        {
+            "module_id": module_id,
+            "module_title": title,
+            "total_lessons": total,
+            "completed_lessons": completed,
+            "progress_percentage": progress,
+        }
+        for module_id, title, total, completed, progress in db.execute(
+            select(Module.id, Module.title, ModuleProgress.total_lessons, ModuleProgress.completed_lessons,
+                   ModuleProgress.progress_percentage)
+            .join(ModuleProgress, ModuleProgress.module_id == Module.id)
+            .where(ModuleProgress.user_id == user_id, Module.id.in_(module_ids))
+            .order_by(Module.id)
+        )
+    ]
+    courses = [
+        {
+            "course_id": course_id,
+            "total_lessons": total,
+            "completed_lessons": completed,
+            "progress_percentage": progress,
+        }
+        for course_id, total, completed, progress in db.execute(
+            select(Enrollment.course_id, Enrollment.total_lessons, Enrollment.completed_lessons,
+                   Enrollment.progress_percentage)
+            .where(Enrollment.user_id == user_id, Enrollment.course_id.in_(course_ids))
+            .order_by(Enrollment.course_id)
+        )
+    ]
+    return modules, courses
+
+
+# --- Keeping totals in step with content ---
+
+def _adjust_lesson_totals(connection, module_id: int, delta: int):
+    """Shift lesson totals (and percentages) of every rollup row under a module."""
+    module_total = ModuleProgress.total_lessons + delta
+    connection.execute(
+        update(ModuleProgress.__table__)
+        .where(ModuleProgress.module_id == module_id)
+        .values(
+            total_lessons=module_total,
+            progress_percentage=_percentage_sql(ModuleProgress.completed_lessons, module_total),
+        )
+    )
+    course_total = Enrollment.total_lessons + delta
+    connection.execute(
+        update(Enrollment.__table__)
+        .where(Enrollment.course_id == select(Module.course_id).where(Module.id == module_id).scalar_subquery())
+        .values(
+            total_lessons=course_total,
+            progress_percentage=_percentage_sql(Enrollment.completed_lessons, course_total),
+        )
+    )
+
+
+@event.listens_for(Lesson, "after_insert")
+def _lesson_added(mapper, connection, target):
+    _adjust_lesson_totals(connection, target.module_id, 1)
+
+
+@event.listens_for(Lesson, "after_delete")
+def _lesson_removed(mapper, connection, target):
+    _adjust_lesson_totals(connection, target.module_id, -1)
+    # Cursors on the deleted lesson are recomputed on the learner's next write
+    connection.execute(
+        update(Enrollment.__table__)
+        .where(Enrollment.next_lesson_id == target.id)
+        .values(next_lesson_id=None, next_module_id=None, next_link=None)
+    )
+
+
+# --- Full rebuild ---
+
+def rebuild_progress_rollups(db):
+    """
+    Recompute every module and course aggregate from lesson_progress with a
+    few set-based statements, then the continue-learning cursors. Used to
+    backfill after migrating and to repair drift (e.g. after lessons move
+    between modules). The caller commits.
+    """
+    completed_lp = LessonProgress.status == LessonStatus.COMPLETED
+
+    # Rows for every (user, module) and (user, course) with lesson activity
+    active_modules = (
+        select(LessonProgress.user_id, Lesson.module_id)
+        .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+        .distinct()
+        .subquery()
+    )
+    for user_id, module_id in db.execute(
+        select(active_modules.c.user_id, active_modules.c.module_id).where(~exists().where(
+            ModuleProgress.user_id == active_modules.c.user_id,
+            ModuleProgress.module_id == active_modules.c.module_id,
+        ))
+    ).all():
+        db.add(ModuleProgress(user_id=user_id, module_id=module_id, status=LessonStatus.IN_PROGRESS,
+                              completed_lessons=0, total_lessons=0, progress_percentage=0))
+    active_courses = (
+        select(LessonProgress.user_id, Module.course_id)
+        .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+        .join(Module, Lesson.module_id == Module.id)
+        .distinct()
+        .subquery()
+    )
+    for user_id, course_id in db.execute(
+        select(active_courses.c.user_id, active_courses.c.course_id).where(~exists().where(
+            Enrollment.user_id == active_courses.c.user_id,
+            Enrollment.course_id == active_courses.c.course_id,
+        ))
+    ).all():
+        db.add(Enrollment(user_id=user_id, course_id=course_id,
+                          completed_lessons=0, total_lessons=0, progress_percentage=0))
+    db.flush()
+
+    module_total = (
+        select(func.count(Lesson.id))
+        .where(Lesson.module_id == ModuleProgress.module_id)
+        .scalar_subquery()
+    )
+    module_completed = (
+        select(func.count(LessonProgress.id))
+        .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+        .where(Lesson.module_id == ModuleProgress.module_id, LessonProgress.user_id == ModuleProgress.user_id,
+               completed_lp)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(ModuleProgress)
+        .values(total_lessons=module_total, completed_lessons=module_completed)
+        .execution_options(synchronize_session=False)
+    )
+    course_total = (
+        select(func.count(Lesson.id))
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Module.course_id == Enrollment.course_id)
+        .scalar_subquery()
+    )
+    course_completed = (
+        select(func.count(LessonProgress.id))
+        .join(Lesson, LessonProgress.lesson_id == Lesson.id)
+        .join(Module, Lesson.module_id == Module.id)
+        .where(Module.course_id == Enrollment.course_id, LessonProgress.user_id == Enrollment.user_id,
+               completed_lp)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Enrollment)
+        .values(total_lessons=course_total, completed_lessons=course_completed)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Derived columns
+    db.execute(
+        update(ModuleProgress)
+        .values(progress_percentage=_percentage_sql(ModuleProgress.completed_lessons, ModuleProgress.total_lessons))
+        .execution_options(synchronize_session=False)
+    )
+    module_done = and_(ModuleProgress.total_lessons > 0, ModuleProgress.completed_lessons >= ModuleProgress.total_lessons)
+    db.execute(
+        update(ModuleProgress).where(module_done)
+        .values(status=LessonStatus.COMPLETED, completed_at=func.coalesce(ModuleProgress.completed_at, func.current_timestamp()))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(ModuleProgress).where(~module_done)
+        .values(status=LessonStatus.IN_PROGRESS, completed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    course_done = and_(Enrollment.total_lessons > 0, Enrollment.completed_lessons >= Enrollment.total_lessons)
+    db.execute(
+        update(Enrollment)
+        .values(progress_percentage=_percentage_sql(Enrollment.completed_lessons, Enrollment.total_lessons))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Enrollment).where(course_done)
+        .values(completed_at=func.coalesce(Enrollment.completed_at, func.current_timestamp()))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Enrollment).where(~course_done)
+        .values(completed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    rebuild_learning_cursors(db)
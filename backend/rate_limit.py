@@ -0,0 +1,82 @@
+"""
+Token-bucket rate limiting for Jijue LMS authentication endpoints.
+Login and registration are throttled per client IP and per account before
+any bcrypt work is done, so a credential-stuffing burst is turned away cheaply.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+AUTH_IP_RATE_PER_MINUTE = float(os.getenv("AUTH_IP_RATE_PER_MINUTE", "30"))
+AUTH_IP_BURST = int(os.getenv("AUTH_IP_BURST", "10"))
+AUTH_ACCOUNT_RATE_PER_MINUTE = float(os.getenv("AUTH_ACCOUNT_RATE_PER_MINUTE", "6"))
+AUTH_ACCOUNT_BURST = int(os.getenv("AUTH_ACCOUNT_BURST", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key, refilled at `rate` tokens per second up to `burst`.
+    At most `max_keys` buckets are kept; the least recently used (idle) ones
+    are evicted first.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def acquire(self, key) -> float:
+        """
+        Take one token for `key`.
+        Returns 0 if the call is allowed, otherwise the seconds until a token is available.
+        """
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def clear(self):
+        """Forget every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+auth_ip_limiter = TokenBucketLimiter(AUTH_IP_RATE_PER_MINUTE / 60, AUTH_IP_BURST)
+auth_account_limiter = TokenBucketLimiter(AUTH_ACCOUNT_RATE_PER_MINUTE / 60, AUTH_ACCOUNT_BURST)
+
+
+def enforce_auth_rate_limit(request: Request, account: str):
+    """Raise 429 with Retry-After if this client IP or account is over its rate."""
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = auth_ip_limiter.acquire(client_ip) or auth_account_limiter.acquire(account.strip().lower())
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
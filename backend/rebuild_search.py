@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search index (search_index) from courses, lessons,
+resources, media and discussions. The triggers keep it current on their own;
+run this after restoring a backup, bulk-loading with triggers disabled, or
+changing the tokenizer.
+"""
+from database import SessionLocal, create_all_tables
+from search import rebuild_search_index
+
+def rebuild_search():
+    """Recreate the search triggers and repopulate the index."""
+    print("Rebuilding full-text search index...")
+
+    create_all_tables()
+
+    db = SessionLocal()
+    try:
+        indexed = rebuild_search_index(db)
+        db.commit()
+        print(f"✓ {indexed} items indexed")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_search()
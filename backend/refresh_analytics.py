@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Refresh the course analytics rollups (course_daily_stats, lesson_daily_stats).
+Run from cron every few minutes to rebuild the last ANALYTICS_REFRESH_DAYS
+days; pass --backfill once to rebuild the whole history in chunks of
+ANALYTICS_BACKFILL_CHUNK_DAYS days (or --chunk-days N).
+"""
+from analytics import ANALYTICS_BACKFILL_CHUNK_DAYS, backfill, refresh_recent
+from database import SessionLocal, create_all_tables
+
+def refresh_analytics(full_backfill: bool = False, chunk_days: int = ANALYTICS_BACKFILL_CHUNK_DAYS):
+    """Rebuild recent rollup days, or every day since the first activity."""
+    print("Refreshing course analytics rollups...")
+
+    create_all_tables()
+
+    db = SessionLocal()
+    try:
+        if full_backfill:
+            totals = backfill(
+                db, chunk_days,
+                on_chunk=lambda start, end, counts: print(
+                    f"  {start} .. {end}: {counts['course_rows']} course rows, {counts['lesson_rows']} lesson rows"
+                ),
+            )
+            print(f"✓ Backfilled {totals['chunks']} chunks")
+        else:
+            counts = refresh_recent(db)
+            db.commit()
+            print(f"✓ {counts['course_rows']} course rows, {counts['lesson_rows']} lesson rows refreshed")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import sys
+    chunk_days = ANALYTICS_BACKFILL_CHUNK_DAYS
+    if "--chunk-days" in sys.argv:
+        chunk_days = int(sys.argv[sys.argv.index("--chunk-days") + 1])
+    refresh_analytics(full_backfill="--backfill" in sys.argv, chunk_days=chunk_days)
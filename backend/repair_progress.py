@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Rebuild module/course progress rollups and continue-learning cursors from
+lesson_progress. Run after bulk content edits (lessons moved, reordered or
+deleted) or any direct SQL on lesson_progress.
+"""
+from database import SessionLocal, create_all_tables
+from db_models import Enrollment
+from progress import rebuild_learning_cursors, rebuild_progress_rollups
+
+def repair_progress(cursors_only: bool = False):
+    """Recompute rollups (unless cursors_only) and every enrollment's cursor."""
+    print("Repairing progress rollups and continue-learning cursors...")
+
+    create_all_tables()
+
+    db = SessionLocal()
+    try:
+        if cursors_only:
+            rebuild_learning_cursors(db)
+        else:
+            rebuild_progress_rollups(db)
+        db.commit()
+        print(f"✓ {db.query(Enrollment).count()} enrollments repaired")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import sys
+    repair_progress(cursors_only="--cursors-only" in sys.argv)
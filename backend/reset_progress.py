@@ -5,6 +5,7 @@ Sets all enrollment progress_percentage to 0 and clears lesson_progress records.
 """
 from database import SessionLocal, create_all_tables
 from db_models import Enrollment, LessonProgress
+from progress import rebuild_progress_rollups
 
 def reset_all_progress():
     """Reset all user progress in the system."""
@@ -31,6 +32,10 @@ def reset_all_progress():
         db.query(LessonProgress).delete()
         print("✓ Cleared all lesson progress records")
         
+        # Zero the module/course rollups and reset continue-learning cursors
+        rebuild_progress_rollups(db)
+        print("✓ Reset progress rollups")
+        
         db.commit()
         
         # Verify
@@ -0,0 +1,67 @@
+"""
+In-memory token revocation for Jijue LMS.
+Access tokens are stateless JWTs, so logging out or changing a user's role
+has to be recorded somewhere the auth dependency can check without a
+database round trip. Entries are dropped once the tokens they refer to
+would have expired anyway, which keeps the set small.
+
+The set is per process: with several workers, keep ACCESS_TOKEN_EXPIRE_MINUTES
+short, since a revocation only reaches the worker that handled it.
+"""
+import heapq
+import threading
+import time
+
+
+class RevocationList:
+    """
+    Revoked token ids (jti) and per-user "not before" cut-offs, each kept
+    until the latest token they could affect has expired.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = {}  # jti -> token expiry (epoch seconds)
+        self._users = {}  # user id -> (tokens issued at or before this are revoked, entry expiry)
+        self._expiries = []  # heap of (expiry, kind, key) used for pruning
+
+    def revoke_token(self, jti: str, expires_at: float):
+        """Revoke a single token, e.g. on logout."""
+        with self._lock:
+            self._tokens[jti] = expires_at
+            heapq.heappush(self._expiries, (expires_at, "token", jti))
+            self._prune()
+
+    def revoke_user(self, user_id: int, max_token_lifetime: float):
+        """Revoke every token issued to a user up to now, e.g. after a role change."""
+        now = self._clock()
+        expires_at = now + max_token_lifetime
+        with self._lock:
+            self._users[user_id] = (now, expires_at)
+            heapq.heappush(self._expiries, (expires_at, "user", user_id))
+            self._prune()
+
+    def is_revoked(self, jti: str | None, user_id: int, issued_at: float) -> bool:
+        """True if the token was revoked directly or issued before its user's cut-off."""
+        if jti is not None and jti in self._tokens:
+            return True
+        cutoff = self._users.get(user_id)
+        return cutoff is not None and issued_at <= cutoff[0]
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+    def _prune(self):
+        """Drop entries whose tokens have all expired; caller must hold the lock."""
+        now = self._clock()
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, kind, key = heapq.heappop(self._expiries)
+            entries = self._tokens if kind == "token" else self._users
+            current = entries.get(key)
+            # A later revocation for the same key may have extended the entry.
+            if current is not None and (current if kind == "token" else current[1]) <= expires_at:
+                del entries[key]
+
+
+revoked_tokens = RevocationList()
@@ -0,0 +1,183 @@
+"""
+Full-text search for Jijue LMS.
+Courses, lessons, resources, media and forum discussions are indexed in one
+SQLite FTS5 table, search_index, so results of every type are ranked
+together by BM25 (title matches weigh more than body matches). Each row's
+rowid encodes the source row, id * 8 + type code, so triggers on the source
+tables can keep the index current with rowid lookups: inserts add a row,
+edits to indexed columns replace it, deletes remove it.
+
+The table and triggers are created with the other tables and backfilled
+the first time; rebuild_search.py repopulates the index from scratch.
+"""
+import re
+
+from sqlalchemy import event, select, text
+
+from database import Base
+from db_models import Lesson, Module
+
+SEARCH_TABLE = "search_index"
+SEARCH_MAX_LIMIT = 100
+TITLE_WEIGHT, BODY_WEIGHT = 10.0, 1.0
+SNIPPET_TOKENS = 16
+
+# type -> (code, source table, body expression, indexed columns); every source has a title
+SEARCH_SOURCES = {
+    "course": (1, "courses", "coalesce(description, '') || ' ' || coalesce(category, '')",
+               ("title", "description", "category")),
+    "lesson": (2, "lessons", "coalesce(description, '') || ' ' || coalesce(content, '')",
+               ("title", "description", "content")),
+    "resource": (3, "resources", "coalesce(description, '') || ' ' || coalesce(resource_type, '')",
+                 ("title", "description", "resource_type")),
+    "media": (4, "media_library", "coalesce(description, '') || ' ' || coalesce(media_type, '')",
+              ("title", "description", "media_type")),
+    "discussion": (5, "discussions", "coalesce(content, '')", ("title", "content")),
+}
+SEARCH_TYPES = {code: name for name, (code, *_) in SEARCH_SOURCES.items()}
+ROWID_STRIDE = 8
+
+
+class SearchUnavailable(Exception):
+    """The database has no FTS5 search index (not SQLite)."""
+
+
+def _qualified(expression: str, columns) -> str:
+    """Qualify a source expression's column names with new. for use in a trigger."""
+    return re.sub(rf"\b({'|'.join(columns)})\b", r"new.\1", expression)
+
+
+def search_ddl() -> list:
+    """CREATE statements for the FTS5 table and the triggers that maintain it."""
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "title, body, tokenize = 'porter unicode61 remove_diacritics 2')"
+    ]
+    for code, table, body, columns in SEARCH_SOURCES.values():
+        insert = (
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES "
+            f"(new.id * {ROWID_STRIDE} + {code}, new.title, {_qualified(body, columns)});"
+        )
+        delete = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * {ROWID_STRIDE} + {code};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_update AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN {delete} {insert} END",
+        ]
+    return statements
+
+
+def populate_search_index(connection):
+    """Refill search_index from every source table with INSERT ... SELECT."""
+    connection.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    for code, table, body, _ in SEARCH_SOURCES.values():
+        connection.exec_driver_sql(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+            f"SELECT id * {ROWID_STRIDE} + {code}, title, {body} FROM {table}"
+        )
+    connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install_search_index(metadata, connection, **kw):
+    """Create the index and its triggers; backfill it when the table is new."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).first()
+    for statement in search_ddl():
+        connection.exec_driver_sql(statement)
+    if exists is None:
+        populate_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "after_drop")
+def drop_search_index(metadata, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def rebuild_search_index(db):
+    """Recreate the triggers and repopulate the index; the caller commits."""
+    connection = db.connection()
+    if connection.dialect.name != "sqlite":
+        raise SearchUnavailable("Full-text search needs SQLite FTS5")
+    for statement in search_ddl():
+        connection.exec_driver_sql(statement)
+    populate_search_index(connection)
+    return db.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar_one()
+
+
+def match_expression(query: str) -> str | None:
+    """
+    Turn free text into a safe FTS5 query: every word quoted (so FTS5 syntax in
+    the input is never interpreted), all words required, the last one as a prefix.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def _links(db, hits) -> dict:
+    """App routes for the hits; lessons need their course id."""
+    lesson_ids = [item_id for kind, item_id in hits if kind == "lesson"]
+    courses = dict(db.execute(
+        select(Lesson.id, Module.course_id).join(Module, Lesson.module_id == Module.id).where(Lesson.id.in_(lesson_ids))
+    ).all()) if lesson_ids else {}
+    routes = {"course": "/course/{id}", "resource": "/resources", "media": "/media", "discussion": "/forum"}
+    return {
+        (kind, item_id): (
+            f"/course/{courses.get(item_id)}/lesson/{item_id}" if kind == "lesson"
+            else routes[kind].format(id=item_id)
+        )
+        for kind, item_id in hits
+    }
+
+
+def search(db, query: str, types=None, limit: int = 20, offset: int = 0) -> dict:
+    """
+    BM25-ranked hits of the given types with snippets, plus the number of hits
+    of every type (for the type filter's counts).
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        raise SearchUnavailable("Full-text search needs SQLite FTS5")
+    expression = match_expression(query)
+    if expression is None:
+        return {"query": query, "results": [], "counts": {}}
+    codes = [SEARCH_SOURCES[name][0] for name in types] if types else list(SEARCH_TYPES)
+    kind_filter = f"rowid % {ROWID_STRIDE} IN ({', '.join(str(code) for code in codes)})"
+
+    counts = {
+        SEARCH_TYPES[code]: count
+        for code, count in db.execute(text(
+            f"SELECT rowid % {ROWID_STRIDE}, count(*) FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :query GROUP BY 1"
+        ), {"query": expression})
+    }
+    rows = db.execute(text(
+        f"SELECT rowid, title, snippet({SEARCH_TABLE}, 1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet, "
+        f"bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :query AND {kind_filter} "
+        "ORDER BY score LIMIT :limit OFFSET :offset"
+    ), {"query": expression, "limit": limit, "offset": offset}).all()
+
+    hits = [(SEARCH_TYPES[row.rowid % ROWID_STRIDE], row.rowid // ROWID_STRIDE) for row in rows]
+    links = _links(db, hits)
+    return {
+        "query": query,
+        "results": [
+            {
+                "type": kind,
+                "id": item_id,
+                "title": row.title,
+                "snippet": row.snippet,
+                "link": links[(kind, item_id)],
+                "score": round(-row.score, 4),
+            }
+            for (kind, item_id), row in zip(hits, rows)
+        ],
+        "counts": counts,
+    }
@@ -8,6 +8,8 @@ from db_models import (
 
 )
 
+from progress import rebuild_progress_rollups
+
 from bcrypt import hashpw, gensalt
 
 
@@ -790,10 +792,16 @@ def seed_database():
 
         db.add_all([progress1, progress2, progress3, progress4, progress5, progress6])
 
+        db.flush()
+
+        rebuild_progress_rollups(db)
+
         db.commit()
 
         print("✓ Lesson progress created")
 
+        print("✓ Progress rollups computed")
+
 
 
         # --- Create Forum Categories ---
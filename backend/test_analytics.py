@@ -0,0 +1,101 @@
+"""
+Tests for the course analytics rollups and their admin API.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from analytics import backfill, course_analytics, histogram_median_hours, lesson_analytics
+from database import read_engine
+from db_models import CourseDailyStats, Enrollment, LessonDailyStats, LessonProgress, LessonStatus, User, UserRole
+from test_progress import make_user_and_course, put_progress
+
+
+def staff_headers(role):
+    from main import create_access_token
+    token = create_access_token({"user_id": 1, "email": "staff@example.com", "full_name": "Staff", "role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_history(db, user_id, course_id, lessons, enrolled_at, completed_at=None):
+    """Progress rows on `lessons` started at enrolled_at, all completed at completed_at if given."""
+    db.add(Enrollment(user_id=user_id, course_id=course_id, enrolled_at=enrolled_at, completed_at=completed_at))
+    for lesson_id in lessons:
+        db.add(LessonProgress(
+            user_id=user_id, lesson_id=lesson_id, started_at=enrolled_at, completed_at=completed_at,
+            status=LessonStatus.COMPLETED if completed_at else LessonStatus.IN_PROGRESS,
+            progress_percentage=100 if completed_at else 50,
+        ))
+    db.commit()
+
+
+def test_median_is_interpolated_within_bucket():
+    assert histogram_median_hours([]) is None
+    assert histogram_median_hours([0, 0, 4, 0, 0, 0, 0, 0, 0]) == 15.0  # middle of the 6-24h bucket
+    assert histogram_median_hours([1, 0, 0, 0, 0, 0, 0, 0, 3]) == 2160.0
+
+
+def test_backfill_in_chunks_builds_daily_rollups(db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    day = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=20)
+    add_history(db, user_id, course_id, lessons[0], day, completed_at=day + timedelta(hours=12))
+    other = User(full_name="Other", email="other@example.com", hashed_password="x", role=UserRole.STUDENT)
+    db.add(other)
+    db.commit()
+    add_history(db, other.id, course_id, lessons[0][:1], day + timedelta(days=5))
+
+    chunks = []
+    totals = backfill(db, chunk_days=7, on_chunk=lambda start, end, counts: chunks.append((start, end)))
+
+    assert totals["chunks"] == len(chunks) == 3
+    assert chunks[0][0] == day.date()
+    assert db.query(CourseDailyStats).count() == 2
+    assert db.query(LessonDailyStats).count() == 3
+
+    start, end = day.date(), datetime.utcnow().date()
+    [summary] = course_analytics(db, start, end)
+    assert summary["learners_started"] == 2
+    assert summary["learners_completed"] == 1
+    assert summary["completion_rate"] == 0.5
+    assert summary["mean_hours_to_complete"] == 12.0
+    assert 6 <= summary["median_hours_to_complete"] <= 24
+
+    funnel = lesson_analytics(db, course_id, start, end)
+    assert [(row["lesson_id"], row["started"], row["completed"], row["dropped"]) for row in funnel] == [
+        (lessons[0][0], 2, 1, 1),
+        (lessons[0][1], 1, 1, 0),
+    ]
+
+    # Re-running is idempotent and a narrower range only sees its own days
+    backfill(db, chunk_days=30)
+    assert db.query(LessonDailyStats).count() == 3
+    assert course_analytics(db, start, start)[0]["learners_started"] == 1
+
+
+def test_admin_api_reads_rollups_only(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    put_progress(client, user_id, lessons[0][1], "in_progress", 30)
+
+    assert client.get("/api/admin/analytics/courses", headers=staff_headers("student")).status_code == 403
+    assert client.post("/api/admin/analytics/refresh", headers=staff_headers("instructor")).status_code == 403
+    refreshed = client.post("/api/admin/analytics/refresh?days=1", headers=staff_headers("admin"))
+    assert refreshed.json()["lesson_rows"] == 2
+
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(read_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        courses = client.get("/api/admin/analytics/courses", headers=staff_headers("instructor"))
+        funnel = client.get(f"/api/admin/analytics/courses/{course_id}/lessons", headers=staff_headers("instructor"))
+    finally:
+        event.remove(read_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert courses.status_code == funnel.status_code == 200
+    assert not [s for s in statements if "lesson_progress" in s or "enrollments" in s]
+    assert [row["started"] for row in funnel.json()] == [1, 1]
+    assert [row["completed"] for row in funnel.json()] == [1, 0]
+    assert client.get(
+        "/api/admin/analytics/courses?start=2026-02-01&end=2026-01-01", headers=staff_headers("admin"),
+    ).status_code == 422
@@ -0,0 +1,109 @@
+"""
+Tests for registration, login and the protected /api/v1/users/me route.
+"""
+from bcrypt import gensalt, hashpw
+
+from db_models import User, UserRole
+
+
+def register(client, email="amina@example.com", password="secret123"):
+    return client.post(
+        "/api/v1/auth/register",
+        json={"full_name": "Amina Otieno", "email": email, "password": password},
+    )
+
+
+def login(client, email="amina@example.com", password="secret123"):
+    return client.post("/api/v1/auth/login", data={"username": email, "password": password})
+
+
+def test_register_persists_user(client, db):
+    response = register(client)
+
+    assert response.status_code == 201
+    user = db.query(User).filter(User.email == "amina@example.com").one()
+    assert user.hashed_password != "secret123"
+
+
+def test_register_rejects_duplicate_email(client, db):
+    register(client)
+
+    response = register(client)
+
+    assert response.status_code == 400
+
+
+def test_login_and_read_current_user(client, db):
+    register(client)
+
+    token = login(client).json()["access_token"]
+    response = client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json() == {"full_name": "Amina Otieno", "email": "amina@example.com"}
+
+
+def test_login_rejects_wrong_password(client, db):
+    register(client)
+
+    response = login(client, password="wrong")
+
+    assert response.status_code == 401
+
+
+def make_admin(db, email="admin@example.com", password="admin123"):
+    db.add(User(
+        full_name="Admin User",
+        email=email,
+        hashed_password=hashpw(password.encode("utf-8"), gensalt(rounds=4)).decode("utf-8"),
+        role=UserRole.ADMIN,
+    ))
+    db.commit()
+
+
+def bearer(client, email, password):
+    token = login(client, email=email, password=password).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_current_user_needs_no_database_lookup(client, db):
+    register(client)
+    headers = bearer(client, "amina@example.com", "secret123")
+    db.query(User).delete()
+    db.commit()
+
+    response = client.get("/api/v1/users/me", headers=headers)
+
+    assert response.status_code == 200
+
+
+def test_logout_revokes_token(client, db):
+    register(client)
+    headers = bearer(client, "amina@example.com", "secret123")
+
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 204
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 401
+
+
+def test_admin_routes_check_role(client, db):
+    register(client)
+    make_admin(db)
+    student = bearer(client, "amina@example.com", "secret123")
+    admin = bearer(client, "admin@example.com", "admin123")
+
+    assert client.get("/api/cache/stats", headers=student).status_code == 403
+    assert client.get("/api/cache/stats", headers=admin).status_code == 200
+
+
+def test_role_change_revokes_existing_tokens(client, db):
+    register(client)
+    make_admin(db)
+    student = bearer(client, "amina@example.com", "secret123")
+    admin = bearer(client, "admin@example.com", "admin123")
+    user_id = db.query(User.id).filter(User.email == "amina@example.com").scalar()
+
+    response = client.put(f"/api/v1/users/{user_id}/role", json={"role": "instructor"}, headers=admin)
+
+    assert response.status_code == 200
+    assert client.get("/api/v1/users/me", headers=student).status_code == 401
+    assert client.get("/api/v1/users/me", headers=bearer(client, "amina@example.com", "secret123")).status_code == 200
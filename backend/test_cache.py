@@ -0,0 +1,94 @@
+"""
+Tests for the TTL + LRU cache with single-flight loading.
+"""
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_expired_entry_is_revalidated_without_reload():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+    loads = []
+
+    def loader(version):
+        loads.append(version)
+        return "tree"
+
+    assert cache.get_or_load(1, lambda: "v1", loader) == "tree"
+    assert cache.get_or_load(1, lambda: "v1", loader) == "tree"
+    clock.now = 11
+    assert cache.get_or_load(1, lambda: "v1", loader) == "tree"
+    assert cache.get_or_load(1, lambda: "v2", loader) == "tree"
+
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["revalidations"]) == (2, 1, 1)
+
+
+def test_changed_version_rebuilds_after_expiry():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+
+    cache.get_or_load(1, lambda: "v1", lambda v: "old")
+    clock.now = 11
+
+    assert cache.get_or_load(1, lambda: "v2", lambda v: "new") == "new"
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    for key in (1, 2):
+        cache.get_or_load(key, lambda: None, lambda v: key)
+    cache.get_or_load(1, lambda: None, lambda v: "unused")
+    cache.get_or_load(3, lambda: None, lambda v: 3)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_load(1, lambda: None, lambda v: "reloaded") == 1
+    assert cache.get_or_load(2, lambda: None, lambda v: "reloaded") == "reloaded"
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = TTLCache(maxsize=4, ttl=60)
+    loads = []
+    results = []
+
+    def loader(version):
+        loads.append(version)
+        time.sleep(0.05)
+        return "tree"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load(1, lambda: "v1", loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert results == ["tree"] * 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_loader_errors_are_not_cached():
+    cache = TTLCache(maxsize=4, ttl=60)
+
+    def failing(version):
+        raise LookupError("missing")
+
+    with pytest.raises(LookupError):
+        cache.get_or_load(1, lambda: None, failing)
+    assert cache.get_or_load(1, lambda: None, lambda v: "ok") == "ok"
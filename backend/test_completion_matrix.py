@@ -0,0 +1,123 @@
+"""
+Tests for the in-memory lesson completion matrix.
+"""
+from sqlalchemy import event
+
+from completion_matrix import CourseMatrix, completion_matrix
+from database import read_engine
+from db_models import Lesson, LessonProgress, LessonStatus, User, UserRole
+from test_analytics import staff_headers
+from test_progress import make_user_and_course, put_progress
+
+
+def test_course_matrix_counts_and_intersections():
+    matrix = CourseMatrix(1, [(10, 1), (11, 1), (12, 2)])
+    for user_id, lesson_id in [(1, 10), (1, 11), (1, 12), (2, 10), (2, 11), (3, 10), (500, 12)]:
+        assert matrix.set(user_id, lesson_id, True)
+    assert not matrix.set(1, 10, True)
+    assert not matrix.set(1, 99, True)  # not in this course
+
+    assert matrix.lesson_counts() == {10: 3, 11: 2, 12: 2}
+    assert matrix.module_counts() == {1: 2, 2: 2}
+    assert matrix.course_count() == 1
+    assert matrix.user_percentage(2) == 66
+    assert matrix.completed_lessons(500) == [12]
+
+    cohort = matrix.cohort([1, 2, 7])
+    assert cohort["lessons"] == {10: 2, 11: 2, 12: 1}
+    assert cohort["completed_by_all"] == []
+    assert matrix.cohort([1, 2])["completed_by_all"] == [10, 11]
+    assert cohort["completed_course"] == 1
+    assert cohort["progress"] == {1: 100, 2: 66, 7: 0}
+
+    assert matrix.set(1, 12, False)
+    assert matrix.lesson_counts()[12] == 1
+    assert matrix.course_count() == 0
+
+
+def test_matrix_for_200k_users_by_200_lessons_fits_budget():
+    matrix = CourseMatrix(1, [(lesson_id, lesson_id // 10) for lesson_id in range(200)])
+    matrix.fill([(200_000, 199), (3, 199), (3, 0)])
+    matrix.recount()
+    assert matrix.nbytes() < 50 * 2**20
+    assert matrix.lesson_counts()[199] == 2
+    assert matrix.completed_lessons(3) == [0, 199]
+
+
+def test_api_counts_follow_progress_writes(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=2, lessons_per_module=2)
+    for lesson_id in lessons[0]:
+        put_progress(client, user_id, lesson_id, "completed", 100)
+    url = f"/api/admin/completion/courses/{course_id}"
+
+    assert client.get(url, headers=staff_headers("student")).status_code == 403
+    body = client.get(url, headers=staff_headers("instructor")).json()
+    assert [lesson["completed"] for lesson in body["lessons"]] == [1, 1, 0, 0]
+    assert [module["completed"] for module in body["modules"]] == [1, 0]
+
+    # Later writes update the loaded matrix without re-reading lesson_progress
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    put_progress(client, user_id, lessons[0][1], "in_progress", 50)
+    event.listen(read_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        body = client.get(url, headers=staff_headers("instructor")).json()
+    finally:
+        event.remove(read_engine, "before_cursor_execute", before_cursor_execute)
+    assert [lesson["completed"] for lesson in body["lessons"]] == [1, 0, 0, 0]
+    assert statements == []
+
+    cohort = client.post(f"{url}/cohort", json={"user_ids": [user_id, 999]}, headers=staff_headers("admin")).json()
+    assert cohort["cohort_size"] == 2
+    assert cohort["users"] == [
+        {"user_id": user_id, "progress_percentage": 25},
+        {"user_id": 999, "progress_percentage": 0},
+    ]
+    assert client.get("/api/admin/completion/courses/999", headers=staff_headers("admin")).status_code == 404
+    assert client.get("/api/admin/completion/stats", headers=staff_headers("admin")).json()["courses"] == 1
+
+
+def test_sync_picks_up_other_writers_and_content_changes(db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    completion_matrix.load(db)
+    assert completion_matrix.course(db, course_id).lesson_counts() == {lessons[0][0]: 0, lessons[0][1]: 0}
+
+    # Another worker completes a lesson and adds one to the course
+    other = User(full_name="Other", email="other@example.com", hashed_password="x", role=UserRole.STUDENT)
+    db.add(other)
+    db.flush()
+    db.add(LessonProgress(user_id=other.id, lesson_id=lessons[0][1], status=LessonStatus.COMPLETED,
+                          progress_percentage=100))
+    new_lesson = Lesson(module_id=db.get(Lesson, lessons[0][0]).module_id, title="Extra", content="", order=9)
+    db.add(new_lesson)
+    db.commit()
+
+    completion_matrix.sync(db)
+    matrix = completion_matrix.course(db, course_id)
+    assert matrix.lesson_counts() == {lessons[0][0]: 0, lessons[0][1]: 1, new_lesson.id: 0}
+    assert matrix.user_percentage(other.id) == 33
+
+
+def test_sync_clears_deleted_completions(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    for lesson_id in lessons[0]:
+        put_progress(client, user_id, lesson_id, "completed", 100)
+    completion_matrix.load(db)
+    assert completion_matrix.course(db, course_id).user_percentage(user_id) == 100
+
+    # reset_progress.py bulk-deletes rows in another process
+    db.query(LessonProgress).filter(LessonProgress.lesson_id == lessons[0][0]).delete()
+    db.commit()
+    completion_matrix.sync(db)
+    matrix = completion_matrix.course(db, course_id)
+    assert matrix.lesson_counts() == {lessons[0][0]: 0, lessons[0][1]: 1}
+    assert matrix.user_percentage(user_id) == 50
+
+    # A completion written again after its deletion is set again
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    db.query(LessonProgress).filter(LessonProgress.lesson_id == lessons[0][1]).delete()
+    db.commit()
+    completion_matrix.sync(db)
+    assert completion_matrix.course(db, course_id).lesson_counts() == {lessons[0][0]: 1, lessons[0][1]: 0}
+    assert completion_matrix.stats()["synced_deletions"] == 2
@@ -0,0 +1,122 @@
+"""
+Tests for response compression and the cached compressed variants.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+import compression
+from compression import compress, compressed_variants, compression_stats, negotiate, supported_encodings
+from db_models import Course, Lesson, Module, Resource, ResourceCategory
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def seed_long_course(db, lesson_count=10):
+    course = Course(title="Intro", description="", category="Health", icon="Book", color="primary")
+    db.add(course)
+    db.flush()
+    module = Module(course_id=course.id, title="Module", order=0)
+    db.add(module)
+    db.flush()
+    db.add_all([
+        Lesson(module_id=module.id, title=f"Lesson {n}", content="<p>How PrEP works and who it is for.</p>" * 40, order=n)
+        for n in range(lesson_count)
+    ])
+    db.commit()
+    return course.id
+
+
+def test_negotiation():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, deflate") is None
+    assert negotiate("identity") is None
+    assert negotiate("") is None
+    assert negotiate("*") == supported_encodings()[0]
+    assert negotiate("gzip, br") == supported_encodings()[0]
+
+
+def test_course_tree_variant_is_compressed_once_per_etag(client, db):
+    course_id = seed_long_course(db)
+    plain = client.get(f"/api/courses/{course_id}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["vary"]
+
+    first = client.get(f"/api/courses/{course_id}", headers=GZIP)
+    second = client.get(f"/api/courses/{course_id}", headers=GZIP)
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.json() == plain.json()
+    assert first.num_bytes_downloaded < len(plain.content) / 5
+    assert first.headers["etag"] == second.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert (compressed_variants.stats()["misses"], compressed_variants.stats()["hits"]) == (1, 1)
+    assert (compression_stats.stats()["responses"], compression_stats.stats()["cached_responses"]) == (2, 1)
+    assert compression_stats.stats()["bytes_saved"] > 0
+
+    revalidated = client.get(f"/api/courses/{course_id}", headers={**GZIP, "If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    # Validators still match after a switch to the identity encoding
+    switched = client.get(f"/api/courses/{course_id}", headers={"Accept-Encoding": "identity",
+                                                                  "If-None-Match": first.headers["etag"]})
+    assert switched.status_code == 304
+
+
+def test_small_and_uncacheable_responses(client, db):
+    seed_long_course(db)
+    small = client.get("/api/resources", headers=GZIP)
+    assert "content-encoding" not in small.headers
+
+    # Responses without an ETag are compressed per request, not cached
+    response = client.get("/openapi.json", headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert compressed_variants.stats()["size"] == 0
+    assert compression_stats.stats()["cached_responses"] == 0
+
+
+def test_brotli_preferred_when_available(client, db):
+    pytest.importorskip("brotli")
+    course_id = seed_long_course(db)
+    response = client.get(f"/api/courses/{course_id}", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"].endswith('-br"')
+
+
+def test_cached_variant_follows_the_body_not_the_etag(client, db):
+    category = ResourceCategory(name="Guides")
+    db.add(category)
+    db.flush()
+    db.add_all([
+        Resource(category_id=category.id, title=f"T{n}", description="Where to get tested and treated. " * 10)
+        for n in range(10)
+    ])
+    db.commit()
+    first = client.get("/api/resources", headers=GZIP)
+    assert first.headers["content-encoding"] == "gzip"
+
+    # An edit that bypasses updated_at leaves the version stamp, and so the ETag, unchanged
+    db.execute(text("UPDATE resources SET title = 'EDITED' WHERE title = 'T0'"))
+    db.commit()
+    second = client.get("/api/resources", headers=GZIP)
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.json()[0]["title"] == "EDITED"
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(client, db, monkeypatch):
+    course_id = seed_long_course(db, lesson_count=60)
+    loops = []
+
+    def recording_compress(body, encoding, cached=False):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return compress(body, encoding, cached)
+
+    monkeypatch.setattr(compression, "compress", recording_compress)
+    response = client.get(f"/api/courses/{course_id}", headers=GZIP)
+    assert len(response.json()["modules"][0]["lessons"]) == 60
+    assert response.num_bytes_downloaded < compression.COMPRESSION_THREAD_MIN_BYTES < int(
+        client.get(f"/api/courses/{course_id}", headers={"Accept-Encoding": "identity"}).headers["content-length"]
+    )
+    assert loops == [None]
@@ -0,0 +1,143 @@
+"""
+Tests for GET /api/courses/{course_id}.
+The course tree must load with a fixed number of queries however many modules it has.
+"""
+from sqlalchemy import event
+
+from database import engine, read_engine
+from db_models import Course, Module, Lesson
+
+
+def make_course(db, module_count, lessons_per_module=3):
+    """Create a course with the given number of modules, inserted in reverse order."""
+    course = Course(title="Big Course", description="", category="Health", icon="Book", color="primary")
+    db.add(course)
+    db.flush()
+    for m in reversed(range(module_count)):
+        module = Module(course_id=course.id, title=f"Module {m}", order=m)
+        db.add(module)
+        db.flush()
+        for l in reversed(range(lessons_per_module)):
+            db.add(Lesson(module_id=module.id, title=f"Lesson {m}.{l}", content="x" * 100, order=l))
+    db.commit()
+    return course.id
+
+
+def count_queries(client, url):
+    """Return (response, number of SELECT statements) for a GET request."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engines = {engine, read_engine}
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+    return response, len(statements)
+
+
+def test_course_tree_is_ordered(client, db):
+    course_id = make_course(db, module_count=3)
+
+    response = client.get(f"/api/courses/{course_id}")
+
+    assert response.status_code == 200
+    modules = response.json()["modules"]
+    assert [m["order"] for m in modules] == [0, 1, 2]
+    for module in modules:
+        assert [l["order"] for l in module["lessons"]] == [0, 1, 2]
+
+
+def test_course_tree_query_count_is_flat(client, db):
+    small_id = make_course(db, module_count=2)
+    large_id = make_course(db, module_count=45)
+
+    small_response, small_queries = count_queries(client, f"/api/courses/{small_id}")
+    large_response, large_queries = count_queries(client, f"/api/courses/{large_id}")
+
+    assert small_response.status_code == 200
+    assert len(large_response.json()["modules"]) == 45
+    assert large_queries == small_queries
+    # Version check, snapshot lookup, course/modules/lessons, snapshot upsert.
+    assert large_queries <= 6
+
+
+def test_cold_cache_is_served_from_snapshot(client, db):
+    from catalog import catalog_cache
+
+    course_id = make_course(db, module_count=5)
+    first = client.get(f"/api/courses/{course_id}")
+    catalog_cache.invalidate()
+
+    response, queries = count_queries(client, f"/api/courses/{course_id}")
+
+    assert response.content == first.content
+    # Version check and snapshot lookup only; nothing is re-rendered.
+    assert queries == 2
+
+
+def test_snapshot_is_regenerated_when_a_lesson_changes(client, db):
+    from catalog import catalog_cache
+
+    course_id = make_course(db, module_count=2)
+    client.get(f"/api/courses/{course_id}")
+    lesson = db.query(Lesson).first()
+    lesson.title = "Renamed lesson"
+    db.commit()
+    catalog_cache.invalidate()
+
+    response = client.get(f"/api/courses/{course_id}")
+
+    titles = [l["title"] for m in response.json()["modules"] for l in m["lessons"]]
+    assert "Renamed lesson" in titles
+
+
+def test_course_tree_served_from_cache(client, db):
+    course_id = make_course(db, module_count=2)
+    client.get(f"/api/courses/{course_id}")
+
+    response, queries = count_queries(client, f"/api/courses/{course_id}")
+
+    assert response.status_code == 200
+    assert queries == 0
+
+
+def test_course_tree_missing_course(client, db):
+    response = client.get("/api/courses/9999")
+
+    assert response.status_code == 404
+
+
+
+def test_snapshot_is_stored_with_one_upsert(db):
+    from catalog import course_tree_version, materialize_course_tree
+    from db_models import CourseSnapshot
+    from http_cache import Validators
+
+    course_id = make_course(db, module_count=2)
+    validators = Validators.from_version("course", course_id, course_tree_version(db, course_id))
+    # Another worker stored a snapshot after this one looked
+    db.add(CourseSnapshot(course_id=course_id, etag='"stale"', body=b"{}"))
+    db.commit()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "course_snapshots" in statement and not statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        body = materialize_course_tree(db, course_id, validators)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # No read-then-insert window for a concurrent writer to fall into
+    assert len(statements) == 1 and "ON CONFLICT" in statements[0]
+    db.expire_all()
+    assert db.get(CourseSnapshot, course_id).body == body
@@ -0,0 +1,75 @@
+"""
+Tests for the per-user /api/dashboard.
+"""
+from sqlalchemy import event
+
+from database import engine, read_engine
+from dashboard import dashboard_cache
+from test_progress import make_user_and_course, put_progress, student_headers
+
+
+def count_queries(client, url, headers=None):
+    """Return (response, number of statements) for a GET request."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, read_engine):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        for target in (engine, read_engine):
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+    return response, len(statements)
+
+
+def test_guest_dashboard_has_navigation_and_no_progress(client, db):
+    make_user_and_course(db)
+
+    body = client.get("/api/dashboard").json()
+
+    assert body["userName"] == "Guest"
+    assert (body["progress"], body["modulesCompleted"], body["totalModules"]) == (0, 0, 0)
+    assert [item["name"] for item in body["navigation"]][0] == "Dashboard"
+    assert [course["title"] for course in body["featuredCourses"]] == ["Course"]
+
+
+def test_dashboard_is_computed_per_user(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=2, lessons_per_module=2)
+    headers = student_headers(user_id)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    put_progress(client, user_id, lessons[0][1], "completed", 100)
+
+    body = client.get("/api/dashboard", headers=headers).json()
+
+    assert body["userName"] == "Student"
+    assert (body["progress"], body["modulesCompleted"], body["totalModules"]) == (50, 1, 2)
+    assert body["continueLearning"] == {
+        "moduleTitle": "Module 1",
+        "description": "Course",
+        "link": f"/course/{course_id}/lesson/{lessons[1][0]}",
+    }
+
+
+def test_dashboard_is_cached_and_invalidated_by_own_writes(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=4)
+    headers = student_headers(user_id)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+
+    client.get("/api/courses")  # featured courses come from the catalog cache
+
+    misses = dashboard_cache.stats()["misses"]
+    response, cold = count_queries(client, "/api/dashboard", headers)
+    assert response.json()["progress"] == 25
+    # version stamp, progress aggregate, continue-learning cursor
+    assert cold == 3
+    hits = dashboard_cache.stats()["hits"]
+    response, warm = count_queries(client, "/api/dashboard", headers)
+    assert warm == 0
+    assert dashboard_cache.stats()["hits"] == hits + 1
+
+    put_progress(client, user_id, lessons[0][1], "completed", 100)
+    assert client.get("/api/dashboard", headers=headers).json()["progress"] == 50
+    assert dashboard_cache.stats()["misses"] == misses + 2
@@ -0,0 +1,79 @@
+"""
+Tests for lazy and eager course enrollment.
+"""
+import pytest
+from sqlalchemy import event
+
+import enrollment
+from database import async_engine
+from db_models import Course, Enrollment, Lesson, Module, User
+from test_auth import register
+from test_progress import student_headers
+
+
+def make_courses(db, count=3, lessons=2):
+    course_ids = []
+    for c in range(count):
+        course = Course(title=f"Course {c}", description="", category="Health", icon="Book", color="primary")
+        db.add(course)
+        db.flush()
+        module = Module(course_id=course.id, title="Module", order=0)
+        db.add(module)
+        db.flush()
+        db.add_all([Lesson(module_id=module.id, title=f"Lesson {l}", content="", order=l) for l in range(lessons)])
+        course_ids.append(course.id)
+    db.commit()
+    return course_ids
+
+
+@pytest.fixture()
+def eager(monkeypatch):
+    monkeypatch.setattr(enrollment, "ENROLLMENT_MODE", "eager")
+
+
+def test_lazy_registration_creates_no_enrollments(client, db):
+    course_ids = make_courses(db)
+    assert register(client).status_code == 201
+    assert db.query(Enrollment).count() == 0
+
+    user = db.query(User).one()
+    lesson_id = db.query(Lesson.id).join(Module).filter(Module.course_id == course_ids[1]).first()[0]
+    client.put(f"/api/users/{user.id}/lesson-progress/{lesson_id}",
+               json={"status": "in_progress", "progress_percentage": 10}, headers=student_headers(user.id))
+
+    # Materialized by the first progress write, for that course only
+    assert [(e.course_id, e.total_lessons) for e in db.query(Enrollment)] == [(course_ids[1], 2)]
+
+
+def test_eager_registration_is_one_insert(client, db, eager):
+    course_ids = make_courses(db)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO ENROLLMENTS"):
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert register(client).status_code == 201
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert len(statements) == 1
+    assert "SELECT" in statements[0].upper()
+    enrollments = db.query(Enrollment).order_by(Enrollment.course_id).all()
+    assert [(e.course_id, e.total_lessons, e.completed_lessons) for e in enrollments] == [
+        (course_id, 2, 0) for course_id in course_ids
+    ]
+
+
+def test_eager_new_course_enrolls_every_user(db, eager):
+    db.add_all([User(full_name=f"U{i}", email=f"u{i}@example.com", hashed_password="x") for i in range(3)])
+    db.commit()
+
+    make_courses(db, count=1, lessons=4)
+
+    rows = db.query(Enrollment).all()
+    assert len(rows) == 3
+    # Lessons added after the course still count towards the totals
+    assert {row.total_lessons for row in rows} == {4}
@@ -0,0 +1,107 @@
+"""
+Tests for the forum listings and keyset pagination.
+"""
+from datetime import datetime, timedelta
+
+from db_models import Discussion, ForumCategory, Reply, User, UserRole
+from pagination import NEXT_CURSOR_HEADER
+
+START = datetime(2026, 3, 1, 9, 0)
+
+
+def seed_forum(db, discussion_count=5, reply_count=5):
+    """A user, two categories and discussions alternating between them, all at one timestamp pair."""
+    user = User(full_name="Amina", email="amina@example.com", hashed_password="x", role=UserRole.STUDENT)
+    general = ForumCategory(name="General")
+    prep = ForumCategory(name="PrEP")
+    db.add_all([user, general, prep])
+    db.flush()
+    # Pairs of discussions share a created_at so the id tie-breaker matters
+    discussions = [
+        Discussion(user_id=user.id, category_id=(general if i % 2 == 0 else prep).id, title=f"Topic {i}",
+                   content=f"Body {i}", created_at=START + timedelta(minutes=i // 2))
+        for i in range(discussion_count)
+    ]
+    db.add_all(discussions)
+    db.flush()
+    db.add_all([
+        Reply(discussion_id=discussions[0].id, user_id=user.id, content=f"Reply {i}",
+              created_at=START + timedelta(minutes=i // 2))
+        for i in range(reply_count)
+    ])
+    db.commit()
+    return general.id, prep.id, [discussion.id for discussion in discussions]
+
+
+def walk(client, url, limit, **params):
+    """Every page of a listing, following X-Next-Cursor."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def test_discussions_page_newest_first_without_gaps(client, db):
+    general, prep, ids = seed_forum(db)
+
+    assert walk(client, "/api/forum/discussions", 2) == [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]]
+    assert walk(client, "/api/forum/discussions", 2, category_id=prep) == [[ids[3], ids[1]]]
+
+    categories = client.get("/api/forum/categories").json()
+    assert [(category["name"], category["count"]) for category in categories] == [("General", 3), ("PrEP", 2)]
+
+    detail = client.get(f"/api/forum/discussions/{ids[0]}").json()
+    assert (detail["title"], detail["author"], detail["category"], detail["content"]) == \
+        ("Topic 0", "Amina", "General", "Body 0")
+    assert client.get("/api/forum/discussions/9999").status_code == 404
+
+
+def test_replies_page_oldest_first(client, db):
+    _, _, ids = seed_forum(db, reply_count=7)
+
+    pages = walk(client, f"/api/forum/discussions/{ids[0]}/replies", 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == sorted(sum(pages, []))
+    # A page ending exactly at the last row has no cursor
+    assert [len(page) for page in walk(client, f"/api/forum/discussions/{ids[0]}/replies", 7)] == [7]
+    assert walk(client, f"/api/forum/discussions/{ids[1]}/replies", 3) == [[]]
+
+
+def test_new_rows_do_not_shift_later_pages(client, db):
+    _, _, ids = seed_forum(db)
+    first = client.get("/api/forum/discussions", params={"limit": 2})
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+
+    newest = Discussion(user_id=db.query(User).first().id, category_id=db.query(ForumCategory).first().id,
+                        title="Late", created_at=START + timedelta(days=1))
+    db.add(newest)
+    db.commit()
+
+    second = client.get("/api/forum/discussions", params={"limit": 2, "cursor": cursor}).json()
+    assert [item["id"] for item in second] == [ids[2], ids[1]]
+
+
+def test_rows_without_created_at_are_paged_too(client, db):
+    _, _, ids = seed_forum(db, reply_count=5)
+    # Legacy databases have rows written before created_at was populated
+    db.query(Discussion).filter(Discussion.id.in_([ids[1], ids[3]])).update({"created_at": None})
+    replies = [reply.id for reply in db.query(Reply).order_by(Reply.id)]
+    db.query(Reply).filter(Reply.id.in_(replies[2:4])).update({"created_at": None})
+    db.commit()
+
+    # Undated rows count as the oldest, newest id first among themselves
+    assert walk(client, "/api/forum/discussions", 2) == [[ids[4], ids[2]], [ids[0], ids[3]], [ids[1]]]
+    assert walk(client, f"/api/forum/discussions/{ids[0]}/replies", 1) == \
+        [[replies[2]], [replies[3]], [replies[0]], [replies[1]], [replies[4]]]
+
+
+def test_bad_cursor_and_limit_are_rejected(client, db):
+    seed_forum(db)
+    assert client.get("/api/forum/discussions", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/resources", params={"cursor": "e30"}).status_code == 400
+    assert client.get("/api/forum/discussions", params={"limit": 0}).status_code == 422
+    assert client.get("/api/media", params={"limit": 10_000}).status_code == 422
@@ -0,0 +1,105 @@
+"""
+Tests for the buffered forum view counters, unique-viewer sketches and reply counts.
+"""
+from db_models import Discussion, DiscussionViewers
+from forum_views import HLL_REGISTERS, ViewCounter, hll_estimate, hll_position, view_counter
+from test_forum import seed_forum
+from test_progress import student_headers
+
+
+def stored(db, discussion_id):
+    db.expire_all()
+    return db.get(Discussion, discussion_id)
+
+
+def sketch_of(viewers):
+    registers = bytearray(HLL_REGISTERS)
+    for viewer in viewers:
+        index, rank = hll_position(viewer)
+        registers[index] = max(registers[index], rank)
+    return registers
+
+
+def test_views_are_buffered_until_flush(client, db):
+    _, _, ids = seed_forum(db)
+    updated_at = stored(db, ids[0]).updated_at
+
+    views = [client.get(f"/api/forum/discussions/{ids[0]}").json()["views"] for _ in range(3)]
+    for user_id in (1, 2):
+        client.get(f"/api/forum/discussions/{ids[0]}", headers=student_headers(user_id))
+    assert views == [1, 2, 3]
+    assert stored(db, ids[0]).views_count == 0
+    # Pending views already show in listings
+    assert client.get("/api/forum/discussions", params={"limit": 10}).json()[-1]["views"] == 5
+
+    assert view_counter.flush() == 1
+    discussion = stored(db, ids[0])
+    # One anonymous client address plus two signed-in users
+    assert (discussion.views_count, discussion.unique_viewers) == (5, 3)
+    assert discussion.updated_at == updated_at
+    assert client.get(f"/api/forum/discussions/{ids[0]}").json()["views"] == 6
+    assert view_counter.stats()["pending_views"] == 1
+
+
+def test_sketches_from_several_workers_merge(db):
+    _, _, ids = seed_forum(db)
+    first, second = ViewCounter(), ViewCounter()
+    for n in range(3000):
+        first.record(ids[0], f"user:{n}")
+    for n in range(2000, 5000):
+        second.record(ids[0], f"user:{n}")
+    first.flush()
+    second.flush()
+
+    discussion = stored(db, ids[0])
+    assert discussion.views_count == 6000
+    assert abs(discussion.unique_viewers - 5000) <= 5000 * 0.05
+    assert discussion.unique_viewers == hll_estimate(db.get(DiscussionViewers, ids[0]).registers)
+
+
+def test_estimate_accuracy():
+    assert hll_estimate(bytearray(HLL_REGISTERS)) == 0
+    assert hll_estimate(sketch_of(f"user:{n}" for n in range(50))) == 50
+    for distinct in (1000, 100_000):
+        estimate = hll_estimate(sketch_of(f"ip:{n}" for n in range(distinct)))
+        assert abs(estimate - distinct) <= distinct * 0.05
+
+
+def test_failed_flush_keeps_views(db):
+    _, _, ids = seed_forum(db)
+
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    counter = ViewCounter(session_factory=BrokenSession)
+    counter.record(ids[0], "user:1")
+    try:
+        counter.flush()
+    except RuntimeError:
+        pass
+    counter.record(ids[0], "user:2")
+    assert counter.stats()["pending_views"] == 2
+    assert counter.stats()["failed_flushes"] == 1
+
+
+def test_reply_increments_replies_count(client, db):
+    _, _, ids = seed_forum(db, reply_count=2)
+    headers = student_headers(1)
+
+    response = client.post(f"/api/forum/discussions/{ids[0]}/replies", json={"content": "Thanks!"}, headers=headers)
+    assert response.status_code == 201
+    assert (response.json()["author"], response.json()["content"]) == ("Student", "Thanks!")
+    assert stored(db, ids[0]).replies_count == 1
+    assert client.get(f"/api/forum/discussions/{ids[0]}/replies").json()[-1]["content"] == "Thanks!"
+
+    assert client.post("/api/forum/discussions/9999/replies", json={"content": "x"}, headers=headers).status_code == 404
+    assert client.post(f"/api/forum/discussions/{ids[0]}/replies", json={"content": " "}, headers=headers).status_code == 422
+    assert client.post(f"/api/forum/discussions/{ids[0]}/replies", json={"content": "x"}).status_code == 401
+    assert stored(db, ids[0]).replies_count == 1
@@ -0,0 +1,151 @@
+"""
+Tests for the write-behind lesson progress heartbeat buffer.
+"""
+import heartbeats
+from db_models import Enrollment, LessonProgress, LessonStatus, ModuleProgress
+from heartbeats import HeartbeatBuffer, heartbeat_buffer
+from test_progress import make_user_and_course, module_id_of, put_progress, student_headers
+
+
+def heartbeat(client, user_id, lesson_id, percentage, status="in_progress"):
+    return client.post(
+        f"/api/users/{user_id}/lesson-progress/{lesson_id}/heartbeat",
+        json={"status": status, "progress_percentage": percentage},
+        headers=student_headers(user_id),
+    )
+
+
+def stored(db, user_id, lesson_id):
+    db.expire_all()
+    return db.query(LessonProgress).filter_by(user_id=user_id, lesson_id=lesson_id).first()
+
+
+def test_heartbeats_are_coalesced_until_flush(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    lesson_id = lessons[0][0]
+
+    for percentage in (10, 20, 30):
+        assert heartbeat(client, user_id, lesson_id, percentage).status_code == 202
+    assert stored(db, user_id, lesson_id) is None
+
+    assert heartbeat_buffer.flush() == 1
+    row = stored(db, user_id, lesson_id)
+    assert (row.status, row.progress_percentage) == (LessonStatus.IN_PROGRESS, 30)
+    stats = heartbeat_buffer.stats()
+    assert stats["pending"] == 0
+    assert stats["last_batch_size"] == 1
+
+
+def test_completion_bypasses_buffer(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    lesson_id = lessons[0][0]
+
+    heartbeat(client, user_id, lesson_id, 90)
+    response = heartbeat(client, user_id, lesson_id, 100, status="completed")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert stored(db, user_id, lesson_id).status == LessonStatus.COMPLETED
+    module = client.get(
+        f"/api/users/{user_id}/module-progress/{module_id_of(db, lesson_id)}", headers=student_headers(user_id),
+    ).json()
+    assert module["completed_lessons"] == 1
+    # The superseded heartbeat was dropped, not written over the completion
+    assert heartbeat_buffer.flush() == 0
+
+
+def test_heartbeat_is_private_to_its_owner(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    url = f"/api/users/{user_id}/lesson-progress/{lessons[0][0]}/heartbeat"
+
+    for body in ({"status": "in_progress", "progress_percentage": 40},
+                 {"status": "completed", "progress_percentage": 100}):
+        assert client.post(url, json=body).status_code == 401
+        assert client.post(url, json=body, headers=student_headers(user_id + 1)).status_code == 403
+    assert heartbeat_buffer.stats()["pending"] == 0
+    assert stored(db, user_id, lessons[0][0]) is None
+
+
+def test_flush_keeps_completed_status(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    lesson_id = lessons[0][0]
+    put_progress(client, user_id, lesson_id, "completed", 100)
+
+    heartbeat(client, user_id, lesson_id, 15)  # rewatching
+    heartbeat_buffer.flush()
+
+    row = stored(db, user_id, lesson_id)
+    assert (row.status, row.progress_percentage) == (LessonStatus.COMPLETED, 15)
+
+
+def test_buffer_flushes_when_full_and_on_stop(db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=4)
+    buffer = HeartbeatBuffer(flush_interval_ms=60_000, max_entries=3)
+    buffer.start()
+    try:
+        for lesson_id in lessons[0][:3]:
+            buffer.record(user_id, lesson_id, 50)
+        for _ in range(200):
+            if buffer.stats()["flushes"]:
+                break
+            buffer._thread.join(0.01)
+        assert buffer.stats()["flushed_entries"] == 3
+
+        buffer.record(user_id, lessons[0][3], 70)
+    finally:
+        buffer.stop()
+
+    assert buffer.stats()["pending"] == 0
+    assert stored(db, user_id, lessons[0][3]).progress_percentage == 70
+
+
+def test_flush_skips_unknown_lessons(db):
+    buffer = HeartbeatBuffer()
+    buffer.record(1, 9999, 50)
+
+    assert buffer.flush() == 1
+    assert db.query(LessonProgress).count() == 0
+
+
+def test_first_heartbeat_creates_rollup_rows(client, db, monkeypatch):
+    monkeypatch.setattr(heartbeats, "HEARTBEAT_UPSERT_CHUNK_ROWS", 3)
+    user_id, course_id, lessons = make_user_and_course(db, module_count=2, lessons_per_module=4)
+    for lesson_id in lessons[0] + lessons[1]:
+        heartbeat(client, user_id, lesson_id, 40)
+
+    assert heartbeat_buffer.flush() == 8
+    assert db.query(LessonProgress).filter_by(user_id=user_id).count() == 8
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert (enrollment.completed_lessons, enrollment.total_lessons) == (0, 8)
+    assert enrollment.next_lesson_id == lessons[0][0]
+    assert db.query(ModuleProgress).filter_by(user_id=user_id).count() == 2
+
+    # Completions still roll up onto the rows the heartbeats created
+    put_progress(client, user_id, lessons[1][0], "completed", 100)
+    db.expire_all()
+    assert db.query(Enrollment).one().completed_lessons == 1
+
+
+def test_failed_flush_requeues_up_to_the_bound(db):
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    buffer = HeartbeatBuffer(max_pending=3, session_factory=BrokenSession)
+    for lesson_id in range(1, 6):
+        buffer.record(1, lesson_id, 10 * lesson_id)
+    try:
+        buffer.flush()
+    except RuntimeError:
+        pass
+
+    stats = buffer.stats()
+    assert (stats["pending"], stats["dropped_entries"], stats["failed_flushes"]) == (3, 2, 1)
+    # The newest heartbeats are the ones kept
+    assert sorted(buffer._pending) == [(1, 3), (1, 4), (1, 5)]
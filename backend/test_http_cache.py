@@ -0,0 +1,65 @@
+"""
+Tests for ETag / Last-Modified conditional GETs on catalog and content endpoints.
+"""
+from db_models import Course, MediaLibrary, MediaTag, Resource, ResourceCategory
+
+
+def seed_content(db):
+    db.add(Course(title="Intro", description="", category="Health", icon="Book", color="primary"))
+    category = ResourceCategory(name="Guides")
+    db.add(category)
+    db.flush()
+    db.add(Resource(category_id=category.id, title="Basics", resource_type="PDF", url="https://example.com"))
+    media = MediaLibrary(title="HIV 101", media_type="video", url="https://example.com/101.mp4")
+    db.add(media)
+    db.flush()
+    db.add(MediaTag(media_id=media.id, tag="Education"))
+    db.commit()
+
+
+def test_etag_revalidation_returns_304(client, db):
+    seed_content(db)
+    for url in ("/api/courses", "/api/courses/1", "/api/resources", "/api/resources/categories", "/api/media"):
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first.headers["etag"].startswith('"')
+        assert "public" in first.headers["cache-control"]
+
+        revalidated = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == first.headers["etag"]
+
+        since = client.get(url, headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert since.status_code == 304
+
+
+def test_etag_changes_when_content_changes(client, db):
+    seed_content(db)
+    first = client.get("/api/media")
+
+    db.add(MediaTag(media_id=1, tag="Wellness"))
+    db.commit()
+    second = client.get("/api/media", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()[0]["tags"] == ["Education", "Wellness"]
+
+
+def test_etag_changes_when_rows_are_edited_in_place(client, db):
+    seed_content(db)
+    urls = ("/api/resources", "/api/resources/categories", "/api/media")
+    before = {url: client.get(url).headers["etag"] for url in urls}
+
+    db.get(Resource, 1).title = "Basics, revised"
+    db.get(ResourceCategory, 1).name = "Guides and tools"
+    db.query(MediaTag).filter_by(media_id=1).one().tag = "Learning"
+    db.commit()
+
+    for url in urls:
+        response = client.get(url, headers={"If-None-Match": before[url]})
+        assert response.status_code == 200, url
+        assert response.headers["etag"] != before[url]
+    assert client.get("/api/resources").json()[0]["title"] == "Basics, revised"
+    assert client.get("/api/media").json()[0]["tags"] == ["Learning"]
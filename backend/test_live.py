@@ -0,0 +1,111 @@
+"""
+Tests for the WebSocket live-update hub.
+"""
+import asyncio
+
+import pytest
+from fastapi import status
+from starlette.websockets import WebSocketDisconnect
+
+from live import LiveHub, live_hub
+from models import TokenData
+from test_analytics import staff_headers
+from test_forum import seed_forum
+from test_progress import make_user_and_course, put_progress, student_headers
+
+
+def token_of(headers):
+    return headers["Authorization"].split(" ", 1)[1]
+
+
+def test_connection_needs_a_valid_token(client, db):
+    for url in ("/ws", "/ws?token=not-a-jwt"):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect(url):
+                pass
+        assert closed.value.code == status.WS_1008_POLICY_VIOLATION
+
+
+def test_reply_is_pushed_to_discussion_and_category(client, db):
+    general, _, ids = seed_forum(db)
+    headers = student_headers(1)
+
+    with client.websocket_connect(f"/ws?topic=forum:discussion:{ids[0]}", headers=headers) as socket:
+        assert socket.receive_json() == {"type": "subscribed", "topic": f"forum:discussion:{ids[0]}"}
+        socket.send_json({"action": "subscribe", "topic": f"forum:category:{general}"})
+        assert socket.receive_json()["type"] == "subscribed"
+
+        client.post(f"/api/forum/discussions/{ids[0]}/replies", json={"content": "Live!"}, headers=headers)
+        reply = socket.receive_json()
+        assert (reply["type"], reply["reply"]["content"]) == ("reply.created", "Live!")
+        assert socket.receive_json() == {
+            "topic": f"forum:category:{general}", "type": "discussion.updated", "id": ids[0], "replies": 1,
+        }
+
+        socket.send_text("not json")
+        assert socket.receive_json()["type"] == "error"
+    assert live_hub.stats()["connections"] == 0
+
+
+def test_binary_frame_closes_the_connection(client, db):
+    with client.websocket_connect("/ws", headers=student_headers(1)) as socket:
+        socket.send_bytes(b"\x00\x01")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+        assert closed.value.code == status.WS_1003_UNSUPPORTED_DATA
+    assert live_hub.stats()["connections"] == 0
+
+
+def test_progress_topic_is_private(client, db):
+    user_id, _, lessons = make_user_and_course(db, module_count=1)
+
+    with client.websocket_connect(f"/ws?token={token_of(student_headers(user_id + 1))}") as socket:
+        socket.send_json({"action": "subscribe", "topic": f"progress:user:{user_id}"})
+        assert socket.receive_json()["type"] == "error"
+
+    with client.websocket_connect(f"/ws?token={token_of(staff_headers('instructor'))}") as socket:
+        socket.send_json({"action": "subscribe", "topic": f"progress:user:{user_id}"})
+        assert socket.receive_json()["type"] == "subscribed"
+
+    with client.websocket_connect(f"/ws?topic=progress:user:{user_id}", headers=student_headers(user_id)) as socket:
+        assert socket.receive_json()["type"] == "subscribed"
+        put_progress(client, user_id, lessons[0][0], "completed", 100)
+        assert socket.receive_json() == {
+            "topic": f"progress:user:{user_id}", "type": "lesson_progress",
+            "lesson_id": lessons[0][0], "status": "completed", "progress_percentage": 100,
+        }
+
+
+def test_slow_consumer_is_dropped_without_blocking_others():
+    user = TokenData(user_id=1, email="a@example.com", full_name="A", role="student", issued_at=0, expires_at=0)
+
+    async def scenario():
+        hub = LiveHub(queue_size=2)
+        stuck, received, closed = asyncio.Event(), [], []
+
+        async def never_sends(message):
+            await stuck.wait()
+
+        async def records(message):
+            received.append(message)
+
+        async def close(code):
+            closed.append(code)
+
+        slow = hub.connect(user, never_sends, close)
+        fast = hub.connect(user, records, close)
+        for subscriber in (slow, fast):
+            hub.subscribe(subscriber, "forum:discussion:1")
+        for n in range(5):
+            hub.publish("forum:discussion:1", {"n": n})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        stats = hub.stats()
+        hub.disconnect(fast)
+        return received, closed, stats
+
+    received, closed, stats = asyncio.run(scenario())
+    assert len(received) == 5
+    assert closed == [status.WS_1013_TRY_AGAIN_LATER]
+    assert (stats["connections"], stats["dropped_slow"]) == (1, 1)
@@ -0,0 +1,95 @@
+"""
+Tests for the in-memory media tag index and the filtered media listings.
+"""
+from content import media_version
+from db_models import MediaLibrary, MediaTag
+from media_index import MediaTagIndex, media_index
+
+
+def add_media(db, title, media_type, tags):
+    media = MediaLibrary(title=title, media_type=media_type, url=f"https://example.com/{title}")
+    media.tags = [MediaTag(tag=tag) for tag in tags]
+    db.add(media)
+    db.commit()
+    return media.id
+
+
+def seed_library(db):
+    return [
+        add_media(db, "a", "video", ["hiv", "testing"]),
+        add_media(db, "b", "podcast", ["hiv", "stigma"]),
+        add_media(db, "c", "video", ["testing", "prep"]),
+        add_media(db, "d", "video", ["hiv", "testing", "prep"]),
+    ]
+
+
+def test_and_or_and_type_filters_with_facets(client, db):
+    a, b, c, d = seed_library(db)
+
+    body = client.get("/api/media/query", params={"tag": ["hiv", "testing"]}).json()
+    assert body["total"] == 2
+    assert [item["id"] for item in body["items"]] == [a, d]
+    assert body["facets"]["tags"] == [
+        {"value": "hiv", "count": 2}, {"value": "testing", "count": 2}, {"value": "prep", "count": 1},
+    ]
+
+    body = client.get("/api/media/query", params={"tag": ["stigma", "prep"], "match": "any", "media_type": "video"}).json()
+    assert [item["id"] for item in body["items"]] == [c, d]
+    # The media_type facet ignores its own filter so the podcast stays selectable
+    assert body["facets"]["media_types"] == [{"value": "video", "count": 2}, {"value": "podcast", "count": 1}]
+
+    first = client.get("/api/media/query", params={"limit": 2}).json()
+    page = client.get("/api/media/query", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert (page["total"], [item["id"] for item in page["items"]], page["next_cursor"]) == (4, [c, d], None)
+    listed = client.get("/api/media", params={"tag": "prep"}).json()
+    assert [item["id"] for item in listed] == [c, d]
+    assert len(client.get("/api/media").json()) == 4
+
+
+def test_orm_writes_update_index_after_commit(db):
+    a, b, c, d = seed_library(db)
+    media_index.ensure_current(db)
+    builds = media_index.stats()["builds"]
+
+    db.add(MediaTag(media_id=b, tag="prep"))
+    db.flush()
+    db.rollback()
+    assert media_index.query(["prep"])["ids"] == [c, d]
+
+    db.add(MediaTag(media_id=b, tag="prep"))
+    db.delete(db.get(MediaLibrary, d))
+    db.commit()
+    assert media_index.query(["prep"])["ids"] == [b, c]
+    assert media_index.query(["hiv"])["ids"] == [a, b]
+    # What the index holds matches the database stamp, so no rebuild is due
+    assert media_index.version() == media_version(db)
+    assert media_index.stats()["builds"] == builds
+
+
+def test_rebuilds_after_changes_made_elsewhere(db):
+    seed_library(db)
+    index = MediaTagIndex(check_interval=0)
+    index.ensure_current(db)
+
+    db.query(MediaTag).filter(MediaTag.tag == "hiv").delete()  # bulk delete, no ORM events
+    db.commit()
+    index.ensure_current(db)
+
+    assert index.query(["hiv"])["total"] == 0
+    assert index.stats()["builds"] == 2
+
+
+def test_rebuilds_after_in_place_edits_made_elsewhere(db):
+    a, b, c, d = seed_library(db)
+    index = MediaTagIndex(check_interval=0)
+    index.ensure_current(db)
+
+    # Same row counts and ids, only edited values (bulk updates, no ORM events)
+    db.query(MediaTag).filter(MediaTag.media_id == a, MediaTag.tag == "hiv").update({"tag": "prep"})
+    db.query(MediaLibrary).filter(MediaLibrary.id == b).update({"media_type": "video"})
+    db.commit()
+    index.ensure_current(db)
+
+    assert index.query(["prep"])["ids"] == [a, c, d]
+    assert index.query(media_types=["video"])["total"] == 4
+    assert index.stats()["builds"] == 2
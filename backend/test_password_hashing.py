@@ -0,0 +1,63 @@
+"""
+Tests that bcrypt work runs off the event loop.
+Unrelated requests must stay fast while logins are being verified.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+
+def test_unrelated_requests_stay_fast_during_logins(client, db, monkeypatch):
+    import main
+
+    hasher = PasswordHasher(rounds=12, workers=1, max_pending=16)
+    monkeypatch.setattr(main, "password_hasher", hasher)
+    client.post(
+        "/api/v1/auth/register",
+        json={"full_name": "Amina Otieno", "email": "amina@example.com", "password": "secret123"},
+    )
+
+    async def scenario():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as ac:
+            logins = [
+                asyncio.create_task(ac.post(
+                    "/api/v1/auth/login",
+                    data={"username": "amina@example.com", "password": "secret123"},
+                ))
+                for _ in range(4)
+            ]
+            for _ in range(200):
+                if hasher.stats()["in_flight"]:
+                    break
+                await asyncio.sleep(0.005)
+
+            latencies = []
+            for _ in range(5):
+                start = time.perf_counter()
+                response = await ac.get("/api/courses")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+            still_hashing = hasher.stats()["in_flight"] + hasher.stats()["queue_depth"]
+
+            results = await asyncio.gather(*logins)
+            return latencies, still_hashing, results
+
+    latencies, still_hashing, results = asyncio.run(scenario())
+
+    assert all(r.status_code == 200 for r in results)
+    assert still_hashing > 0
+    # A single bcrypt check at cost 12 takes ~250 ms; the loop must not wait for it.
+    assert max(latencies) < 0.1
+    assert hasher.stats()["completed"] == 5
+
+
+def test_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=0)
+
+    with pytest.raises(HasherBusy):
+        asyncio.run(hasher.hash("secret123"))
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,377 @@
+"""
+Tests for the lesson -> module -> course progress rollup.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from database import engine, read_engine
+from db_models import Course, Enrollment, Lesson, LessonProgress, LessonStatus, Module, ModuleProgress, User, UserRole
+from progress import rebuild_learning_cursors, rebuild_progress_rollups
+
+
+def make_user_and_course(db, module_count=2, lessons_per_module=4):
+    """Create a student and a course; returns (user_id, course_id, [[lesson ids per module]])."""
+    user = User(full_name="Student", email="student@example.com", hashed_password="x", role=UserRole.STUDENT)
+    course = Course(title="Course", description="", category="Health", icon="Book", color="primary")
+    db.add_all([user, course])
+    db.flush()
+    lesson_ids = []
+    for m in range(module_count):
+        module = Module(course_id=course.id, title=f"Module {m}", order=m)
+        db.add(module)
+        db.flush()
+        lessons = [Lesson(module_id=module.id, title=f"Lesson {m}.{l}", content="", order=l)
+                   for l in range(lessons_per_module)]
+        db.add_all(lessons)
+        db.flush()
+        lesson_ids.append([lesson.id for lesson in lessons])
+    db.commit()
+    return user.id, course.id, lesson_ids
+
+
+def put_progress(client, user_id, lesson_id, status, percentage):
+    return client.put(
+        f"/api/users/{user_id}/lesson-progress/{lesson_id}",
+        json={"status": status, "progress_percentage": percentage},
+        headers=student_headers(user_id),
+    )
+
+
+def module_id_of(db, lesson_id):
+    return db.get(Lesson, lesson_id).module_id
+
+
+def test_completion_rolls_up_to_module_and_course(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    module_id = module_id_of(db, lessons[0][0])
+
+    assert put_progress(client, user_id, lessons[0][0], "completed", 100).status_code == 200
+    assert put_progress(client, user_id, lessons[0][1], "in_progress", 40).status_code == 200
+
+    response = client.get(f"/api/users/{user_id}/module-progress/{module_id}", headers=student_headers(user_id))
+    assert response.json() == {
+        "module_id": module_id,
+        "module_title": "Module 0",
+        "total_lessons": 4,
+        "completed_lessons": 1,
+        "progress_percentage": 25,
+    }
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert (enrollment.completed_lessons, enrollment.total_lessons, enrollment.progress_percentage) == (1, 8, 12)
+
+
+def test_repeated_and_reverted_completion_is_counted_once(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    module_id = module_id_of(db, lessons[0][0])
+
+    for _ in range(3):
+        put_progress(client, user_id, lessons[0][0], "completed", 100)
+    headers = student_headers(user_id)
+    assert client.get(f"/api/users/{user_id}/module-progress/{module_id}", headers=headers).json()["completed_lessons"] == 1
+
+    put_progress(client, user_id, lessons[0][0], "in_progress", 50)
+    assert client.get(f"/api/users/{user_id}/module-progress/{module_id}", headers=headers).json()["completed_lessons"] == 0
+
+
+def test_module_completes_when_all_lessons_done(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    for lesson_id in lessons[0]:
+        put_progress(client, user_id, lesson_id, "completed", 100)
+
+    row = db.query(ModuleProgress).filter_by(user_id=user_id).one()
+    assert row.progress_percentage == 100
+    assert row.completed_at is not None
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert enrollment.completed_at is not None
+
+
+def test_new_lesson_updates_totals(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    module_id = module_id_of(db, lessons[0][0])
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+
+    db.add(Lesson(module_id=module_id, title="Extra", content="", order=9))
+    db.commit()
+
+    body = client.get(f"/api/users/{user_id}/module-progress/{module_id}", headers=student_headers(user_id)).json()
+    assert (body["completed_lessons"], body["total_lessons"], body["progress_percentage"]) == (1, 3, 33)
+
+
+def test_module_progress_read_does_not_scan_lessons(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=60)
+    module_id = module_id_of(db, lessons[0][0])
+    for lesson_id in lessons[0][:30]:
+        put_progress(client, user_id, lesson_id, "completed", 100)
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, read_engine):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(f"/api/users/{user_id}/module-progress/{module_id}", headers=student_headers(user_id))
+    finally:
+        for target in (engine, read_engine):
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+    assert response.json()["progress_percentage"] == 50
+    assert statements
+    assert not any("lesson_progress" in statement or "FROM lessons" in statement for statement in statements)
+
+
+def test_rebuild_matches_incremental_rollup(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    put_progress(client, user_id, lessons[1][0], "completed", 100)
+    put_progress(client, user_id, lessons[1][1], "completed", 100)
+    before = [(r.module_id, r.completed_lessons, r.total_lessons, r.progress_percentage)
+              for r in db.query(ModuleProgress).order_by(ModuleProgress.module_id)]
+
+    db.query(ModuleProgress).update({"completed_lessons": 0, "progress_percentage": 0})
+    db.commit()
+    rebuild_progress_rollups(db)
+    db.commit()
+    db.expire_all()
+
+    after = [(r.module_id, r.completed_lessons, r.total_lessons, r.progress_percentage)
+             for r in db.query(ModuleProgress).order_by(ModuleProgress.module_id)]
+    assert after == before == [(before[0][0], 1, 4, 25), (before[1][0], 2, 4, 50)]
+
+
+def post_batch(client, user_id, updates):
+    return client.post(f"/api/users/{user_id}/lesson-progress/batch", json=updates, headers=student_headers(user_id))
+
+
+def test_batch_applies_updates_and_returns_aggregates(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    response = post_batch(client, user_id, [
+        {"lesson_id": lessons[0][0], "status": "completed", "progress_percentage": 100,
+         "client_updated_at": "2026-01-01T10:00:00Z"},
+        {"lesson_id": lessons[0][1], "status": "in_progress", "progress_percentage": 30,
+         "client_updated_at": "2026-01-01T10:00:01Z"},
+        {"lesson_id": lessons[1][0], "status": "completed", "progress_percentage": 100,
+         "client_updated_at": "2026-01-01T10:00:02Z"},
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [l["lesson_id"] for l in body["lessons"]] == [lessons[0][0], lessons[0][1], lessons[1][0]]
+    assert [(m["completed_lessons"], m["progress_percentage"]) for m in body["modules"]] == [(1, 25), (1, 25)]
+    assert body["courses"] == [
+        {"course_id": course_id, "total_lessons": 8, "completed_lessons": 2, "progress_percentage": 25}
+    ]
+    assert body["ignored_lesson_ids"] == []
+
+
+def test_batch_last_write_wins_on_client_timestamp(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    lesson_id = lessons[0][0]
+
+    post_batch(client, user_id, [
+        {"lesson_id": lesson_id, "status": "in_progress", "progress_percentage": 20,
+         "client_updated_at": "2026-01-01T10:00:00Z"},
+        {"lesson_id": lesson_id, "status": "completed", "progress_percentage": 100,
+         "client_updated_at": "2026-01-01T10:05:00Z"},
+    ])
+    # A replayed, older update arrives late and must not undo the completion
+    body = post_batch(client, user_id, [
+        {"lesson_id": lesson_id, "status": "in_progress", "progress_percentage": 60,
+         "client_updated_at": "2026-01-01T10:02:00Z"},
+    ]).json()
+
+    assert body["ignored_lesson_ids"] == [lesson_id]
+    assert body["lessons"][0]["status"] == "completed"
+    assert body["modules"][0]["completed_lessons"] == 1
+
+    # A newer one reverts it and the rollup follows
+    body = post_batch(client, user_id, [
+        {"lesson_id": lesson_id, "status": "in_progress", "progress_percentage": 10,
+         "client_updated_at": "2026-01-01T11:00:00+01:00"},
+    ]).json()
+    assert body["ignored_lesson_ids"] == [lesson_id]
+
+    body = post_batch(client, user_id, [
+        {"lesson_id": lesson_id, "status": "in_progress", "progress_percentage": 10,
+         "client_updated_at": "2026-01-01T10:30:00Z"},
+    ]).json()
+    assert body["lessons"][0]["status"] == "in_progress"
+    assert body["modules"][0]["completed_lessons"] == 0
+
+
+def test_batch_completion_is_counted_once(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    for minute in range(3):
+        post_batch(client, user_id, [
+            {"lesson_id": lessons[0][0], "status": "completed", "progress_percentage": 100,
+             "client_updated_at": f"2026-01-01T10:0{minute}:00Z"},
+        ])
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+
+    body = client.get(
+        f"/api/users/{user_id}/module-progress/{module_id_of(db, lessons[0][0])}", headers=student_headers(user_id),
+    ).json()
+    assert body["completed_lessons"] == 1
+
+
+def test_lesson_row_is_rolled_back_with_its_transaction(db):
+    from progress import _get_or_create
+
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    # The SAVEPOINT is the transaction's first write; releasing it must not commit
+    _get_or_create(db, LessonProgress, {"user_id": user_id, "lesson_id": lessons[0][0]},
+                   status=LessonStatus.NOT_STARTED, progress_percentage=0)
+    db.rollback()
+
+    assert db.query(LessonProgress).count() == 0
+
+
+def test_stale_batch_loses_to_a_newer_direct_write(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+
+    # Queued offline before the PUT, uploaded after it
+    body = post_batch(client, user_id, [
+        {"lesson_id": lessons[0][0], "status": "in_progress", "progress_percentage": 10,
+         "client_updated_at": "2020-01-01T10:00:00Z"},
+    ]).json()
+    assert body["ignored_lesson_ids"] == [lessons[0][0]]
+    assert body["lessons"][0]["status"] == "completed"
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert enrollment.completed_lessons == 1
+
+
+def test_batch_rejects_unknown_lessons(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    response = post_batch(client, user_id, [
+        {"lesson_id": 9999, "status": "completed", "progress_percentage": 100,
+         "client_updated_at": "2026-01-01T10:00:00Z"},
+    ])
+    assert response.status_code == 404
+
+
+def test_batch_is_private_to_its_owner_and_staff(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    url = f"/api/users/{user_id}/lesson-progress/batch"
+    updates = [{"lesson_id": lessons[0][0], "status": "completed", "progress_percentage": 100,
+                "client_updated_at": "2026-01-01T10:00:00Z"}]
+
+    assert client.post(url, json=updates).status_code == 401
+    assert client.post(url, json=updates, headers=student_headers(user_id + 1)).status_code == 403
+    assert db.query(Enrollment).count() == 0
+
+    from test_analytics import staff_headers
+    response = client.post(url, json=updates, headers=staff_headers("admin"))
+    assert response.json()["lessons"][0]["status"] == "completed"
+
+
+def student_headers(user_id):
+    from main import create_access_token
+    token = create_access_token({
+        "user_id": user_id, "email": "student@example.com", "full_name": "Student", "role": "student",
+    })
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_continue_learning_follows_cursor(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=2, lessons_per_module=2)
+    headers = student_headers(user_id)
+    assert client.get("/api/v1/users/me/continue-learning", headers=headers).json()["course_id"] is None
+
+    put_progress(client, user_id, lessons[0][1], "completed", 100)
+    body = client.get("/api/v1/users/me/continue-learning", headers=headers).json()
+    # Lesson 0.0 is still the first incomplete one
+    assert (body["lesson_id"], body["module_title"], body["status"]) == (lessons[0][0], "Module 0", "in_progress")
+    assert body["link"] == f"/course/{course_id}/lesson/{lessons[0][0]}"
+
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    body = client.get("/api/v1/users/me/continue-learning", headers=headers).json()
+    assert (body["lesson_id"], body["module_title"], body["lesson_title"]) == (lessons[1][0], "Module 1", "Lesson 1.0")
+
+    put_progress(client, user_id, lessons[0][1], "in_progress", 50)
+    body = client.get("/api/v1/users/me/continue-learning", headers=headers).json()
+    assert body["lesson_id"] == lessons[0][1]
+
+
+def test_continue_learning_is_one_query(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    headers = student_headers(user_id)
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, read_engine):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get("/api/v1/users/me/continue-learning", headers=headers)
+    finally:
+        for target in (engine, read_engine):
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+    assert response.json()["lesson_id"] == lessons[0][1]
+    assert len(statements) == 1
+    assert "lesson_progress" not in statements[0]
+
+
+def test_batch_uncompletion_moves_cursor_back_when_counts_cancel_out(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=4)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    headers = student_headers(user_id)
+    assert client.get("/api/v1/users/me/continue-learning", headers=headers).json()["lesson_id"] == lessons[0][1]
+
+    # One un-completion and one completion in the same module: net delta 0
+    later = datetime.now(timezone.utc).isoformat()
+    post_batch(client, user_id, [
+        {"lesson_id": lessons[0][0], "status": "in_progress", "progress_percentage": 50,
+         "client_updated_at": later},
+        {"lesson_id": lessons[0][2], "status": "completed", "progress_percentage": 100,
+         "client_updated_at": later},
+    ])
+    body = client.get("/api/v1/users/me/continue-learning", headers=headers).json()
+    assert body["lesson_id"] == lessons[0][0]
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert enrollment.completed_lessons == 1
+
+
+def test_rebuild_learning_cursors(client, db):
+    user_id, course_id, lessons = make_user_and_course(db)
+    put_progress(client, user_id, lessons[0][0], "completed", 100)
+    put_progress(client, user_id, lessons[0][1], "completed", 100)
+    db.query(Enrollment).update({"next_lesson_id": None, "next_module_id": None, "next_link": None})
+    db.commit()
+
+    rebuild_learning_cursors(db)
+    db.commit()
+    db.expire_all()
+
+    enrollment = db.query(Enrollment).filter_by(user_id=user_id, course_id=course_id).one()
+    assert enrollment.next_lesson_id == lessons[0][2]
+    assert enrollment.next_module_id == module_id_of(db, lessons[0][2])
+    assert enrollment.next_link == f"/course/{course_id}/lesson/{lessons[0][2]}"
+
+
+def test_progress_is_private_to_its_owner_and_staff(client, db):
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1)
+    lesson_url = f"/api/users/{user_id}/lesson-progress/{lessons[0][0]}"
+    module_url = f"/api/users/{user_id}/module-progress/{module_id_of(db, lessons[0][0])}"
+    body = {"status": "completed", "progress_percentage": 100}
+
+    assert client.put(lesson_url, json=body).status_code == 401
+    assert client.get(lesson_url).status_code == 401
+    assert client.get(module_url).status_code == 401
+
+    other = student_headers(user_id + 1)
+    assert client.put(lesson_url, json=body, headers=other).status_code == 403
+    assert client.get(lesson_url, headers=other).status_code == 403
+    assert client.get(module_url, headers=other).status_code == 403
+    assert db.query(Enrollment).count() == 0
+
+    from test_analytics import staff_headers
+    assert put_progress(client, user_id, lessons[0][0], "completed", 100).status_code == 200
+    assert client.get(lesson_url, headers=staff_headers("instructor")).json()["status"] == "completed"
+    assert client.get(module_url, headers=staff_headers("admin")).json()["completed_lessons"] == 1
@@ -0,0 +1,140 @@
+"""
+Query-plan tests for the hot lookup paths and the in-place index migration.
+Each query must be answered through its composite index, not a table scan.
+"""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from database import Base, engine
+
+HOT_QUERIES = [
+    (
+        "SELECT * FROM lesson_progress WHERE user_id = 1 AND lesson_id = 2",
+        "uq_lesson_progress_user_id_lesson_id",
+    ),
+    (
+        "SELECT * FROM enrollments WHERE user_id = 1 AND course_id = 2",
+        "uq_enrollments_user_id_course_id",
+    ),
+    (
+        "SELECT * FROM enrollments WHERE user_id = 1 AND completed_at IS NULL "
+        "ORDER BY last_activity_at DESC NULLS LAST LIMIT 1",
+        "ix_enrollments_user_id_last_activity_at",
+    ),
+    (
+        "SELECT user_id, lesson_id, status FROM lesson_progress WHERE updated_at >= '2026-01-01'",
+        "ix_lesson_progress_updated_at",
+    ),
+    (
+        'SELECT * FROM modules WHERE course_id = 1 ORDER BY "order"',
+        "ix_modules_course_id_order",
+    ),
+    (
+        'SELECT * FROM lessons WHERE module_id IN (1, 2, 3) ORDER BY module_id, "order"',
+        "ix_lessons_module_id_order",
+    ),
+    (
+        "SELECT * FROM module_progress WHERE user_id = 1 AND module_id = 2",
+        "uq_module_progress_user_id_module_id",
+    ),
+    (
+        "SELECT * FROM discussions WHERE category_id = 1 ORDER BY created_at DESC",
+        "ix_discussions_category_id_created_at",
+    ),
+    (
+        "SELECT * FROM replies WHERE discussion_id = 1 ORDER BY created_at",
+        "ix_replies_discussion_id_created_at",
+    ),
+    (
+        "SELECT * FROM discussions WHERE (created_at, id) < ('2026-01-01', 9) "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        "ix_discussions_created_at",
+    ),
+    (
+        "SELECT * FROM discussions WHERE category_id = 1 AND (created_at, id) < ('2026-01-01', 9) "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        "ix_discussions_category_id_created_at",
+    ),
+    (
+        "SELECT * FROM replies WHERE discussion_id = 1 AND (created_at, id) > ('2026-01-01', 9) "
+        "ORDER BY created_at, id LIMIT 51",
+        "ix_replies_discussion_id_created_at",
+    ),
+    (
+        "SELECT * FROM resources WHERE (created_at, id) > ('2026-01-01', 9) ORDER BY created_at, id LIMIT 51",
+        "ix_resources_created_at",
+    ),
+    (
+        "SELECT * FROM media_library WHERE (created_at, id) > ('2026-01-01', 9) ORDER BY created_at, id LIMIT 51",
+        "ix_media_library_created_at",
+    ),
+]
+
+
+@pytest.mark.parametrize("sql, index_name", HOT_QUERIES)
+def test_hot_query_uses_index(db, sql, index_name):
+    with engine.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+    assert f"INDEX {index_name}" in plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+
+def test_migration_builds_indexes_on_existing_database(tmp_path):
+    from migrate_db import migrate_columns, migrate_indexes
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        # Old schema: tables without the composite indexes
+        connection.exec_driver_sql(
+            "CREATE TABLE lesson_progress (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "lesson_id INTEGER NOT NULL, status VARCHAR(11), progress_percentage INTEGER, "
+            "started_at DATETIME, completed_at DATETIME, updated_at DATETIME)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE enrollments (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "course_id INTEGER NOT NULL, enrolled_at DATETIME, completed_at DATETIME, progress_percentage INTEGER)"
+        )
+        connection.exec_driver_sql("INSERT INTO lesson_progress (user_id, lesson_id) VALUES (1, 1), (1, 2)")
+        # A duplicate enrollment blocks the unique index instead of being dropped
+        connection.exec_driver_sql("INSERT INTO enrollments (user_id, course_id) VALUES (1, 1), (1, 1)")
+    for table in Base.metadata.sorted_tables:
+        if table.name not in ("lesson_progress", "enrollments"):
+            table.create(legacy)
+
+    # Columns first, as migrate_database() does: some indexes cover new columns
+    assert "enrollments.last_activity_at" in migrate_columns(legacy)
+    result = migrate_indexes(legacy)
+
+    assert "uq_lesson_progress_user_id_lesson_id" in result["created"]
+    assert result["skipped"] == ["uq_enrollments_user_id_course_id"]
+    names = {ix["name"] for ix in inspect(legacy).get_indexes("lesson_progress")}
+    assert "uq_lesson_progress_user_id_lesson_id" in names
+    with legacy.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM lesson_progress")).scalar() == 2
+        assert connection.execute(text("SELECT COUNT(*) FROM enrollments")).scalar() == 2
+    assert migrate_indexes(legacy) == {"created": [], "skipped": ["uq_enrollments_user_id_course_id"]}
+
+
+def test_migration_fails_while_unique_indexes_are_blocked(db, monkeypatch):
+    import migrate_db
+
+    assert migrate_db.migrate_database() is True
+    monkeypatch.setattr(migrate_db, "migrate_indexes",
+                        lambda: {"created": [], "skipped": ["uq_enrollments_user_id_course_id"]})
+    assert migrate_db.migrate_database() is False
+
+
+def test_concurrent_index_build_leaves_the_models_untouched():
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.schema import CreateIndex
+
+    from db_models import Enrollment
+    from migrate_db import concurrent_copy
+
+    index = next(ix for ix in Enrollment.__table__.indexes if ix.name == "uq_enrollments_user_id_course_id")
+    copy = concurrent_copy(index)
+
+    assert "CREATE UNIQUE INDEX CONCURRENTLY" in str(CreateIndex(copy).compile(dialect=postgresql.dialect()))
+    assert "CONCURRENTLY" not in str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    assert copy not in Enrollment.__table__.indexes
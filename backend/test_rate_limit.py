@@ -0,0 +1,60 @@
+"""
+Tests for token-bucket throttling of the authentication endpoints.
+"""
+from rate_limit import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, clock=clock)
+
+    assert limiter.acquire("ip") == 0
+    assert limiter.acquire("ip") == 0
+    assert limiter.acquire("ip") == 1.0
+    clock.now = 1.0
+    assert limiter.acquire("ip") == 0
+
+
+def test_idle_buckets_are_evicted():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+
+    assert len(limiter) == 2
+    assert limiter.evictions == 1
+
+
+def test_login_is_throttled_per_account_before_hashing(client, db, monkeypatch):
+    import main
+    import rate_limit
+
+    monkeypatch.setattr(rate_limit, "auth_account_limiter", TokenBucketLimiter(rate=0.01, burst=2))
+    verifications = []
+
+    async def counting_verify(plain_password, hashed_password):
+        verifications.append(plain_password)
+        return False
+
+    monkeypatch.setattr(main, "verify_password", counting_verify)
+    client.post(
+        "/api/v1/auth/register",
+        json={"full_name": "Amina Otieno", "email": "amina@example.com", "password": "secret123"},
+    )
+
+    statuses = [
+        client.post("/api/v1/auth/login", data={"username": "amina@example.com", "password": "guess"}).status_code
+        for _ in range(4)
+    ]
+
+    assert statuses == [401, 429, 429, 429]
+    assert len(verifications) == 1
+    throttled = client.post("/api/v1/auth/login", data={"username": "amina@example.com", "password": "guess"})
+    assert int(throttled.headers["retry-after"]) > 0
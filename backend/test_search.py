@@ -0,0 +1,79 @@
+"""
+Tests for the FTS5 full-text search index and /api/search.
+"""
+from sqlalchemy import text
+
+from db_models import Course, Discussion, ForumCategory, Lesson, MediaLibrary, Module, Resource, ResourceCategory
+from search import rebuild_search_index
+from test_progress import make_user_and_course
+
+
+def seed_content(db):
+    """One searchable item of each kind; returns (user_id, course_id, lesson ids)."""
+    user_id, course_id, lessons = make_user_and_course(db, module_count=1, lessons_per_module=2)
+    lesson = db.get(Lesson, lessons[0][1])
+    lesson.title, lesson.content = "Understanding PrEP", "Daily prevention pills lower transmission risk."
+    category = ResourceCategory(name="Clinics")
+    forum = ForumCategory(name="General")
+    db.add_all([category, forum])
+    db.flush()
+    db.add_all([
+        Resource(category_id=category.id, title="Testing centres", description="Free prevention services"),
+        MediaLibrary(title="Prevention podcast", description="Talking openly", media_type="podcast", url="x"),
+        Discussion(user_id=user_id, category_id=forum.id, title="Side effects?", content="Anyone on prevention meds?"),
+    ])
+    db.commit()
+    return user_id, course_id, lessons[0]
+
+
+def search(client, query, **params):
+    response = client.get("/api/search", params={"q": query, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_ranks_all_kinds_with_snippets(client, db):
+    user_id, course_id, lessons = seed_content(db)
+
+    body = search(client, "preven")
+    assert body["counts"] == {"lesson": 1, "resource": 1, "media": 1, "discussion": 1}
+    assert body["results"][0]["type"] == "media"  # title match outranks body matches
+    lesson = next(hit for hit in body["results"] if hit["type"] == "lesson")
+    assert lesson["link"] == f"/course/{course_id}/lesson/{lessons[1]}"
+    assert "<mark>prevention</mark>" in lesson["snippet"]
+
+    filtered = search(client, "prevention", type=["lesson", "discussion"])
+    assert sorted(hit["type"] for hit in filtered["results"]) == ["discussion", "lesson"]
+    assert filtered["counts"] == body["counts"]
+    assert search(client, "prep pills")["results"][0]["title"] == "Understanding PrEP"
+
+
+def test_index_follows_edits_and_deletes(client, db):
+    seed_content(db)
+    course = db.query(Course).one()
+    course.title = "Sexual health basics"
+    db.commit()
+    assert search(client, "basics")["results"][0]["link"] == f"/course/{course.id}"
+
+    db.query(Discussion).delete()
+    db.delete(db.query(Module).one())
+    db.commit()
+    assert search(client, "prevention")["counts"] == {"resource": 1, "media": 1}
+
+
+def test_query_syntax_is_not_interpreted(client, db):
+    seed_content(db)
+    assert search(client, '"prevention AND (NEAR')["results"] == []
+    assert search(client, "*** ---") == {"query": "*** ---", "results": [], "counts": {}}
+    assert client.get("/api/search", params={"q": "x", "limit": 0}).status_code == 422
+
+
+def test_rebuild_repopulates_index(client, db):
+    seed_content(db)
+    db.execute(text("DELETE FROM search_index"))
+    db.commit()
+    assert search(client, "prevention")["results"] == []
+
+    assert rebuild_search_index(db) == 6
+    db.commit()
+    assert len(search(client, "prevention")["results"]) == 4